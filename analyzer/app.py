@@ -1,41 +1,467 @@
-import json
+import asyncio
 import logging
-import logging.config
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from threading import Lock, Thread
 
 import connexion
+from connexion.resolver import Resolver
+import requests
 import yaml
-from pykafka import KafkaClient
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
 from connexion import NoContent
 
 from connexion.middleware import MiddlewarePosition
 from starlette.middleware.cors import CORSMiddleware
 
-with open("/app/config/log_conf.yml", "r") as f:
+from event_index import EventIndex
+from reconcile import ENTITY_FIELDS, WindowDigest, diff_keys, event_key
+import codec
+import log_setup
+from readiness import Readiness, with_backoff
+from topics import consume_topics
+
+# Mounted at /app/config by compose; the tests point this at their own copy.
+CONFIG_DIR = os.environ.get("APP_CONFIG_DIR", "/app/config")
+
+with open(f"{CONFIG_DIR}/log_conf.yml", "r") as f:
     LOG_CONF = yaml.safe_load(f)
-logging.config.dictConfig(LOG_CONF)
+log_setup.configure(LOG_CONF)
 logger = logging.getLogger("basicLogger")
 
-with open("/app/config/app_conf.yml", "r") as f:
+with open(f"{CONFIG_DIR}/app_conf.yml", "r") as f:
     APP_CONF = yaml.safe_load(f)
 
 KAFKA_HOSTS = f"{APP_CONF['events']['hostname']}:{APP_CONF['events']['port']}"
-KAFKA_TOPIC = APP_CONF["events"]["topic"].encode()
-
-
-def _get_consumer():
+# events.routing picks the shared `topic` or one topic per event type;
+# the tail reads every topic an event may be in (see topics.py).
+CONSUME_TOPICS = consume_topics(APP_CONF["events"])
+
+# How often the tailing consumer wakes up (when idle) to refresh its lag.
+TAIL_CONF = APP_CONF.get("tail", {})
+LAG_REFRESH_SEC = float(TAIL_CONF.get("lag_refresh_sec", 5))
+RETRY_SEC = float(TAIL_CONF.get("retry_sec", 5))
+# With several topics the tail takes turns: at most batch messages from
+# one topic, or until it has been quiet for poll_ms, then the next one.
+TAIL_POLL_MS = int(TAIL_CONF.get("poll_ms", 200))
+TAIL_BATCH = int(TAIL_CONF.get("batch", 500))
+# Producers never stop, so the lag rarely reads 0. The index counts as
+# caught up the first time the lag is at most this many messages, and
+# stays that way while the tail keeps running.
+READY_LAG = int(TAIL_CONF.get("ready_lag", 1000))
+
+# The tail connects in the background with exponential backoff; /ready is
+# 503 until it is connected and has first come within READY_LAG of the head.
+STARTUP_CONF = APP_CONF.get("startup", {})
+BACKOFF_INITIAL_SEC = float(STARTUP_CONF.get("backoff_initial_sec", 0.5))
+BACKOFF_MAX_SEC = float(STARTUP_CONF.get("backoff_max_sec", 30))
+READY = Readiness(required=["kafka", "index"])
+
+# mode: dev runs connexion's own server; asgi runs uvicorn. The tailing
+# consumer and reconciliation job live in-process, so keep workers at 1.
+# async_handlers switches to AsyncApp and the aiokafka-backed *_async
+# handlers below, so slow Kafka fetches don't hold a worker thread.
+SERVER_CONF = APP_CONF.get("server", {})
+ASYNC_HANDLERS = bool(SERVER_CONF.get("async_handlers", False))
+
+# One aiokafka consumer for the async handlers, started on first use;
+# requests that miss the payload cache take turns on it.
+_ASYNC_CONSUMER = None
+_ASYNC_CONSUMER_LOCK = None
+
+INDEX_CONF = APP_CONF.get("index", {})
+MAX_PAGE_SIZE = int(INDEX_CONF.get("max_page_size", 100))
+# Offsets further apart than this are fetched with a fresh seek instead
+# of reading through the messages in between.
+SEEK_GAP = int(INDEX_CONF.get("seek_gap", 200))
+
+_INDEX = EventIndex(cache_size=int(INDEX_CONF.get("cache_size", 1000)))
+
+# The index stores a small "source" id per event in place of a partition;
+# a source is one (topic, partition). Ids are never reused.
+_SOURCES = []
+_SOURCE_IDS = {}
+
+RECONCILE_CONF = APP_CONF.get("reconcile", {})
+STORAGE_URL = RECONCILE_CONF.get("storage_url", "http://storage:8090")
+RECONCILE_INTERVAL = int(RECONCILE_CONF.get("interval_sec", 300))
+# Windows that saw an event this recently may still be in flight to storage.
+SETTLE_SEC = float(RECONCILE_CONF.get("settle_sec", 60))
+MAX_DRILLDOWN_WINDOWS = int(RECONCILE_CONF.get("max_drilldown_windows", 5))
+MAX_REPORT_KEYS = int(RECONCILE_CONF.get("max_report_keys", 100))
+# Only the last lookback_windows windows are compared each pass (0: all),
+# so storage's checksum query is a range scan on recorded_at.
+LOOKBACK_WINDOWS = int(RECONCILE_CONF.get("lookback_windows", 0))
+
+_DIGEST = WindowDigest(int(RECONCILE_CONF.get("window_sec", 3600)),
+                       int(RECONCILE_CONF.get("subwindow_sec", 0)) or None)
+_RECONCILE_LOCK = Lock()
+_RECONCILE_REPORT = None
+
+# Hot-path metrics, per request / consumed message.
+LOOKUP_SECONDS = Histogram(
+    "analyzer_lookup_seconds", "Time spent in the in-memory index for one request", ["etype"])
+SCAN_SECONDS = Histogram(
+    "analyzer_scan_seconds", "Time spent re-reading events from Kafka for one request", ["etype"])
+PAYLOADS = Counter(
+    "analyzer_payloads_total", "Payloads served, by where they came from", ["etype", "source"])
+MESSAGES = Counter(
+    "analyzer_messages_total", "Messages read by the tailing consumer, by outcome", ["result"])
+CONSUMER_LAG = Gauge(
+    "analyzer_kafka_consumer_lag", "Messages between the tailing consumer and the head of the topic")
+CONSUMER_LAG.set_function(lambda: _STATS["consumer_lag"] if _STATS["consumer_lag"] is not None else float("nan"))
+
+# Event type -> storage path segment used by the checksum/keys endpoints.
+_STORAGE_KINDS = {
+    "admission_created": "admission",
+    "capacity_snapshot": "capacity",
+}
+
+# In-memory counters maintained by the tailing consumer thread.
+_STATS_LOCK = Lock()
+_STATS = {
+    "num_admission_events": 0,
+    "num_capacity_events": 0,
+    "admissions_by_sender": {},
+    "capacity_by_sender": {},
+    "capacity_by_unit": {},
+    "last_event_datetime": None,
+    "consumer_lag": None,
+    "last_updated": None,
+}
+
+
+def _source_id(topic_name, partition_id):
+    key = (topic_name, partition_id)
+    sid = _SOURCE_IDS.get(key)
+    if sid is None:
+        sid = _SOURCE_IDS[key] = len(_SOURCES)
+        _SOURCES.append(key)
+    return sid
+
+
+def _get_consumer(topic_name, partition_id, start_offset):
     """
-    Returns a simple consumer that starts reading from the beginning
-    of the Kafka topic and times out once it has read all messages.
+    Returns a simple consumer on a single partition whose next message
+    is `start_offset`, timing out once the topic has been read to the end.
     """
+    from pykafka import KafkaClient
+    from pykafka.common import OffsetType
+
     client = KafkaClient(hosts=KAFKA_HOSTS)
-    topic = client.topics[KAFKA_TOPIC]
+    topic = client.topics[topic_name.encode()]
+    partition = topic.partitions[partition_id]
     consumer = topic.get_simple_consumer(
-        reset_offset_on_start=True,
+        partitions=[partition],
+        reset_offset_on_start=False,
         consumer_timeout_ms=1000
     )
+    # pykafka takes the last *consumed* offset here, and reads -1 as
+    # OffsetType.LATEST, so offset 0 has to be asked for as EARLIEST.
+    consumer.reset_offsets([(partition, start_offset - 1 if start_offset > 0 else OffsetType.EARLIEST)])
     return consumer
 
 
+def _split_cached(etype, seqs, lookup_sec, cache=True):
+    """
+    Serves what it can from the index cache. Returns (found, wanted) where
+    wanted is {source id: {offset: seq}} still to be read from Kafka.
+    """
+    t0 = time.perf_counter()
+    found = {}
+    wanted = {}
+    for seq in seqs:
+        payload = _INDEX.cached(etype, seq, touch=cache)
+        if payload is not None:
+            found[seq] = payload
+            continue
+        loc = _INDEX.location(etype, seq)
+        if loc is not None:
+            wanted.setdefault(loc[0], {})[loc[1]] = seq
+
+    LOOKUP_SECONDS.labels(etype).observe(lookup_sec + time.perf_counter() - t0)
+    PAYLOADS.labels(etype, "cache").inc(len(found))
+    return found, wanted
+
+
+def _offset_runs(offsets):
+    """Splits sorted offsets into runs close enough to read straight through."""
+    runs = [[offsets[0]]]
+    for off in offsets[1:]:
+        if off - runs[-1][-1] > SEEK_GAP:
+            runs.append([off])
+        else:
+            runs[-1].append(off)
+    return runs
+
+
+def _take_fetched(etype, by_offset, offset, value, found, cache=True):
+    if offset not in by_offset:
+        return
+    try:
+        data = codec.decode(value)
+    except Exception:
+        logger.warning("Skipping undecodable message: %r", value)
+        return
+    seq = by_offset[offset]
+    found[seq] = data.get("payload", {})
+    if cache:
+        _INDEX.cache(etype, seq, found[seq])
+
+
+def _fetch_payloads(etype, seqs, lookup_sec=0.0, cache=True):
+    """
+    Returns {seq: payload} for the given per-type sequence numbers,
+    serving from the index cache where possible and otherwise reading
+    just the needed offsets back from Kafka.
+    `lookup_sec` is index time already spent by the caller, for metrics.
+    With cache=False (bulk reads for reconciliation) the payload cache is
+    neither refreshed nor filled, so /history keeps its hot entries.
+    """
+    found, wanted = _split_cached(etype, seqs, lookup_sec, cache)
+    if not wanted:
+        return found
+
+    t1 = time.perf_counter()
+    for sid, by_offset in wanted.items():
+        topic_name, partition_id = _SOURCES[sid]
+        for run in _offset_runs(sorted(by_offset)):
+            consumer = _get_consumer(topic_name, partition_id, run[0])
+            try:
+                for msg in consumer:
+                    if msg is None:
+                        continue
+                    _take_fetched(etype, by_offset, msg.offset, msg.value, found, cache)
+                    if msg.offset >= run[-1]:
+                        break
+            finally:
+                consumer.stop()
+
+    SCAN_SECONDS.labels(etype).observe(time.perf_counter() - t1)
+    PAYLOADS.labels(etype, "kafka").inc(sum(len(v) for v in wanted.values()))
+    return found
+
+
+async def _get_async_consumer():
+    """The shared aiokafka consumer; the caller holds _ASYNC_CONSUMER_LOCK."""
+    global _ASYNC_CONSUMER
+
+    if _ASYNC_CONSUMER is None:
+        # Only needed with async_handlers, so imported lazily.
+        from aiokafka import AIOKafkaConsumer
+
+        logger.info("Analyzer: creating async Kafka consumer to %s", KAFKA_HOSTS)
+        consumer = AIOKafkaConsumer(bootstrap_servers=KAFKA_HOSTS, enable_auto_commit=False)
+        try:
+            await consumer.start()
+        except Exception:
+            await consumer.stop()
+            raise
+        _ASYNC_CONSUMER = consumer
+    return _ASYNC_CONSUMER
+
+
+async def _fetch_payloads_async(etype, seqs, lookup_sec=0.0):
+    """Same as _fetch_payloads, reading from Kafka with aiokafka."""
+    global _ASYNC_CONSUMER_LOCK
+
+    found, wanted = _split_cached(etype, seqs, lookup_sec)
+    if not wanted:
+        return found
+
+    from aiokafka import TopicPartition
+
+    if _ASYNC_CONSUMER_LOCK is None:
+        _ASYNC_CONSUMER_LOCK = asyncio.Lock()
+
+    t1 = time.perf_counter()
+    async with _ASYNC_CONSUMER_LOCK:
+        consumer = await _get_async_consumer()
+        for sid, by_offset in wanted.items():
+            tp = TopicPartition(*_SOURCES[sid])
+            consumer.assign([tp])
+            for run in _offset_runs(sorted(by_offset)):
+                consumer.seek(tp, run[0])
+                while True:
+                    try:
+                        msg = await asyncio.wait_for(consumer.getone(tp), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        break
+                    _take_fetched(etype, by_offset, msg.offset, msg.value, found)
+                    if msg.offset >= run[-1]:
+                        break
+
+    SCAN_SECONDS.labels(etype).observe(time.perf_counter() - t1)
+    PAYLOADS.labels(etype, "kafka").inc(sum(len(v) for v in wanted.values()))
+    return found
+
+
+def _iso_now() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _record_event(data):
+    """Folds one decoded event into the in-memory counters."""
+    etype = data.get("type")
+    payload = data.get("payload", {})
+    sender = payload.get("senderId") or "unknown"
+
+    with _STATS_LOCK:
+        if etype == "admission_created":
+            _STATS["num_admission_events"] += 1
+            by_sender = _STATS["admissions_by_sender"]
+            by_sender[sender] = by_sender.get(sender, 0) + 1
+        elif etype == "capacity_snapshot":
+            _STATS["num_capacity_events"] += 1
+            by_sender = _STATS["capacity_by_sender"]
+            by_sender[sender] = by_sender.get(sender, 0) + 1
+            unit = payload.get("unitId") or "unknown"
+            by_unit = _STATS["capacity_by_unit"]
+            by_unit[unit] = by_unit.get(unit, 0) + 1
+        else:
+            return
+
+        # Receiver stamps "datetime" as a sortable ISO string.
+        ts = data.get("datetime")
+        last = _STATS["last_event_datetime"]
+        if ts and (last is None or ts > last):
+            _STATS["last_event_datetime"] = ts
+        _STATS["last_updated"] = _iso_now()
+
+
+def _reset_stats():
+    _INDEX.reset()
+    _DIGEST.reset()
+    with _STATS_LOCK:
+        _STATS["num_admission_events"] = 0
+        _STATS["num_capacity_events"] = 0
+        _STATS["admissions_by_sender"] = {}
+        _STATS["capacity_by_sender"] = {}
+        _STATS["capacity_by_unit"] = {}
+        _STATS["last_event_datetime"] = None
+        _STATS["consumer_lag"] = None
+
+
+def _consumer_lag(consumer):
+    """
+    Number of messages between what the consumer has read and the
+    head of the topic, summed over partitions.
+    """
+    latest = consumer.topic.latest_available_offsets()
+    held = consumer.held_offsets
+    lag = 0
+    for partition_id, resp in latest.items():
+        head = resp.offset[0]
+        consumed = held.get(partition_id, -1)
+        lag += max(0, head - (consumed + 1))
+    return lag
+
+
+def _refresh_lag(consumers, caught_up):
+    """
+    Records the tail's total lag and marks the index ready the first time
+    it is within READY_LAG. Returns whether the index has caught up.
+    """
+    lag = sum(_consumer_lag(consumer) for _, consumer in consumers)
+    with _STATS_LOCK:
+        _STATS["consumer_lag"] = lag
+    if not caught_up and lag <= READY_LAG:
+        READY.mark("index", True, f"caught up with the topics (lag {lag})")
+        return True
+    return caught_up
+
+
+def _index_message(topic_name, msg):
+    try:
+        data = codec.decode(msg.value)
+    except Exception:
+        logger.warning("Skipping undecodable message: %r", msg.value)
+        MESSAGES.labels("skipped").inc()
+        return
+    MESSAGES.labels("indexed").inc()
+    _record_event(data)
+    etype = data.get("type")
+    payload = data.get("payload", {})
+    seq = _INDEX.add(etype, _source_id(topic_name, msg.partition_id), msg.offset, payload)
+    _DIGEST.add(etype, seq, payload)
+
+
+def _open_tail_consumers():
+    """[(topic name, consumer)] reading every topic from the beginning."""
+    # pykafka is only needed off the request path, so imported here.
+    from pykafka import KafkaClient
+    from pykafka.common import OffsetType
+
+    client = KafkaClient(hosts=KAFKA_HOSTS)
+    consumers = []
+    for topic_name in CONSUME_TOPICS:
+        topic = client.topics[topic_name.encode()]
+        consumers.append((topic_name, topic.get_simple_consumer(
+            reset_offset_on_start=True,
+            auto_offset_reset=OffsetType.EARLIEST,
+            consumer_timeout_ms=TAIL_POLL_MS,
+        )))
+    return consumers
+
+
+def tail_events():
+    """
+    Background loop that reads the topics once from the beginning and
+    then keeps following them, updating the in-memory stats as messages
+    arrive. If Kafka goes down, the counters are rebuilt from scratch
+    on reconnect so nothing is counted twice.
+    """
+    from pykafka.exceptions import KafkaException
+
+    logger.info("Analyzer: starting tailing consumer")
+
+    while True:
+        consumers = with_backoff(READY, "kafka", _open_tail_consumers, logger,
+                                 BACKOFF_INITIAL_SEC, BACKOFF_MAX_SEC)
+        READY.mark("index", False, "catching up")
+        try:
+            _reset_stats()
+            logger.info("Analyzer: tailing topics=%s from offset 0",
+                        ", ".join(name for name, _ in consumers))
+
+            caught_up = False
+            next_lag_check = 0.0
+            while True:
+                for topic_name, consumer in consumers:
+                    # Iteration stops after poll_ms of silence, so an idle
+                    # topic never holds up the others.
+                    taken = 0
+                    for msg in consumer:
+                        if msg is None:
+                            continue
+                        _index_message(topic_name, msg)
+                        taken += 1
+                        if taken >= TAIL_BATCH:
+                            break
+
+                if time.monotonic() >= next_lag_check:
+                    caught_up = _refresh_lag(consumers, caught_up)
+                    next_lag_check = time.monotonic() + LAG_REFRESH_SEC
+
+        except KafkaException as e:
+            logger.warning("Analyzer: exception in tailing consumer: %s", e)
+            READY.mark("kafka", False, f"consumer failed: {e}")
+        except Exception as e:
+            logger.exception("Analyzer: unexpected error in tailing consumer: %s", e)
+            READY.mark("kafka", False, f"consumer failed: {e}")
+
+        for _, consumer in consumers:
+            try:
+                consumer.stop()
+            except Exception:
+                pass
+
+        logger.info("Analyzer: will retry Kafka connection in %s seconds...", RETRY_SEC)
+        time.sleep(RETRY_SEC)
+
+
 def _parse_index(index_str):
     try:
         idx = int(index_str)
@@ -45,118 +471,347 @@ def _parse_index(index_str):
     except Exception:
         return None
 
-def get_admission_event(index):
+
+def _plan_history(etype, label, index, filters, from_index, limit, order):
+    """
+    Validates a /history request and resolves it against the index.
+    Returns (error_response, None) or (None, plan); the plan's "seqs" are
+    the per-type sequence numbers whose payloads still need fetching.
     """
-    Returns the admission/discharge event (type 'admission_created')
-    at per-type index `index`, or 404 if not found.
+    if index is not None:
+        idx = _parse_index(index)
+        if idx is None:
+            return ({"message": "index must be a non-negative integer"}, 400), None
+        return None, {"etype": etype, "label": label, "index": idx,
+                      "seqs": [idx], "lookup_sec": 0.0}
+
+    from_idx = _parse_index(from_index if from_index is not None else 0)
+    if from_idx is None:
+        return ({"message": "from_index must be a non-negative integer"}, 400), None
+
+    page_size = _parse_index(limit if limit is not None else MAX_PAGE_SIZE)
+    if page_size is None or page_size == 0:
+        return ({"message": "limit must be a positive integer"}, 400), None
+    page_size = min(page_size, MAX_PAGE_SIZE)
+
+    filters = {k: v for k, v in filters.items() if v is not None}
+    t0 = time.perf_counter()
+    total, seqs = _INDEX.select(etype, filters, from_idx, page_size,
+                                descending=(order == "desc"))
+    return None, {"etype": etype, "label": label, "index": None, "seqs": seqs,
+                  "lookup_sec": time.perf_counter() - t0, "total": total,
+                  "from_index": from_idx, "limit": page_size, "order": order}
+
+
+def _history_response(plan, payloads):
+    if plan["index"] is not None:
+        idx, label = plan["index"], plan["label"]
+        payload = payloads.get(idx)
+        if payload is None:
+            logger.info("No %s event at index %d", label, idx)
+            return {"message": f"No {label} event at index {idx}!"}, 404
+        logger.info("Found %s event at index %d", label, idx)
+        return payload, 200
+
+    seqs = plan["seqs"]
+    next_index = plan["from_index"] + len(seqs)
+    return {
+        "total": plan["total"],
+        "from_index": plan["from_index"],
+        "limit": plan["limit"],
+        "order": plan["order"],
+        "next_index": next_index if next_index < plan["total"] else None,
+        "items": [payloads[s] for s in seqs if s in payloads],
+    }, 200
+
+
+def _history(etype, label, index, filters, from_index, limit, order):
+    error, plan = _plan_history(etype, label, index, filters, from_index, limit, order)
+    if error is not None:
+        return error
+    return _history_response(plan, _fetch_payloads(etype, plan["seqs"], plan["lookup_sec"]))
+
+
+async def _history_async(etype, label, index, filters, from_index, limit, order):
+    error, plan = _plan_history(etype, label, index, filters, from_index, limit, order)
+    if error is not None:
+        return error
+    payloads = await _fetch_payloads_async(etype, plan["seqs"], plan["lookup_sec"])
+    return _history_response(plan, payloads)
+
+
+def get_admission_event(index=None, from_index=None, limit=None, order="asc",
+                        senderId=None, batchId=None, encounterId=None):
     """
-    idx = _parse_index(index)
-    if idx is None:
-        return {"message": "index must be a non-negative integer"}, 400
+    With `index`, returns the admission/discharge event (type
+    'admission_created') at that per-type index, or 404 if not found.
+    Otherwise returns a page of admission events matching the filters.
+    """
+    logger.info("GET /hospital/admission/history index=%s from_index=%s limit=%s",
+                index, from_index, limit)
+    return _history(
+        "admission_created", "admission", index,
+        {"senderId": senderId, "batchId": batchId, "encounterId": encounterId},
+        from_index, limit, order,
+    )
 
-    logger.info("GET /hospital/admission-from-queue?index=%s", idx)
 
-    consumer = _get_consumer()
+def get_capacity_event(index=None, from_index=None, limit=None, order="asc",
+                       senderId=None, batchId=None, unitId=None):
+    """
+    With `index`, returns the capacity event (type 'capacity_snapshot')
+    at that per-type index, or 404 if not found.
+    Otherwise returns a page of capacity events matching the filters.
+    """
+    logger.info("GET /hospital/capacity/history index=%s from_index=%s limit=%s",
+                index, from_index, limit)
+    return _history(
+        "capacity_snapshot", "capacity", index,
+        {"senderId": senderId, "batchId": batchId, "unitId": unitId},
+        from_index, limit, order,
+    )
 
-    admission_counter = 0
-    for msg in consumer:
-        if msg is None:
-            continue
 
-        try:
-            data = json.loads(msg.value.decode("utf-8"))
-        except Exception:
-            logger.warning("Skipping non-JSON message: %r", msg.value)
-            continue
+async def get_admission_event_async(index=None, from_index=None, limit=None, order="asc",
+                                    senderId=None, batchId=None, encounterId=None):
+    logger.info("GET /hospital/admission/history index=%s from_index=%s limit=%s",
+                index, from_index, limit)
+    return await _history_async(
+        "admission_created", "admission", index,
+        {"senderId": senderId, "batchId": batchId, "encounterId": encounterId},
+        from_index, limit, order,
+    )
 
-        etype = data.get("type")
-        payload = data.get("payload", {})
 
-        if etype == "admission_created":
-            if admission_counter == idx:
-                logger.info("Found admission event at index %d", idx)
-                return payload, 200
-            admission_counter += 1
+async def get_capacity_event_async(index=None, from_index=None, limit=None, order="asc",
+                                   senderId=None, batchId=None, unitId=None):
+    logger.info("GET /hospital/capacity/history index=%s from_index=%s limit=%s",
+                index, from_index, limit)
+    return await _history_async(
+        "capacity_snapshot", "capacity", index,
+        {"senderId": senderId, "batchId": batchId, "unitId": unitId},
+        from_index, limit, order,
+    )
 
-    logger.info("No admission event at index %d", idx)
-    return {"message": f"No admission event at index {idx}!"}, 404
 
-def get_capacity_event(index):
+def get_stats():
     """
-    Returns the capacity event (type 'capacity_snapshot')
-    at per-type index `index`, or 404 if not found.
+    Returns the event counters maintained by the tailing consumer.
     """
-    idx = _parse_index(index)
-    if idx is None:
-        return {"message": "index must be a non-negative integer"}, 400
+    logger.info("GET /stats requested")
 
-    logger.info("GET /hospital/capacity-from-queue?index=%s", idx)
+    with _STATS_LOCK:
+        stats = {
+            "num_admission_events": _STATS["num_admission_events"],
+            "num_capacity_events": _STATS["num_capacity_events"],
+            "admissions_by_sender": dict(_STATS["admissions_by_sender"]),
+            "capacity_by_sender": dict(_STATS["capacity_by_sender"]),
+            "capacity_by_unit": dict(_STATS["capacity_by_unit"]),
+            "last_event_datetime": _STATS["last_event_datetime"],
+            "consumer_lag": _STATS["consumer_lag"],
+            "last_updated": _STATS["last_updated"],
+        }
+    stats["index_memory"] = _INDEX.memory_stats()
+
+    logger.debug(
+        "Stats served: %s admission, %s capacity, lag=%s",
+        stats["num_admission_events"], stats["num_capacity_events"], stats["consumer_lag"]
+    )
+    return stats, 200
 
-    consumer = _get_consumer()
+def _storage_digests(kind, window_sec, from_sec=None, to_sec=None):
+    """{window: (count, checksum)} from storage, optionally for a recorded_at range."""
+    params = {"window_sec": window_sec}
+    if from_sec is not None:
+        params["from_sec"] = from_sec
+    if to_sec is not None:
+        params["to_sec"] = to_sec
+    r = requests.get(f"{STORAGE_URL}/hospital/{kind}/checksums", params=params, timeout=30)
+    r.raise_for_status()
+    return {d["window"]: (d["count"], d["checksum"]) for d in r.json()}
 
-    capacity_counter = 0
-    for msg in consumer:
-        if msg is None:
-            continue
 
-        try:
-            data = json.loads(msg.value.decode("utf-8"))
-        except Exception:
-            logger.warning("Skipping non-JSON message: %r", msg.value)
-            continue
+def _mismatched(kafka, stored):
+    return sorted(w for w in set(kafka) | set(stored)
+                  if kafka.get(w, (0, 0)) != stored.get(w, (0, 0)))
 
-        etype = data.get("type")
-        payload = data.get("payload", {})
 
-        if etype == "capacity_snapshot":
-            if capacity_counter == idx:
-                logger.info("Found capacity event at index %d", idx)
-                return payload, 200
-            capacity_counter += 1
+def _drill_down(etype, kind, window):
+    """
+    Narrows a mismatched window to the sub-windows whose digests also
+    differ, then compares keys for just those. Returns (sub-windows,
+    missing, extra).
+    """
+    window_sec, sub_sec = _DIGEST.window_sec, _DIGEST.subwindow_sec
+    start = window * window_sec
+    bad_subs = _mismatched(_DIGEST.sub_snapshot(etype, window),
+                           _storage_digests(kind, sub_sec, start, start + window_sec))
+
+    kafka_keys = []
+    storage_keys = []
+    for sub in bad_subs:
+        r = requests.get(f"{STORAGE_URL}/hospital/{kind}/keys",
+                         params={"window_sec": sub_sec, "window": sub}, timeout=30)
+        r.raise_for_status()
+        storage_keys.extend((k["trace_id"], k["entity_id"]) for k in r.json())
+
+        payloads = _fetch_payloads(etype, _DIGEST.seqs(etype, sub), cache=False)
+        kafka_keys.extend(event_key(etype, p) for p in payloads.values())
+
+    missing, extra = diff_keys(kafka_keys, storage_keys, MAX_REPORT_KEYS)
+    return bad_subs, missing, extra
+
+
+def _reconcile_type(etype):
+    kind = _STORAGE_KINDS[etype]
+    window_sec = _DIGEST.window_sec
+
+    from_window = None
+    if LOOKBACK_WINDOWS > 0:
+        from_window = int(time.time()) // window_sec - LOOKBACK_WINDOWS
+    stored = _storage_digests(kind, window_sec,
+                              None if from_window is None else from_window * window_sec)
+    kafka, settling = _DIGEST.snapshot(etype, SETTLE_SEC, from_window)
+
+    bad_windows = [w for w in _mismatched(kafka, stored) if w not in settling]
+
+    windows = []
+    for window in bad_windows[:MAX_DRILLDOWN_WINDOWS]:
+        bad_subs, missing, extra = _drill_down(etype, kind, window)
+        windows.append({
+            "window": window,
+            "window_start": datetime.fromtimestamp(window * window_sec, timezone.utc)
+                                    .isoformat().replace("+00:00", "Z"),
+            "kafka_count": kafka.get(window, (0, 0))[0],
+            "storage_count": stored.get(window, (0, 0))[0],
+            "subwindows_mismatched": len(bad_subs),
+            "missing_in_storage": missing,
+            "extra_in_storage": extra,
+        })
+
+    return {
+        "windows_compared": len((set(kafka) | set(stored)) - settling),
+        "windows_settling": len(settling),
+        "windows_mismatched": len(bad_windows),
+        "mismatches": windows,
+    }
 
-    logger.info("No capacity event at index %d", idx)
-    return {"message": f"No capacity event at index {idx}!"}, 404
 
-def get_stats():
+def run_reconciliation():
     """
-    Scans the whole queue and returns counts of each event type.
+    Periodic job: compare per-window digests of the Kafka topic (kept by
+    the tailing consumer) with storage's tables, and drill into windows
+    that disagree to list the trace_ids missing from or extra in storage.
     """
-    logger.info("GET /stats requested")
+    global _RECONCILE_REPORT
 
-    consumer = _get_consumer()
+    if not _RECONCILE_LOCK.acquire(blocking=False):
+        logger.info("Reconciliation already running, skipping this pass")
+        return
 
-    num_admission_events = 0
-    num_capacity_events = 0
+    try:
+        logger.info("Reconciliation started")
+        report = {
+            "window_sec": _DIGEST.window_sec,
+            "subwindow_sec": _DIGEST.subwindow_sec,
+            "started_at": _iso_now(),
+            "types": {},
+        }
+        for etype in ENTITY_FIELDS:
+            try:
+                report["types"][etype] = _reconcile_type(etype)
+            except Exception as e:
+                logger.error("Reconciliation of %s failed: %s", etype, e, exc_info=True)
+                report["types"][etype] = {"error": str(e)}
+        report["finished_at"] = _iso_now()
+        _RECONCILE_REPORT = report
+        logger.info(
+            "Reconciliation ended: %s",
+            {t: r.get("windows_mismatched", "error") for t, r in report["types"].items()}
+        )
+    finally:
+        _RECONCILE_LOCK.release()
 
-    for msg in consumer:
-        if msg is None:
-            continue
 
-        try:
-            data = json.loads(msg.value.decode("utf-8"))
-        except Exception:
-            logger.warning("Skipping non-JSON message: %r", msg.value)
-            continue
+def get_reconciliation():
+    if _RECONCILE_REPORT is None:
+        return {"message": "Reconciliation has not run yet"}, 404
+    return _RECONCILE_REPORT, 200
 
-        etype = data.get("type")
-        if etype == "admission_created":
-            num_admission_events += 1
-        elif etype == "capacity_snapshot":
-            num_capacity_events += 1
 
-    stats = {
-        "num_admission_events": num_admission_events,
-        "num_capacity_events": num_capacity_events,
-    }
+# The 0.0.4 text format, whichever version prometheus_client's
+# CONTENT_TYPE_LATEST names. No charset here: connexion wants exactly the
+# spec's type, and Flask appends "; charset=utf-8" to it by itself.
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
 
-    logger.info(
-        "Stats computed: %s admission, %s capacity",
-        num_admission_events, num_capacity_events
-    )
-    return stats, 200
 
-app = connexion.FlaskApp(__name__, specification_dir=".")
-app.add_api("openapi.yml", strict_validation=True, validate_responses=False)
+def get_metrics():
+    return generate_latest(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+
+
+def init_scheduler():
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    sched = BackgroundScheduler(daemon=True)
+    sched.add_job(run_reconciliation, "interval", seconds=RECONCILE_INTERVAL)
+    sched.start()
+    logger.info("Reconciliation scheduler started (interval=%ss)", RECONCILE_INTERVAL)
+
+
+def get_health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "healthy", "timestamp": _iso_now()}, 200
+
+
+def get_ready():
+    """Readiness: 200 once the tail is connected and has caught up."""
+    return READY.response()
+
+
+_BACKGROUND_LOCK = Lock()
+_BACKGROUND_STARTED = False
+
+
+def _start_background():
+    global _BACKGROUND_STARTED
+    with _BACKGROUND_LOCK:
+        if _BACKGROUND_STARTED:
+            return
+        _BACKGROUND_STARTED = True
+
+    t = Thread(target=tail_events)
+    t.daemon = True
+    t.start()
+
+    logger.info("Background tailing consumer thread started")
+    init_scheduler()
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    # uvicorn serves this module without running __main__, so start the
+    # background work from the ASGI lifespan instead.
+    _start_background()
+    yield
+    if _ASYNC_CONSUMER is not None:
+        await _ASYNC_CONSUMER.stop()
+
+
+def _resolve_handler(operation_id):
+    # "app.<func>" is looked up here: importing "app" again under
+    # `python app.py` would give the handlers a _STATS the tail never updates.
+    name = operation_id.rsplit(".", 1)[-1]
+    if ASYNC_HANDLERS and f"{name}_async" in globals():
+        name = f"{name}_async"
+    return globals()[name]
+
+
+if ASYNC_HANDLERS:
+    app = connexion.AsyncApp(__name__, specification_dir=".", lifespan=lifespan)
+else:
+    app = connexion.FlaskApp(__name__, specification_dir=".", lifespan=lifespan)
+app.add_api("openapi.yml", strict_validation=True, validate_responses=False,
+            resolver=Resolver(_resolve_handler))
 
 app.add_middleware(
     CORSMiddleware,
@@ -168,4 +823,10 @@ app.add_middleware(
 )
 
 if __name__ == "__main__":
-    app.run(port=8110, host="0.0.0.0")
\ No newline at end of file
+    port = int(SERVER_CONF.get("port", 8110))
+    if SERVER_CONF.get("mode", "dev") == "asgi":
+        import uvicorn
+
+        uvicorn.run(app, host="0.0.0.0", port=port, log_config=None, access_log=False)
+    else:
+        app.run(port=port, host="0.0.0.0")
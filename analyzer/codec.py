@@ -0,0 +1,71 @@
+"""
+Decoding of the Kafka event values the receiver writes (see events.codec
+in the receiver's app_conf.yml), for the tail and for payloads re-read
+for /history. decode() detects the format from the first byte, so a topic
+may hold any mix of them: JSON always starts with "{" (or whitespace);
+msgpack starts with header byte 0x01, then
+[type, datetime, payload, timing, extra] with the payload as a list in
+SCHEMA_V1 order.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; plain json is always available
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional; only needed for msgpack events
+    msgpack = None
+
+HEADER_MSGPACK_V1 = 0x01
+
+_META_V1 = ("batchId", "senderId", "reportDate", "sentAt", "version", "trace_id")
+
+# Must match the receiver's SCHEMA_V1, which never changes in place.
+SCHEMA_V1 = {
+    "admission_created": _META_V1 + ("encounterId", "event", "recordedAt", "patientAge"),
+    "capacity_snapshot": _META_V1 + ("unitId", "totalBeds", "occupiedBeds", "recordedAt"),
+}
+_TYPE_NAMES_V1 = list(SCHEMA_V1)
+
+_JSON_FIRST_BYTES = frozenset(b"{ \t\r\n")
+
+
+def _decode_msgpack_v1(value):
+    type_code, dt, body_payload, timing, extra = msgpack.unpackb(value[1:], raw=False)
+    etype = _TYPE_NAMES_V1[type_code] if isinstance(type_code, int) else type_code
+
+    if isinstance(body_payload, list):
+        payload = dict(zip(SCHEMA_V1[etype], body_payload))
+    else:
+        payload = body_payload
+    if extra:
+        payload.update(extra)
+
+    event = {"type": etype, "datetime": dt, "payload": payload}
+    if timing is not None:
+        event["timing"] = timing
+    return event
+
+
+def detect(value):
+    """Name of the format `value` is in: "json" or "msgpack"."""
+    if not value:
+        raise ValueError("Empty event value")
+    first = value[0]
+    if first in _JSON_FIRST_BYTES:
+        return "json"
+    if first == HEADER_MSGPACK_V1:
+        return "msgpack"
+    raise ValueError(f"Unknown event encoding header 0x{first:02x}")
+
+
+def decode(value):
+    """Event dict from any format the receiver writes."""
+    if detect(value) == "json":
+        return orjson.loads(value) if orjson is not None else json.loads(value)
+    if msgpack is None:
+        raise ValueError("Got a msgpack event but the msgpack package isn't installed")
+    return _decode_msgpack_v1(value)
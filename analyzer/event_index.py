@@ -0,0 +1,297 @@
+"""
+Secondary indexes over the Kafka event log, built incrementally by the
+analyzer's tailing consumer.
+
+Every event gets a per-type sequence number (0, 1, 2, ... among events of
+the same type), which is what the /history endpoints call "index". For each
+type we keep where that event lives in Kafka (partition + offset; the
+analyzer passes a source id standing for a topic partition), plus
+posting lists of sequence numbers for the fields we allow filtering on.
+Payloads themselves are not kept, apart from a bounded cache of recently
+seen / recently fetched ones; everything else is re-read from Kafka.
+
+Posting lists are stored as delta-encoded varints, so a run of events for
+the same unit costs one or two bytes per event instead of a Python int.
+Every SKIP_EVERY entries a list also records where that entry's bytes
+start, so a page is read by jumping near it and decoding only from there.
+Readers decode outside the index lock, up to the lengths they saw under
+it: the lists are append-only, so those bytes never change.
+"""
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from threading import Lock
+
+INDEXED_FIELDS = {
+    "admission_created": ("senderId", "batchId", "encounterId"),
+    "capacity_snapshot": ("senderId", "batchId", "unitId"),
+}
+
+
+SKIP_EVERY = 64
+
+
+class PostingList:
+    """Append-only, ascending list of ints stored as varint deltas."""
+
+    __slots__ = ("_buf", "_last", "_len", "_skip_pos", "_skip_val")
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._last = -1
+        self._len = 0
+        # For entry k * SKIP_EVERY: where its bytes start, and the value
+        # before it (its delta's base).
+        self._skip_pos = array("q")
+        self._skip_val = array("q")
+
+    def append(self, value):
+        if value <= self._last:
+            raise ValueError("posting list values must be strictly increasing")
+        if self._len % SKIP_EVERY == 0:
+            self._skip_pos.append(len(self._buf))
+            self._skip_val.append(self._last)
+        delta = value - self._last
+        while delta >= 0x80:
+            self._buf.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        self._buf.append(delta)
+        self._last = value
+        self._len += 1
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return self.iter_range(0, self._len)
+
+    def iter_range(self, start, stop):
+        """
+        Values of entries start .. stop-1, decoding from the nearest skip
+        point at or before `start`. `stop` must not exceed a length the
+        caller has already seen, so appends meanwhile are never read.
+        """
+        if start >= stop:
+            return
+        k = start // SKIP_EVERY
+        buf = self._buf
+        pos = self._skip_pos[k]
+        value = self._skip_val[k]
+        i = k * SKIP_EVERY
+        delta = 0
+        shift = 0
+        while i < stop:
+            byte = buf[pos]
+            pos += 1
+            delta |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            value += delta
+            if i >= start:
+                yield value
+            i += 1
+            delta = 0
+            shift = 0
+
+    def seeker(self, count):
+        """A _Seeker over the first `count` entries."""
+        return _Seeker(self, count)
+
+    def nbytes(self):
+        return len(self._buf)
+
+
+class _Seeker:
+    """Forward-only reader of a PostingList that can jump ahead to a value."""
+
+    __slots__ = ("_plist", "_count", "_skips", "_next", "_values", "_value")
+
+    def __init__(self, plist, count):
+        self._plist = plist
+        self._count = count
+        self._skips = -(-count // SKIP_EVERY)
+        self._next = 0  # index of the entry _values yields next
+        self._values = plist.iter_range(0, count)
+        self._value = -1  # last value read
+
+    def seek(self, target):
+        """The first value >= target, or None if there is none."""
+        if self._value >= target:
+            return self._value
+        skip_val = self._plist._skip_val
+        k = self._next // SKIP_EVERY + 1
+        if k < self._skips and skip_val[k] < target:
+            # target is past the next skip point: jump to the last one whose
+            # preceding value is below it, since the answer can't be before.
+            k = bisect_left(skip_val, target, k, self._skips) - 1
+            self._next = k * SKIP_EVERY
+            self._values = self._plist.iter_range(self._next, self._count)
+        read = self._next
+        for value in self._values:
+            read += 1
+            if value >= target:
+                self._next = read
+                self._value = value
+                return value
+        self._next = read
+        return None
+
+
+class _TypeIndex:
+    __slots__ = ("partitions", "offsets", "postings")
+
+    def __init__(self):
+        self.partitions = array("i")
+        self.offsets = array("q")
+        self.postings = {}
+
+
+class EventIndex:
+    """
+    Per-type position table + field posting lists + small payload cache.
+    All methods are safe to call from the tailing thread and request
+    threads at the same time.
+    """
+
+    def __init__(self, cache_size=1000):
+        self._lock = Lock()
+        self._cache_size = cache_size
+        self._types = {etype: _TypeIndex() for etype in INDEXED_FIELDS}
+        self._cache = OrderedDict()
+
+    def reset(self):
+        with self._lock:
+            self._types = {etype: _TypeIndex() for etype in INDEXED_FIELDS}
+            self._cache.clear()
+
+    def add(self, etype, partition, offset, payload):
+        """Indexes one event; returns its per-type sequence number."""
+        with self._lock:
+            tindex = self._types.get(etype)
+            if tindex is None:
+                return None
+
+            seq = len(tindex.offsets)
+            tindex.partitions.append(partition)
+            tindex.offsets.append(offset)
+
+            for field in INDEXED_FIELDS[etype]:
+                value = payload.get(field)
+                if value is None:
+                    continue
+                key = (field, str(value))
+                plist = tindex.postings.get(key)
+                if plist is None:
+                    plist = tindex.postings[key] = PostingList()
+                plist.append(seq)
+
+            self._cache_put((etype, seq), payload)
+            return seq
+
+    def count(self, etype):
+        with self._lock:
+            return len(self._types[etype].offsets)
+
+    def location(self, etype, seq):
+        """(partition, offset) of the seq-th event of this type, or None."""
+        with self._lock:
+            tindex = self._types[etype]
+            if seq < 0 or seq >= len(tindex.offsets):
+                return None
+            return tindex.partitions[seq], tindex.offsets[seq]
+
+    def select(self, etype, filters, from_index, limit, descending=False):
+        """
+        Returns (total, seqs): how many events match `filters` (a dict of
+        field -> value, all must match) and the sequence numbers of the
+        page starting at `from_index` within the matches.
+        """
+        with self._lock:
+            tindex = self._types[etype]
+            if not filters:
+                total = len(tindex.offsets)
+            else:
+                plists = []
+                for field, value in filters.items():
+                    plist = tindex.postings.get((field, str(value)))
+                    if plist is None:
+                        return 0, []
+                    plists.append((plist, len(plist)))
+
+        if not filters:
+            lo, hi = self._page_bounds(total, from_index, limit, descending)
+            return total, list(range(hi - 1, lo - 1, -1) if descending else range(lo, hi))
+
+        if len(plists) == 1:
+            plist, total = plists[0]
+            lo, hi = self._page_bounds(total, from_index, limit, descending)
+            page = list(plist.iter_range(lo, hi))
+            return total, page[::-1] if descending else page
+
+        # Walk the shortest list and look each value up in the others. The
+        # total needs the whole walk, but only the page is ever kept.
+        plists.sort(key=lambda p: p[1])
+        shortest, count = plists[0]
+        others = [plist.seeker(n) for plist, n in plists[1:]]
+        if descending:
+            # Newest matches come last: keep the tail the page falls in.
+            kept = deque(maxlen=from_index + limit)
+        else:
+            kept = []
+        total = 0
+        for seq in shortest.iter_range(0, count):
+            if all(other.seek(seq) == seq for other in others):
+                if descending or from_index <= total < from_index + limit:
+                    kept.append(seq)
+                total += 1
+
+        if descending:
+            return total, list(reversed(kept))[from_index:]
+        return total, kept
+
+    @staticmethod
+    def _page_bounds(total, from_index, limit, descending):
+        """[lo, hi) of the page within `total` ascending matches."""
+        if from_index >= total:
+            return 0, 0
+        if descending:
+            hi = total - from_index
+            return max(0, hi - limit), hi
+        return from_index, min(total, from_index + limit)
+
+    def cached(self, etype, seq, touch=True):
+        """Cached payload or None; touch=False leaves its LRU position alone."""
+        with self._lock:
+            payload = self._cache.get((etype, seq))
+            if payload is not None and touch:
+                self._cache.move_to_end((etype, seq))
+            return payload
+
+    def cache(self, etype, seq, payload):
+        with self._lock:
+            self._cache_put((etype, seq), payload)
+
+    def _cache_put(self, key, payload):
+        if self._cache_size <= 0:
+            return
+        self._cache[key] = payload
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def memory_stats(self):
+        with self._lock:
+            out = {}
+            for etype, tindex in self._types.items():
+                out[etype] = {
+                    "events": len(tindex.offsets),
+                    "keys": len(tindex.postings),
+                    "position_bytes": (
+                        tindex.offsets.itemsize * len(tindex.offsets)
+                        + tindex.partitions.itemsize * len(tindex.partitions)
+                    ),
+                    "posting_bytes": sum(p.nbytes() for p in tindex.postings.values()),
+                }
+            out["cached_payloads"] = len(self._cache)
+            return out
@@ -0,0 +1,179 @@
+"""
+Kafka-vs-storage reconciliation helpers.
+
+Events are grouped into fixed windows of `window_sec` seconds by their
+recordedAt time. For each window both sides produce a count and an
+order-independent checksum (sum of per-event key hashes mod 2**64) over
+trace_id + entity id (encounterId for admissions, unitId for capacity).
+Windows whose digests disagree are first split into sub-windows of
+`subwindow_sec`, compared the same way, and only the sub-windows that
+still disagree are drilled into key by key.
+
+The key hash and the window arithmetic must stay in step with the SQL in
+storage/app.py (`_window_checksums` / `_window_keys`).
+"""
+import hashlib
+import time
+from collections import Counter
+from datetime import datetime
+from threading import Lock
+
+from dateutil import parser
+
+from event_index import PostingList
+
+ENTITY_FIELDS = {
+    "admission_created": "encounterId",
+    "capacity_snapshot": "unitId",
+}
+
+_EPOCH = datetime(1970, 1, 1)
+_MASK = (1 << 64) - 1
+
+
+def key_hash(trace_id, entity_id):
+    digest = hashlib.md5(f"{trace_id}:{entity_id}".encode("utf-8")).hexdigest()
+    return int(digest[:15], 16)
+
+
+def event_key(etype, payload):
+    return payload.get("trace_id"), payload.get(ENTITY_FIELDS[etype])
+
+
+def epoch_seconds(recorded_at):
+    """
+    Seconds since the epoch for a recordedAt string, computed the way MySQL
+    sees the stored DATETIME: timezone dropped, rounded to whole seconds.
+    """
+    dt = parser.isoparse(recorded_at).replace(tzinfo=None)
+    return round((dt - _EPOCH).total_seconds())
+
+
+def window_of(recorded_at, window_sec):
+    """Window number for a recordedAt string."""
+    return epoch_seconds(recorded_at) // window_sec
+
+
+def diff_keys(kafka_keys, storage_keys, limit):
+    """
+    Multiset difference of (trace_id, entity_id) pairs. Returns
+    (missing, extra): in Kafka but not storage, and the other way round.
+    """
+    kafka = Counter(kafka_keys)
+    storage = Counter(storage_keys)
+
+    def _expand(counter):
+        out = []
+        for (trace_id, entity_id), n in counter.items():
+            for _ in range(n):
+                if len(out) >= limit:
+                    return out
+                out.append({"trace_id": trace_id, "entity_id": entity_id})
+        return out
+
+    return _expand(kafka - storage), _expand(storage - kafka)
+
+
+class _SubWindow:
+    __slots__ = ("count", "checksum", "seqs")
+
+    def __init__(self):
+        self.count = 0
+        self.checksum = 0
+        self.seqs = PostingList()
+
+
+class _Window:
+    __slots__ = ("count", "checksum", "subs", "touched")
+
+    def __init__(self):
+        self.count = 0
+        self.checksum = 0
+        self.subs = {}
+        self.touched = 0.0
+
+
+class WindowDigest:
+    """
+    Per-type, per-window count + checksum of what the tailing consumer has
+    seen, the same per sub-window, and the per-type sequence numbers in
+    each sub-window so a bad one can be re-read from Kafka through the
+    event index. Sub-windows are numbered like windows (seconds since the
+    epoch DIV subwindow_sec), so storage can be asked for them directly.
+    """
+
+    def __init__(self, window_sec, subwindow_sec=None):
+        subwindow_sec = subwindow_sec or window_sec
+        if window_sec % subwindow_sec:
+            raise ValueError(f"reconcile.window_sec ({window_sec}) must be a multiple of "
+                             f"subwindow_sec ({subwindow_sec})")
+        self.window_sec = window_sec
+        self.subwindow_sec = subwindow_sec
+        self._lock = Lock()
+        self._windows = {etype: {} for etype in ENTITY_FIELDS}
+
+    def reset(self):
+        with self._lock:
+            self._windows = {etype: {} for etype in ENTITY_FIELDS}
+
+    def add(self, etype, seq, payload):
+        if etype not in ENTITY_FIELDS or seq is None:
+            return
+        try:
+            seconds = epoch_seconds(payload["recordedAt"])
+        except Exception:
+            return
+        trace_id, entity_id = event_key(etype, payload)
+        h = key_hash(trace_id, entity_id)
+
+        with self._lock:
+            windows = self._windows[etype]
+            w = windows.get(seconds // self.window_sec)
+            if w is None:
+                w = windows[seconds // self.window_sec] = _Window()
+            w.count += 1
+            w.checksum = (w.checksum + h) & _MASK
+            w.touched = time.monotonic()
+
+            sub = w.subs.get(seconds // self.subwindow_sec)
+            if sub is None:
+                sub = w.subs[seconds // self.subwindow_sec] = _SubWindow()
+            sub.count += 1
+            sub.checksum = (sub.checksum + h) & _MASK
+            sub.seqs.append(seq)
+
+    def snapshot(self, etype, settle_sec, from_window=None):
+        """
+        {window: (count, checksum)} for windows that have not received an
+        event in the last `settle_sec` seconds, and the set of windows that
+        are still settling (which callers should leave alone). Windows
+        before `from_window` are left out of both.
+        """
+        cutoff = time.monotonic() - settle_sec
+        settled = {}
+        settling = set()
+        with self._lock:
+            for window, w in self._windows[etype].items():
+                if from_window is not None and window < from_window:
+                    continue
+                if w.touched > cutoff:
+                    settling.add(window)
+                else:
+                    settled[window] = (w.count, w.checksum)
+        return settled, settling
+
+    def sub_snapshot(self, etype, window):
+        """{sub-window: (count, checksum)} within one window."""
+        with self._lock:
+            w = self._windows[etype].get(window)
+            if w is None:
+                return {}
+            return {s: (sub.count, sub.checksum) for s, sub in w.subs.items()}
+
+    def seqs(self, etype, sub_window):
+        """Per-type sequence numbers of the events in one sub-window."""
+        window = sub_window * self.subwindow_sec // self.window_sec
+        with self._lock:
+            w = self._windows[etype].get(window)
+            sub = w.subs.get(sub_window) if w is not None else None
+            return list(sub.seqs) if sub is not None else []
@@ -0,0 +1,27 @@
+import msgpack
+import pytest
+
+import codec
+
+
+def test_decodes_the_receivers_msgpack_v1_layout():
+    meta = ["b", "h-1", "2025-01-01", "2025-01-01T10:00:00Z", "1.0", "t"]
+    body = [1, "2025-01-01T10:00:00", meta + ["ICU", 10, 4, "2025-01-01T09:59:00Z"],
+            {"received": 1.5, "produced": 1.6}, {"note": "late"}]
+
+    event = codec.decode(b"\x01" + msgpack.packb(body))
+
+    assert event["type"] == "capacity_snapshot"
+    assert event["payload"]["unitId"] == "ICU"
+    assert event["payload"]["note"] == "late"
+    assert event["timing"] == {"received": 1.5, "produced": 1.6}
+
+
+def test_decodes_json():
+    assert codec.decode(b'{"type": "admission_created", "payload": {}}')["type"] == "admission_created"
+
+
+@pytest.mark.parametrize("value", [b"", b"\x07junk"])
+def test_rejects_unknown_values(value):
+    with pytest.raises(ValueError):
+        codec.decode(value)
@@ -0,0 +1,196 @@
+import json
+from types import SimpleNamespace
+
+import pykafka
+from pykafka.common import OffsetType
+
+from event_index import EventIndex, PostingList
+
+
+def index_admissions(analyzer, senders):
+    for offset, sender in enumerate(senders):
+        payload = {"senderId": sender, "batchId": "b-1", "encounterId": f"E{offset}"}
+        value = json.dumps({"type": "admission_created", "datetime": "2025-01-01T10:00:00",
+                            "payload": payload}).encode()
+        analyzer._index_message("events", SimpleNamespace(value=value, offset=offset, partition_id=0))
+
+
+def test_history_pages_through_filtered_events(analyzer, client):
+    index_admissions(analyzer, ["h-1", "h-2", "h-1", "h-1", "h-2"])
+
+    r = client.get("/hospital/admission/history", params={"senderId": "h-1", "limit": 2})
+
+    assert r.status_code == 200
+    page = r.json()
+    assert page["total"] == 3
+    assert [i["encounterId"] for i in page["items"]] == ["E0", "E2"]
+    assert page["next_index"] == 2
+
+    r = client.get("/hospital/admission/history",
+                   params={"senderId": "h-1", "from_index": 2, "limit": 2})
+    assert [i["encounterId"] for i in r.json()["items"]] == ["E3"]
+    assert r.json()["next_index"] is None
+
+
+def test_history_newest_first(analyzer, client):
+    index_admissions(analyzer, ["h-1", "h-2", "h-3"])
+
+    r = client.get("/hospital/admission/history", params={"order": "desc", "limit": 2})
+
+    assert [i["encounterId"] for i in r.json()["items"]] == ["E2", "E1"]
+
+
+def test_history_single_index(analyzer, client):
+    index_admissions(analyzer, ["h-1", "h-2"])
+
+    assert client.get("/hospital/admission/history", params={"index": 1}).json()["encounterId"] == "E1"
+    assert client.get("/hospital/admission/history", params={"index": 2}).status_code == 404
+
+
+class _FakeConsumer:
+    def __init__(self):
+        self.resets = None
+
+    def reset_offsets(self, partition_offsets):
+        self.resets = partition_offsets
+
+
+class _FakeClient:
+    def __init__(self, hosts):
+        partition = SimpleNamespace(id=0)
+        self.consumer = _FakeConsumer()
+        self.topics = {b"events": SimpleNamespace(
+            partitions={0: partition},
+            get_simple_consumer=lambda **kwargs: self.consumer,
+        )}
+
+
+def test_refetch_starts_at_the_requested_offset(analyzer, monkeypatch):
+    monkeypatch.setattr(pykafka, "KafkaClient", _FakeClient)
+
+    # pykafka wants the last consumed offset; -1 would mean LATEST.
+    assert analyzer._get_consumer("events", 0, 0).resets[0][1] == OffsetType.EARLIEST
+    assert analyzer._get_consumer("events", 0, 7).resets[0][1] == 6
+
+
+def test_posting_list_round_trips():
+    plist = PostingList()
+    values = [0, 1, 5, 200, 70000]
+    for v in values:
+        plist.append(v)
+
+    assert list(plist) == values
+    assert len(plist) == len(values)
+
+
+def test_index_intersects_filters_and_evicts_payloads():
+    index = EventIndex(cache_size=2)
+    for seq in range(4):
+        index.add("capacity_snapshot", 0, seq,
+                  {"senderId": "h-1" if seq % 2 else "h-2", "unitId": "ICU", "batchId": "b"})
+
+    assert index.select("capacity_snapshot", {"senderId": "h-1", "unitId": "ICU"}, 0, 10) == (2, [1, 3])
+    assert index.select("capacity_snapshot", {"unitId": "ER"}, 0, 10) == (0, [])
+    assert index.cached("capacity_snapshot", 0) is None
+    assert index.location("capacity_snapshot", 0) == (0, 0)
+
+
+class _FakeAIOConsumer:
+    started = 0
+
+    def __init__(self, **kwargs):
+        self.messages = {}
+        self.position = 0
+
+    async def start(self):
+        _FakeAIOConsumer.started += 1
+
+    def assign(self, partitions):
+        pass
+
+    def seek(self, tp, offset):
+        self.position = offset
+
+    async def getone(self, tp):
+        value = self.messages[self.position]
+        self.position += 1
+        return SimpleNamespace(offset=self.position - 1, value=value)
+
+
+def test_async_history_reuses_one_consumer(analyzer, monkeypatch):
+    import asyncio
+
+    import aiokafka
+
+    monkeypatch.setattr(aiokafka, "AIOKafkaConsumer", _FakeAIOConsumer)
+    monkeypatch.setattr(analyzer, "_ASYNC_CONSUMER", None)
+    monkeypatch.setattr(analyzer, "_ASYNC_CONSUMER_LOCK", None)
+    monkeypatch.setattr(analyzer, "_INDEX", EventIndex(cache_size=0))
+    _FakeAIOConsumer.started = 0
+    index_admissions(analyzer, ["h-1", "h-2"])
+
+    async def fetch_twice():
+        consumer = await analyzer._get_async_consumer()
+        consumer.messages = {
+            offset: json.dumps({"type": "admission_created",
+                                "payload": {"encounterId": f"E{offset}"}}).encode()
+            for offset in range(2)}
+        first = await analyzer._fetch_payloads_async("admission_created", [0])
+        second = await analyzer._fetch_payloads_async("admission_created", [1])
+        return first, second
+
+    first, second = asyncio.run(fetch_twice())
+
+    assert first == {0: {"encounterId": "E0"}}
+    assert second == {1: {"encounterId": "E1"}}
+    assert _FakeAIOConsumer.started == 1
+
+
+def test_select_matches_a_brute_force_scan():
+    import random
+
+    rng = random.Random(7)
+    index = EventIndex(cache_size=0)
+    payloads = []
+    for seq in range(1500):
+        payload = {"senderId": f"h-{rng.randint(1, 3)}", "unitId": f"U{rng.randint(1, 4)}",
+                   "batchId": f"b-{seq // 700}"}
+        payloads.append(payload)
+        index.add("capacity_snapshot", 0, seq, payload)
+
+    for filters in ({"unitId": "U2"}, {"senderId": "h-1", "unitId": "U3"},
+                    {"senderId": "h-2", "unitId": "U1", "batchId": "b-1"}):
+        matches = [seq for seq, p in enumerate(payloads)
+                   if all(p[k] == v for k, v in filters.items())]
+        for from_index, limit in ((0, 50), (130, 7), (len(matches) - 3, 10), (len(matches), 5)):
+            assert index.select("capacity_snapshot", filters, from_index, limit) == (
+                len(matches), matches[from_index:from_index + limit])
+            newest_first = matches[::-1]
+            assert index.select("capacity_snapshot", filters, from_index, limit, descending=True) == (
+                len(matches), newest_first[from_index:from_index + limit])
+
+
+def test_posting_list_reads_a_range_from_its_skip_points():
+    plist = PostingList()
+    values = list(range(0, 3000, 3))
+    for v in values:
+        plist.append(v)
+
+    assert list(plist.iter_range(130, 140)) == values[130:140]
+    seeker = plist.seeker(len(values))
+    assert [seeker.seek(t) for t in (0, 1, 700, 2000, 2998)] == [0, 3, 702, 2001, None]
+
+    # Entries appended after a reader took the length stay out of its view.
+    seen = len(plist)
+    plist.append(5000)
+    assert list(plist.iter_range(seen - 2, seen)) == values[-2:]
+    assert plist.seeker(seen).seek(2999) is None
+
+
+def test_stats_report_index_memory(analyzer, client):
+    index_admissions(analyzer, ["h-1", "h-2"])
+
+    memory = client.get("/stats").json()["index_memory"]
+
+    assert memory["admission_created"]["events"] == 2
+    assert memory["admission_created"]["posting_bytes"] > 0
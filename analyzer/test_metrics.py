@@ -0,0 +1,56 @@
+import json
+import math
+
+import aiokafka
+from prometheus_client import REGISTRY
+
+from event_index import EventIndex
+from test_history import _FakeAIOConsumer, index_admissions
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class _AdmissionsConsumer(_FakeAIOConsumer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.messages = {
+            offset: json.dumps({"type": "admission_created",
+                                "payload": {"encounterId": f"E{offset}"}}).encode()
+            for offset in range(2)}
+
+
+def test_a_history_request_moves_the_lookup_and_scan_series(analyzer, client, monkeypatch):
+    monkeypatch.setattr(aiokafka, "AIOKafkaConsumer", _AdmissionsConsumer)
+    monkeypatch.setattr(analyzer, "_ASYNC_CONSUMER", None)
+    monkeypatch.setattr(analyzer, "_ASYNC_CONSUMER_LOCK", None)
+    # Room for one payload: E1 is served from the cache, E0 from Kafka.
+    monkeypatch.setattr(analyzer, "_INDEX", EventIndex(cache_size=1))
+    series = [("analyzer_messages_total", {"result": "indexed"}),
+              ("analyzer_lookup_seconds_count", {"etype": "admission_created"}),
+              ("analyzer_scan_seconds_count", {"etype": "admission_created"}),
+              ("analyzer_payloads_total", {"etype": "admission_created", "source": "cache"}),
+              ("analyzer_payloads_total", {"etype": "admission_created", "source": "kafka"})]
+    before = [sample(name, **labels) for name, labels in series]
+
+    index_admissions(analyzer, ["h-1", "h-2"])
+    r = client.get("/hospital/admission/history", params={"limit": 2})
+
+    assert [i["encounterId"] for i in r.json()["items"]] == ["E0", "E1"]
+    after = [sample(name, **labels) for name, labels in series]
+    assert [a - b for a, b in zip(after, before)] == [2, 1, 1, 1, 1]
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'analyzer_scan_seconds_count{etype="admission_created"}' in r.text
+
+
+def test_consumer_lag_follows_the_tail(analyzer, monkeypatch):
+    assert math.isnan(sample("analyzer_kafka_consumer_lag"))  # tail not started
+
+    monkeypatch.setattr(analyzer, "_consumer_lag", lambda consumer: 42)
+    analyzer._refresh_lag([("events", object())], caught_up=True)
+
+    assert sample("analyzer_kafka_consumer_lag") == 42
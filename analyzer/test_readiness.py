@@ -0,0 +1,76 @@
+import logging
+
+import pytest
+
+from readiness import Readiness, with_backoff
+
+
+@pytest.fixture
+def ready(analyzer, monkeypatch):
+    ready = Readiness(required=["kafka", "index"])
+    monkeypatch.setattr(analyzer, "READY", ready)
+    return ready
+
+
+def test_ready_waits_for_kafka_and_the_index(ready, client):
+    ready.mark("kafka", True, "connected")
+
+    r = client.get("/ready")
+
+    assert r.status_code == 503
+    assert r.json()["status"] == "starting"
+    assert r.json()["checks"]["index"] == {"ok": False, "detail": "not started"}
+    assert r.json()["ready_after_sec"] is None
+
+    ready.mark("index", True, "caught up")
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["ready_after_sec"] is not None
+
+
+def test_index_is_ready_within_the_lag_tolerance_and_stays_ready(analyzer, ready, client, monkeypatch):
+    lags = iter([analyzer.READY_LAG + 1, analyzer.READY_LAG, analyzer.READY_LAG * 5])
+    monkeypatch.setattr(analyzer, "_consumer_lag", lambda consumer: next(lags))
+    consumers = [("events", object())]
+    ready.mark("kafka", True, "connected")
+
+    assert analyzer._refresh_lag(consumers, False) is False
+    assert client.get("/ready").status_code == 503
+
+    assert analyzer._refresh_lag(consumers, False) is True
+    assert client.get("/ready").status_code == 200
+
+    # Falling behind again under load doesn't take the analyzer out of rotation.
+    assert analyzer._refresh_lag(consumers, True) is True
+    assert client.get("/ready").status_code == 200
+    assert client.get("/stats").json()["consumer_lag"] == analyzer.READY_LAG * 5
+
+
+def test_with_backoff_retries_until_connected(monkeypatch):
+    import readiness
+
+    monkeypatch.setattr(readiness.time, "sleep", lambda sec: None)
+    ready = Readiness(required=["kafka"])
+    attempts = []
+
+    def connect():
+        attempts.append(len(attempts))
+        if len(attempts) < 3:
+            raise ConnectionError("no brokers")
+        return "consumer"
+
+    assert with_backoff(ready, "kafka", connect, logging.getLogger("test")) == "consumer"
+    body, status = ready.response()
+    assert status == 200
+    assert body["checks"]["kafka"]["detail"] == "connected after 3 attempts"
+
+
+def test_losing_kafka_after_startup_is_not_ready_rather_than_starting(ready, client):
+    ready.mark("kafka", True, "connected")
+    ready.mark("index", True, "caught up")
+
+    ready.mark("kafka", False, "consumer failed: broker gone")
+
+    r = client.get("/ready")
+    assert r.status_code == 503
+    assert r.json()["status"] == "not_ready"
@@ -0,0 +1,142 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from reconcile import WindowDigest, diff_keys, epoch_seconds, key_hash
+
+
+def iso(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeStorage:
+    """Answers the analyzer's /checksums and /keys requests from a list of rows."""
+
+    def __init__(self, rows):
+        self.rows = rows  # (recorded_at seconds, trace_id, entity_id)
+        self.key_requests = []
+
+    def get(self, url, params, timeout):
+        size = params["window_sec"]
+        if url.endswith("/keys"):
+            self.key_requests.append(params["window"])
+            body = [{"trace_id": t, "entity_id": e} for s, t, e in self.rows
+                    if s // size == params["window"]]
+        else:
+            digests = {}
+            for s, t, e in self.rows:
+                if s < params.get("from_sec", s) or s >= params.get("to_sec", s + 1):
+                    continue
+                n, h = digests.get(s // size, (0, 0))
+                digests[s // size] = (n + 1, (h + key_hash(t, e)) % (1 << 64))
+            body = [{"window": w, "count": n, "checksum": h} for w, (n, h) in digests.items()]
+        return SimpleNamespace(json=lambda: body, raise_for_status=lambda: None)
+
+
+class FakeConsumer(list):
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def reconciler(analyzer, monkeypatch):
+    monkeypatch.setattr(analyzer, "SETTLE_SEC", 0)
+    monkeypatch.setattr(analyzer, "LOOKBACK_WINDOWS", 0)
+    return analyzer
+
+
+def index_capacity(analyzer, rows):
+    for offset, (seconds, trace_id, unit) in enumerate(rows):
+        payload = {"senderId": "h-1", "unitId": unit, "trace_id": trace_id, "recordedAt": iso(seconds)}
+        value = json.dumps({"type": "capacity_snapshot", "payload": payload}).encode()
+        analyzer._index_message("events", SimpleNamespace(value=value, offset=offset, partition_id=0))
+
+
+def test_drill_down_only_fetches_keys_for_mismatched_sub_windows(reconciler, monkeypatch):
+    start = 7200 * 1000
+    kafka = [(start + 5, "t1", "ICU"), (start + 10, "t2", "ER"), (start + 130, "t3", "ICU")]
+    index_capacity(reconciler, kafka)
+    storage = FakeStorage(kafka[:2])
+    monkeypatch.setattr(reconciler, "requests", storage)
+
+    report = reconciler._reconcile_type("capacity_snapshot")
+
+    assert report["windows_compared"] == 1
+    assert report["windows_mismatched"] == 1
+    window = report["mismatches"][0]
+    assert window["subwindows_mismatched"] == 1
+    assert window["missing_in_storage"] == [{"trace_id": "t3", "entity_id": "ICU"}]
+    assert window["extra_in_storage"] == []
+    # Only the sub-window holding t3 was read key by key.
+    assert storage.key_requests == [(start + 130) // 60]
+
+
+def test_settling_windows_are_not_counted_as_compared(reconciler, monkeypatch):
+    digest = (1, key_hash("t1", "ICU"))
+    monkeypatch.setattr(reconciler._DIGEST, "snapshot", lambda etype, settle, since: ({1: digest}, {2}))
+    monkeypatch.setattr(reconciler, "_storage_digests", lambda *args: {1: digest})
+
+    report = reconciler._reconcile_type("capacity_snapshot")
+
+    assert report["windows_compared"] == 1
+    assert report["windows_settling"] == 1
+    assert report["windows_mismatched"] == 0
+
+
+def test_lookback_limits_both_sides(reconciler, monkeypatch):
+    now_window = int(datetime.now(timezone.utc).timestamp()) // 3600
+    monkeypatch.setattr(reconciler, "LOOKBACK_WINDOWS", 2)
+    old = (now_window - 10) * 3600
+    index_capacity(reconciler, [(old, "t-old", "ICU")])
+    monkeypatch.setattr(reconciler, "requests", FakeStorage([(old + 1, "t-other", "ER")]))
+
+    report = reconciler._reconcile_type("capacity_snapshot")
+
+    assert report["windows_compared"] == 0
+
+
+def test_digest_splits_windows_into_sub_windows():
+    digest = WindowDigest(3600, 600)
+    digest.add("admission_created", 0, {"recordedAt": iso(3600), "trace_id": "a", "encounterId": "E1"})
+    digest.add("admission_created", 1, {"recordedAt": iso(3600 + 700), "trace_id": "b", "encounterId": "E2"})
+
+    settled, _ = digest.snapshot("admission_created", 0)
+    assert settled == {1: (2, key_hash("a", "E1") + key_hash("b", "E2"))}
+    assert digest.sub_snapshot("admission_created", 1) == {6: (1, key_hash("a", "E1")),
+                                                             7: (1, key_hash("b", "E2"))}
+    assert digest.seqs("admission_created", 7) == [1]
+
+
+def test_digest_rejects_sub_windows_that_do_not_divide_the_window():
+    with pytest.raises(ValueError):
+        WindowDigest(3600, 7)
+
+
+def test_window_arithmetic_drops_the_timezone_like_mysql():
+    assert epoch_seconds("1970-01-01T01:00:00.4+05:00") == 3600
+
+
+def test_diff_keys_is_a_multiset_difference():
+    missing, extra = diff_keys([("t1", "E"), ("t1", "E"), ("t2", "E")], [("t1", "E"), ("t3", "E")], 10)
+
+    assert missing == [{"trace_id": "t1", "entity_id": "E"}, {"trace_id": "t2", "entity_id": "E"}]
+    assert extra == [{"trace_id": "t3", "entity_id": "E"}]
+
+
+def test_reconciliation_reads_leave_the_payload_cache_alone(analyzer, monkeypatch):
+    from event_index import EventIndex
+
+    monkeypatch.setattr(analyzer, "_INDEX", EventIndex(cache_size=1))
+    index_capacity(analyzer, [(60, "t1", "ICU"), (61, "t2", "ER")])  # t1 is evicted
+    evicted = analyzer._INDEX.location("capacity_snapshot", 0)
+    value = json.dumps({"type": "capacity_snapshot", "payload": {"trace_id": "t1"}}).encode()
+    monkeypatch.setattr(analyzer, "_get_consumer", lambda topic, partition, offset: FakeConsumer(
+        [SimpleNamespace(offset=evicted[1], value=value)]))
+
+    found = analyzer._fetch_payloads("capacity_snapshot", [0], cache=False)
+
+    assert found == {0: {"trace_id": "t1"}}
+    assert analyzer._INDEX.cached("capacity_snapshot", 0) is None
+    assert analyzer._INDEX.cached("capacity_snapshot", 1)["trace_id"] == "t2"
@@ -0,0 +1,38 @@
+import json
+from types import SimpleNamespace
+
+
+def message(etype, offset, payload, dt="2025-01-01T10:00:00"):
+    value = json.dumps({"type": etype, "datetime": dt, "payload": payload}).encode()
+    return SimpleNamespace(value=value, offset=offset, partition_id=0)
+
+
+def test_stats_reflect_messages_read_by_the_tail(analyzer, client):
+    analyzer._index_message("events", message(
+        "admission_created", 0, {"senderId": "h-1", "encounterId": "E1"}))
+    analyzer._index_message("events", message(
+        "admission_created", 1, {"senderId": "h-2", "encounterId": "E2"}, dt="2025-01-01T11:00:00"))
+    analyzer._index_message("events", message(
+        "capacity_snapshot", 2, {"senderId": "h-1", "unitId": "ICU-2A"}))
+
+    r = client.get("/stats")
+
+    assert r.status_code == 200
+    stats = r.json()
+    assert stats["num_admission_events"] == 2
+    assert stats["num_capacity_events"] == 1
+    assert stats["admissions_by_sender"] == {"h-1": 1, "h-2": 1}
+    assert stats["capacity_by_unit"] == {"ICU-2A": 1}
+    assert stats["last_event_datetime"] == "2025-01-01T11:00:00"
+
+
+def test_undecodable_messages_are_skipped(analyzer, client):
+    analyzer._index_message("events", SimpleNamespace(value=b"\xffnot an event", offset=0,
+                                                      partition_id=0))
+
+    assert client.get("/stats").json()["num_admission_events"] == 0
+
+
+def test_handlers_resolve_to_this_module(analyzer):
+    # Importing "app" a second time would give handlers their own _STATS.
+    assert analyzer._resolve_handler("app.get_stats") is analyzer.get_stats
@@ -0,0 +1,22 @@
+import pytest
+
+from topics import consume_topics
+
+PER_TYPE = {"topic": "events", "routing": "per_type",
+            "topics": {"admission_created": "events.admission",
+                       "capacity_snapshot": "events.capacity"}}
+
+
+def test_shared_routing_reads_one_topic():
+    assert consume_topics({"topic": "events"}) == ["events"]
+
+
+def test_per_type_keeps_reading_the_shared_topic_by_default():
+    assert consume_topics(PER_TYPE) == ["events", "events.admission", "events.capacity"]
+    assert consume_topics({**PER_TYPE, "consume_legacy": False}) == [
+        "events.admission", "events.capacity"]
+
+
+def test_per_type_needs_a_topic_for_every_type():
+    with pytest.raises(ValueError):
+        consume_topics({**PER_TYPE, "topics": {"capacity_snapshot": "events.capacity"}})
@@ -1,51 +1,29 @@
-// const PROCESSING_STATS_API_URL = "/processing/stats"
+// All dashboard data comes from one Server-Sent Events stream served by the
+// health service (proxied by nginx). The backend builds a single snapshot per
+// interval for every viewer and only pushes the sections that changed.
 
-const PROCESSING_STATS_API_URL = "http://localhost:8100/stats"
+const FEED_URL = "/health/feed"
 
-const randomIndex = () => Math.floor(Math.random() * 100) + 1;
+// const FEED_URL = "http://gautamdhoopar3855.westus3.cloudapp.azure.com:2026/health/feed"
 
-const HEALTH_STATUS_API_URL = "http://localhost:8120/status";
-
-// const HEALTH_STATUS_API_URL = "http://gautamdhoopar3855.westus3.cloudapp.azure.com:8120/status";
-
-// const ANALYZER_API_URL = {
-//     stats: "/analyzer/stats",
-//     admission: () => `/analyzer/hospital/admission/history?index=${randomIndex()}`,
-//     capacity: () => `/analyzer/hospital/capacity/history?index=${randomIndex()}`
-// }
-
-// const HEALTH_STATUS_API_URL = "http://gautamdhoopar3855.westus3.cloudapp.azure.com:8120/status";
-
-const ANALYZER_API_URL = {
-    stats: "http://localhost:8110/stats",
-    admission: () => `http://localhost:8110/hospital/admission/history?index=${randomIndex()}`,
-    capacity: () => `http://localhost:8110/hospital/capacity/history?index=${randomIndex()}`
+// feed section (SSE event name) -> element it renders into
+const FEED_SECTIONS = {
+    processing_stats: "processing-stats",
+    analyzer_stats: "analyzer-stats",
+    admission_event: "event-admission",
+    capacity_event: "event-capacity",
+    health_status: "health-status"
 }
 
-const makeReq = (url, cb) => {
-    fetch(url)
-        .then(res => res.json())
-        .then((result) => {
-            console.log("Received data: ", result)
-            cb(result);
-        }).catch((error) => {
-            updateErrorMessages(error.message)
-        })
-}
+const getLocaleDateStr = () => (new Date()).toLocaleString()
 
 const updateCodeDiv = (result, elemId) => {
     document.getElementById(elemId).innerText = JSON.stringify(result)
 }
-const getLocaleDateStr = () => (new Date()).toLocaleString()
 
-const getStats = () => {
-    document.getElementById("last-updated-value").innerText = getLocaleDateStr()
-    
-    makeReq(PROCESSING_STATS_API_URL, (result) => updateCodeDiv(result, "processing-stats"))
-    
-    makeReq(ANALYZER_API_URL.stats, (result) => updateCodeDiv(result, "analyzer-stats"))
-    makeReq(ANALYZER_API_URL.admission(), (result) => updateCodeDiv(result, "event-admission"))
-    makeReq(ANALYZER_API_URL.capacity(), (result) => updateCodeDiv(result, "event-capacity"))
+const updateHealth = (result) => {
+    document.getElementById("health-status").textContent =
+        JSON.stringify(result, null, 2);
 }
 
 const updateErrorMessages = (message) => {
@@ -62,26 +40,34 @@ const updateErrorMessages = (message) => {
     }, 7000)
 }
 
-function updateHealth() {
-    fetch(HEALTH_STATUS_API_URL)
-        .then(res => res.json())
-        .then(data => {
-            document.getElementById("health-status").textContent =
-                JSON.stringify(data, null, 2);
-        })
-        .catch(err => {
-            console.error("Error fetching health status", err);
-            document.getElementById("health-status").textContent =
-                "Error fetching health status";
-        });
-}
+const onSection = (name, elemId) => (event) => {
+    const section = JSON.parse(event.data)
+    console.log("Received data: ", name, section)
+    document.getElementById("last-updated-value").innerText = getLocaleDateStr()
 
-setInterval(updateHealth, 5000);
-updateHealth();
+    if (section.error) {
+        updateErrorMessages(`${name}: ${section.error}`)
+        return
+    }
+    if (name === "health_status") {
+        updateHealth(section.data)
+    } else {
+        updateCodeDiv(section.data, elemId)
+    }
+}
 
 const setup = () => {
-    getStats()
-    setInterval(() => getStats(), 4000)
+    // EventSource reconnects on its own (sending Last-Event-ID), so errors
+    // only need reporting.
+    const source = new EventSource(FEED_URL)
+
+    Object.entries(FEED_SECTIONS).forEach(([name, elemId]) => {
+        source.addEventListener(name, onSection(name, elemId))
+    })
+
+    source.onerror = () => {
+        updateErrorMessages("Lost connection to the dashboard feed, retrying")
+    }
 }
 
-document.addEventListener('DOMContentLoaded', setup)
\ No newline at end of file
+document.addEventListener('DOMContentLoaded', setup)
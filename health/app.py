@@ -1,22 +1,39 @@
+import copy
 import json
 import logging
-import logging.config
+import math
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
+from threading import Lock
 
 import connexion
+import flask
+from connexion.resolver import Resolver
 import requests
+from requests.adapters import HTTPAdapter
 import yaml
 from apscheduler.schedulers.background import BackgroundScheduler
+from prometheus_client import Counter, Histogram, generate_latest
 from connexion import NoContent
 
-with open("/app/config/log_conf.yml", "r") as f:
+from feed import FeedHub, sse_event
+from history import ProbeHistory, STATUS_NAMES
+import log_setup
+
+# Mounted at /app/config by compose; the tests point this at their own copy.
+CONFIG_DIR = os.environ.get("APP_CONFIG_DIR", "/app/config")
+
+with open(f"{CONFIG_DIR}/log_conf.yml", "r") as f:
     LOG_CONF = yaml.safe_load(f.read())
     
-logging.config.dictConfig(LOG_CONF)
+log_setup.configure(LOG_CONF)
 logger = logging.getLogger("basicLogger")
 
-with open("/app/config/app_conf.yml", "r") as f:
+with open(f"{CONFIG_DIR}/app_conf.yml", "r") as f:
     APP_CONF = yaml.safe_load(f.read())
 
 STATUS_FILE = Path(APP_CONF["datastore"]["filename"])
@@ -24,6 +41,61 @@ CHECK_INTERVAL = APP_CONF["scheduler"]["period_sec"]
 
 SERVICES = APP_CONF["services"]  
 
+PROBE_CONF = APP_CONF.get("probe", {})
+PROBE_TIMEOUT = float(PROBE_CONF.get("timeout_sec", 2))
+# Hard cap on one whole pass, so a pass always finishes inside period_sec.
+PASS_DEADLINE = float(PROBE_CONF.get("deadline_sec", 4))
+
+# Twice the services: a probe that overran the last pass's deadline keeps
+# its worker (and connection) until its own timeout, and mustn't delay the
+# next pass.
+_PROBE_WORKERS = 2 * len(SERVICES)
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=len(SERVICES), pool_maxsize=_PROBE_WORKERS))
+_EXECUTOR = ThreadPoolExecutor(max_workers=_PROBE_WORKERS, thread_name_prefix="probe")
+
+# Latest status served by /status; the file is only kept for restarts.
+_SNAPSHOT_LOCK = Lock()
+_SNAPSHOT = {}
+_PASS_LOCK = Lock()
+
+PROBE_SECONDS = Histogram(
+    "health_probe_seconds", "Latency of one successful probe", ["service"])
+PASS_SECONDS = Histogram(
+    "health_pass_seconds", "Time to complete one pass over all services")
+PROBES = Counter(
+    "health_probes_total", "Probes run, by service and resulting status", ["service", "status"])
+
+HISTORY_CONF = APP_CONF.get("history", {})
+HISTORY_WINDOWS = [int(w) for w in HISTORY_CONF.get("windows_sec", [300, 3600])]
+# A service is flagged as flapping when it changes state at least this
+# many times within the shortest history window.
+FLAP_TRANSITIONS = int(HISTORY_CONF.get("flap_transitions", 4))
+# One sample per pass, so the ring holds exactly the longest window; a
+# fixed size would quietly cut longer windows short.
+HISTORY_SAMPLES = math.ceil(max(HISTORY_WINDOWS) / CHECK_INTERVAL) + 1
+_HISTORY = {name: ProbeHistory(HISTORY_SAMPLES) for name in SERVICES}
+
+# Dashboard feed: one snapshot per interval shared by every SSE client.
+FEED_CONF = APP_CONF.get("feed", {})
+FEED_INTERVAL = float(FEED_CONF.get("interval_sec", 4))
+FEED_KEEPALIVE = float(FEED_CONF.get("keepalive_sec", 15))
+FEED_MAX_CLIENTS = int(FEED_CONF.get("max_clients", 50))
+FEED_TIMEOUT = float(FEED_CONF.get("timeout_sec", 2))
+FEED_SOURCES = FEED_CONF.get("sources", {
+    "processing": "http://processing:8100",
+    "analyzer": "http://analyzer:8110",
+})
+_FEED = FeedHub()
+_FEED_LOCK = Lock()
+_FEED_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="feed")
+
+FEED_SECONDS = Histogram(
+    "health_feed_refresh_seconds", "Time to build one dashboard feed snapshot")
+FEED_PUSHES = Counter(
+    "health_feed_sections_changed_total", "Feed sections published with new content", ["section"])
+
 
 def _now_iso():
     return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -46,39 +118,254 @@ def _save_status(data):
     tmp.replace(STATUS_FILE)
 
 
+def _probe(name, info):
+    """GETs one service's probe URL; returns (status, latency_ms, detail)."""
+    url = info["url"]
+    timeout = float(info.get("timeout_sec", PROBE_TIMEOUT))
+    started = time.monotonic()
+    latency_ms = None
+    try:
+        r = _SESSION.get(url, timeout=timeout)
+        latency_ms = (time.monotonic() - started) * 1000.0
+        detail = r.json() if "application/json" in r.headers.get("Content-Type", "") else {}
+        if r.status_code == 200:
+            status = "up"
+        elif r.status_code == 503 and detail.get("status") == "starting":
+            # /ready before the service was first ready. Once it has been,
+            # a 503 says "not_ready" and counts as degraded below.
+            status = "starting"
+        else:
+            status = "degraded"
+        logger.info("Health check %s -> %s", name, status)
+    except Exception as e:
+        status = "down"
+        detail = {"error": str(e)}
+        logger.warning("Health check failed for %s: %s", name, e)
+    return status, latency_ms, detail
+
+
+def _record(name, status, latency_ms, detail):
+    """
+    The one sample a pass keeps per service. Only the pass calls this, so
+    a probe that finishes after the deadline adds nothing to the history.
+    """
+    _HISTORY[name].record(status, latency_ms)
+    PROBES.labels(name, status).inc()
+    if latency_ms is not None:
+        PROBE_SECONDS.labels(name).observe(latency_ms / 1000.0)
+
+    return {
+        "status": status,
+        "checked_at": _now_iso(),
+        "latency_ms": None if latency_ms is None else round(latency_ms, 1),
+        "flapping": _is_flapping(name),
+        "detail": detail,
+    }
+
+
+def _is_flapping(name):
+    window = min(HISTORY_WINDOWS)
+    return _HISTORY[name].summary(window)["transitions"] >= FLAP_TRANSITIONS
+
+
 def check_all_services():
-    logger.info("Health service: running periodic checks")
-    data = _load_status()
-    data.setdefault("services", {})
-    data["last_checked"] = _now_iso()
+    # APScheduler already runs this with max_instances=1; the lock also
+    # covers manual calls racing the scheduler.
+    if not _PASS_LOCK.acquire(blocking=False):
+        logger.warning("Health service: previous pass still running, skipping")
+        return
 
-    for name, info in SERVICES.items():
-        url = info["url"]
-        try:
-            r = requests.get(url, timeout=3)
-            status = "up" if r.status_code == 200 else "degraded"
-            detail = r.json() if "application/json" in r.headers.get("Content-Type", "") else {}
-            logger.info("Health check %s -> %s", name, status)
-        except Exception as e:
-            status = "down"
-            detail = {"error": str(e)}
-            logger.warning("Health check failed for %s: %s", name, e)
-
-        data["services"][name] = {
-            "status": status,
-            "checked_at": _now_iso(),
-            "detail": detail,
+    try:
+        logger.info("Health service: running periodic checks")
+        started = time.perf_counter()
+        with _SNAPSHOT_LOCK:
+            data = copy.deepcopy(_SNAPSHOT)
+        data.setdefault("services", {})
+        data["last_checked"] = _now_iso()
+
+        futures = {
+            name: _EXECUTOR.submit(_probe, name, info)
+            for name, info in SERVICES.items()
         }
+        done, _ = wait(futures.values(), timeout=PASS_DEADLINE)
+
+        for name, fut in futures.items():
+            if fut in done:
+                data["services"][name] = _record(name, *fut.result())
+                continue
+            # Drops it if it never started; otherwise its result is ignored.
+            fut.cancel()
+            logger.warning("Health check for %s missed the %ss pass deadline", name, PASS_DEADLINE)
+            data["services"][name] = _record(
+                name, "down", None,
+                {"error": f"no response within {PASS_DEADLINE}s pass deadline"})
+
+        with _SNAPSHOT_LOCK:
+            _SNAPSHOT.clear()
+            _SNAPSHOT.update(data)
+
+        _save_status(data)
+        PASS_SECONDS.observe(time.perf_counter() - started)
+        _publish({"health_status": {"data": data, "error": None}})
+    finally:
+        _PASS_LOCK.release()
+
+
+def _publish(sections):
+    for name in _FEED.publish(sections):
+        FEED_PUSHES.labels(name).inc()
+
+
+def _fetch_json(url):
+    """{"data": ..., "error": None} on a 200, otherwise {"data": None, "error": ...}."""
+    try:
+        r = _SESSION.get(url, timeout=FEED_TIMEOUT)
+        body = r.json()
+        if r.status_code != 200:
+            return {"data": None, "error": body.get("message") or f"HTTP {r.status_code}"}
+        return {"data": body, "error": None}
+    except Exception as e:
+        return {"data": None, "error": str(e)}
+
 
-    _save_status(data)
+def _sample_event(kind, count):
+    if not count:
+        return {"data": None, "error": f"No {kind} events yet"}
+    index = random.randrange(count)
+    url = f"{FEED_SOURCES['analyzer']}/hospital/{kind}/history?index={index}"
+    return _fetch_json(url)
+
+
+def refresh_feed(force=False):
+    """
+    Builds one combined dashboard snapshot and publishes the sections that
+    changed. Skipped while nobody is connected, unless forced.
+    """
+    if not force and _FEED.clients == 0:
+        return
+    if not _FEED_LOCK.acquire(blocking=False):
+        return
+
+    try:
+        started = time.perf_counter()
+        processing = _FEED_EXECUTOR.submit(_fetch_json, f"{FEED_SOURCES['processing']}/stats")
+        analyzer = _fetch_json(f"{FEED_SOURCES['analyzer']}/stats")
+        counts = analyzer["data"] or {}
+
+        admission = _FEED_EXECUTOR.submit(
+            _sample_event, "admission", counts.get("num_admission_events"))
+        capacity = _sample_event("capacity", counts.get("num_capacity_events"))
+
+        with _SNAPSHOT_LOCK:
+            health = copy.deepcopy(_SNAPSHOT)
+
+        _publish({
+            "processing_stats": processing.result(),
+            "analyzer_stats": analyzer,
+            "admission_event": admission.result(),
+            "capacity_event": capacity,
+            "health_status": {"data": health or None,
+                              "error": None if health else "No status collected yet"},
+        })
+        FEED_SECONDS.observe(time.perf_counter() - started)
+    except Exception:
+        logger.exception("Dashboard feed refresh failed")
+    finally:
+        _FEED_LOCK.release()
 
 def get_overall_status():
-    data = _load_status()
+    with _SNAPSHOT_LOCK:
+        data = copy.deepcopy(_SNAPSHOT)
     if not data:
         return {"message": "No status collected yet"}, 404
     return data, 200
 
 
+def get_status_history(service=None, since=None):
+    """
+    Per-service latency percentiles, uptime and transition counts for each
+    configured window, plus the raw samples as parallel arrays.
+    """
+    if service is not None and service not in _HISTORY:
+        return {"message": f"Unknown service {service}"}, 404
+
+    now = time.time()
+    start = now - max(HISTORY_WINDOWS) if since is None else float(since)
+    names = [service] if service is not None else list(_HISTORY)
+
+    out = {}
+    for name in names:
+        hist = _HISTORY[name]
+        samples = hist.samples(start)
+        out[name] = {
+            "flapping": _is_flapping(name),
+            "windows": {str(w): hist.summary(w, now) for w in HISTORY_WINDOWS},
+            "samples": {
+                "t": [round(ts, 3) for ts, _, _ in samples],
+                "latency_ms": [None if lat != lat else round(lat, 1) for _, lat, _ in samples],
+                "status": [STATUS_NAMES[st] for _, _, st in samples],
+            },
+        }
+
+    return {"generated_at": _now_iso(), "services": out}, 200
+
+
+def get_feed():
+    """
+    Server-Sent Events stream of the dashboard feed. Each event is one
+    section (named by the event type) carrying {"data", "error"}; the event
+    id is the feed version, so a reconnecting browser (Last-Event-ID) only
+    receives what changed while it was away.
+    """
+    if not _FEED.connect(FEED_MAX_CLIENTS):
+        return {"message": "Too many feed clients"}, 503
+
+    try:
+        version = int(flask.request.headers.get("Last-Event-ID", 0))
+    except ValueError:
+        version = 0
+    if version > _FEED.version:
+        # Health restarted since this client's last event.
+        version = 0
+
+    updated = _FEED.updated_at
+    if updated is None or time.time() - updated > FEED_INTERVAL:
+        _FEED_EXECUTOR.submit(refresh_feed, True)
+
+    logger.info("Feed client connected (clients=%d)", _FEED.clients)
+
+    def stream(version):
+        try:
+            yield f"retry: {int(FEED_INTERVAL * 1000)}\n\n"
+            while True:
+                version, items = _FEED.wait(version, FEED_KEEPALIVE)
+                if not items:
+                    # Comment frame: keeps proxies from timing out the stream
+                    # and lets a dead client surface as a write error.
+                    yield ": keepalive\n\n"
+                    continue
+                for section_version, name, encoded in items:
+                    yield sse_event(name, encoded, section_version)
+        finally:
+            _FEED.disconnect()
+            logger.info("Feed client disconnected (clients=%d)", _FEED.clients)
+
+    return flask.Response(stream(version), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+# The 0.0.4 text format, whichever version prometheus_client's
+# CONTENT_TYPE_LATEST names. No charset here: connexion wants exactly the
+# spec's type, and Flask appends "; charset=utf-8" to it by itself.
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def get_metrics():
+    return generate_latest(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+
+
 def get_health():
     return {
         "status": "healthy",
@@ -86,12 +373,24 @@ def get_health():
     }, 200
 
 
+def _resolve_handler(operation_id):
+    # Resolve in this module; a second import of "app" under `python app.py`
+    # would serve /status from a _SNAPSHOT the scheduler never fills.
+    return globals()[operation_id.rsplit(".", 1)[-1]]
+
+
 app = connexion.FlaskApp(__name__, specification_dir=".")
-app.add_api("openapi.yml", strict_validation=True, validate_responses=False)
+app.add_api("openapi.yml", strict_validation=True, validate_responses=False,
+            resolver=Resolver(_resolve_handler))
 
 if __name__ == "__main__":
+    _SNAPSHOT.update(_load_status())
+
     sched = BackgroundScheduler(daemon=True)
-    sched.add_job(check_all_services, "interval", seconds=CHECK_INTERVAL)
+    sched.add_job(check_all_services, "interval", seconds=CHECK_INTERVAL,
+                  max_instances=1, coalesce=True)
+    sched.add_job(refresh_feed, "interval", seconds=FEED_INTERVAL,
+                  max_instances=1, coalesce=True)
     sched.start()
     logger.info("Health check scheduler started")
     app.run(port=8120, host="0.0.0.0")
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""
+app.py reads its config when it is imported, so before any test imports it
+point APP_CONFIG_DIR at a copy of health/config with console-only logging
+and the status file in a temp dir. The scheduler only starts under
+`python app.py`, so passes run when a test calls check_all_services.
+
+Run from this directory: python -m pytest
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+_CONF_DIR = Path(tempfile.mkdtemp(prefix="health-conf-"))
+_conf = yaml.safe_load((Path(__file__).resolve().parent / "config" / "app_conf.yml").read_text())
+_conf["datastore"]["filename"] = str(_CONF_DIR / "health_status.json")
+(_CONF_DIR / "app_conf.yml").write_text(yaml.safe_dump(_conf))
+(_CONF_DIR / "log_conf.yml").write_text(yaml.safe_dump({
+    "version": 1,
+    "handlers": {"console": {"class": "logging.StreamHandler", "level": "ERROR"}},
+    "loggers": {"basicLogger": {"handlers": ["console"], "level": "ERROR"}},
+}))
+os.environ["APP_CONFIG_DIR"] = str(_CONF_DIR)
+
+
+@pytest.fixture
+def health(monkeypatch):
+    """app.py with no snapshot and empty histories."""
+    import app
+    from history import ProbeHistory
+
+    monkeypatch.setattr(app, "_SNAPSHOT", {})
+    monkeypatch.setattr(app, "_HISTORY", {name: ProbeHistory(app.HISTORY_SAMPLES) for name in app.SERVICES})
+    return app
+
+
+@pytest.fixture
+def client(health):
+    return health.app.app.test_client()
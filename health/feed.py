@@ -0,0 +1,85 @@
+"""
+Shared dashboard feed for the health service.
+
+One background job builds a combined snapshot (processing stats, analyzer
+stats, a sample admission/capacity event and the health status) per
+interval and publishes it here, section by section. Every connected
+Server-Sent Events client reads from the same FeedHub, so backend load does
+not grow with the number of open dashboards, and a section is only pushed
+when its content actually changed.
+"""
+import json
+import time
+from threading import Condition
+
+
+class FeedHub:
+    """Latest value and version of each feed section, plus a wakeup for readers."""
+
+    def __init__(self):
+        self._cond = Condition()
+        self._version = 0
+        self._sections = {}     # name -> (version, encoded json)
+        self.clients = 0
+        self.updated_at = None
+
+    @property
+    def version(self):
+        with self._cond:
+            return self._version
+
+    def publish(self, sections):
+        """Stores the sections whose content changed; returns their names."""
+        changed = []
+        with self._cond:
+            for name, value in sections.items():
+                encoded = json.dumps(value, sort_keys=True, default=str)
+                current = self._sections.get(name)
+                if current is not None and current[1] == encoded:
+                    continue
+                self._version += 1
+                self._sections[name] = (self._version, encoded)
+                changed.append(name)
+            self.updated_at = time.time()
+            if changed:
+                self._cond.notify_all()
+        return changed
+
+    def since(self, version):
+        """(current version, [(section version, name, encoded)]) newer than version."""
+        with self._cond:
+            return self._version, self._newer(version)
+
+    def wait(self, version, timeout):
+        """Blocks until something newer than version is published or timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > version, timeout)
+            return self._version, self._newer(version)
+
+    def _newer(self, version):
+        return sorted(
+            (v, name, encoded)
+            for name, (v, encoded) in self._sections.items()
+            if v > version
+        )
+
+    def connect(self, max_clients):
+        with self._cond:
+            if max_clients and self.clients >= max_clients:
+                return False
+            self.clients += 1
+            return True
+
+    def disconnect(self):
+        with self._cond:
+            self.clients -= 1
+
+
+def sse_event(event, data, event_id=None):
+    """Formats one Server-Sent Events frame; data is already JSON text."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
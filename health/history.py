@@ -0,0 +1,85 @@
+"""
+Bounded per-service probe history for the health service.
+
+Each service gets a fixed-size ring of (timestamp, latency, status) samples
+held in typed arrays, so memory stays at ~13 bytes per sample no matter how
+long the service runs. Rolling percentiles, uptime and state-transition
+counts are computed from the ring on demand.
+"""
+import math
+import time
+from array import array
+from threading import Lock
+
+STATUS_CODES = {"down": 0, "degraded": 1, "up": 2, "starting": 3}
+STATUS_NAMES = {v: k for k, v in STATUS_CODES.items()}
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return sorted_values[lo]
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class ProbeHistory:
+    """Fixed-size ring buffer of probe samples for one service."""
+
+    def __init__(self, max_samples):
+        self._max = max_samples
+        self._ts = array("d", [0.0] * max_samples)
+        self._latency = array("f", [0.0] * max_samples)
+        self._status = array("b", [0] * max_samples)
+        self._next = 0
+        self._size = 0
+        self._lock = Lock()
+
+    def record(self, status, latency_ms, ts=None):
+        with self._lock:
+            i = self._next
+            self._ts[i] = time.time() if ts is None else ts
+            # NaN marks "no response"; it's skipped by the percentiles.
+            self._latency[i] = math.nan if latency_ms is None else latency_ms
+            self._status[i] = STATUS_CODES.get(status, 0)
+            self._next = (i + 1) % self._max
+            self._size = min(self._size + 1, self._max)
+
+    def _since(self, since):
+        """Samples newer than `since`, oldest first (caller holds the lock)."""
+        out = []
+        start = (self._next - self._size) % self._max
+        for n in range(self._size):
+            i = (start + n) % self._max
+            if self._ts[i] >= since:
+                out.append((self._ts[i], self._latency[i], self._status[i]))
+        return out
+
+    def samples(self, since=0.0):
+        with self._lock:
+            return self._since(since)
+
+    def summary(self, window_sec, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            samples = self._since(now - window_sec)
+
+        latencies = sorted(lat for _, lat, _ in samples if not math.isnan(lat))
+        statuses = [st for _, _, st in samples]
+        transitions = sum(1 for a, b in zip(statuses, statuses[1:]) if a != b)
+        up = sum(1 for st in statuses if st == STATUS_CODES["up"])
+
+        def _ms(v):
+            return None if v is None else round(v, 1)
+
+        return {
+            "samples": len(samples),
+            "p50_ms": _ms(_percentile(latencies, 50)),
+            "p95_ms": _ms(_percentile(latencies, 95)),
+            "p99_ms": _ms(_percentile(latencies, 99)),
+            "uptime_pct": round(100.0 * up / len(statuses), 2) if statuses else None,
+            "transitions": transitions,
+        }
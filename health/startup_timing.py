@@ -0,0 +1,107 @@
+"""
+Time-to-first-response and time-to-ready of the services after a restart.
+
+Polls each service's liveness path until the port answers at all (any
+HTTP status counts, 404 included), then its /ready until it answers 200,
+and reports both times (seconds from the moment the script started) as
+JSON. Start it right after the restart, e.g.
+
+  docker compose restart storage receiver analyzer processing && \
+      python health/startup_timing.py --out logs/startup_after.json
+
+For a "before" run against a build without /ready, pass --no-ready. The
+first-response column still works there: /health answers 404 on such a
+build, and that counts as the port being up.
+
+Uses only the standard library, so it runs straight from the host.
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SERVICES = {
+    "receiver": "http://localhost:8080",
+    "storage": "http://localhost:8090",
+    "processing": "http://localhost:8100",
+    "analyzer": "http://localhost:8110",
+}
+
+
+def _status(url, timeout):
+    """HTTP status of a GET, or None if nothing answered."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return None
+
+
+def measure(name, base, args, started):
+    live_sec = ready_sec = None
+    last_status = None
+    deadline = started + args.timeout
+    while time.monotonic() < deadline:
+        if live_sec is None:
+            if _status(base + args.live_path, args.request_timeout) is not None:
+                live_sec = time.monotonic() - started
+        if live_sec is not None:
+            if args.no_ready:
+                break
+            last_status = _status(base + args.ready_path, args.request_timeout)
+            if last_status == 200:
+                ready_sec = time.monotonic() - started
+                break
+        time.sleep(args.poll_sec)
+
+    return name, {
+        "first_response_sec": None if live_sec is None else round(live_sec, 3),
+        "ready_sec": None if ready_sec is None else round(ready_sec, 3),
+        "last_ready_status": last_status,
+    }
+
+
+def run(args):
+    services = {name: url for name, url in SERVICES.items()
+                if not args.services or name in args.services}
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(services)) as pool:
+        results = dict(pool.map(lambda item: measure(*item, args, started), services.items()))
+
+    return {
+        "live_path": args.live_path,
+        "ready_path": None if args.no_ready else args.ready_path,
+        "timeout_sec": args.timeout,
+        "services": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--services", nargs="*", choices=list(SERVICES),
+                    help="Services to measure (default all)")
+    ap.add_argument("--live-path", default="/health")
+    ap.add_argument("--ready-path", default="/ready")
+    ap.add_argument("--no-ready", action="store_true",
+                    help="Only measure the first response (builds without /ready)")
+    ap.add_argument("--poll-sec", type=float, default=0.1)
+    ap.add_argument("--request-timeout", type=float, default=1.0)
+    ap.add_argument("--timeout", type=float, default=120.0,
+                    help="Give up on a service after this many seconds")
+    ap.add_argument("--out", help="Write the JSON report here as well as stdout")
+    args = ap.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+from feed import FeedHub, sse_event
+
+
+def test_only_changed_sections_are_published():
+    hub = FeedHub()
+
+    assert hub.publish({"a": {"n": 1}, "b": {"n": 2}}) == ["a", "b"]
+    assert hub.publish({"a": {"n": 1}, "b": {"n": 3}}) == ["b"]
+
+    version, items = hub.since(1)
+    assert version == 3
+    assert [(v, name) for v, name, _ in items] == [(3, "b")]
+
+
+def test_wait_times_out_with_nothing_new():
+    hub = FeedHub()
+    hub.publish({"a": 1})
+
+    assert hub.wait(1, timeout=0.01) == (1, [])
+
+
+def test_connect_enforces_max_clients():
+    hub = FeedHub()
+
+    assert hub.connect(1)
+    assert not hub.connect(1)
+    hub.disconnect()
+    assert hub.connect(1)
+
+
+def test_sse_event_prefixes_every_data_line():
+    assert sse_event("stats", '{"a":\n1}', 7) == 'id: 7\nevent: stats\ndata: {"a":\ndata: 1}\n\n'
+
+
+@pytest.fixture
+def feed(health, monkeypatch):
+    hub = FeedHub()
+    monkeypatch.setattr(health, "_FEED", hub)
+    monkeypatch.setattr(health, "_SESSION", SimpleNamespace(get=lambda url, timeout: SimpleNamespace(
+        status_code=200,
+        json=lambda: {"url": url, "num_admission_events": 0, "num_capacity_events": 0})))
+    return hub
+
+
+def test_refresh_publishes_every_section(health, feed):
+    health.refresh_feed(force=True)
+
+    _, items = feed.since(0)
+    assert {name for _, name, _ in items} == {
+        "processing_stats", "analyzer_stats", "admission_event", "capacity_event", "health_status"}
+
+
+def test_refresh_is_skipped_while_nobody_is_connected(health, feed):
+    health.refresh_feed()
+
+    assert feed.version == 0
+
+
+def test_feed_resumes_after_last_event_id(health, client, feed):
+    feed.publish({"old": 1, "new": 2})
+
+    r = client.get("/feed", headers={"Last-Event-ID": "1"}, buffered=False)
+    frames = r.response
+    assert next(frames).startswith(b"retry: ")
+    assert next(frames) == sse_event("new", "2", 2).encode()
+    r.close()
+
+    assert feed.clients == 0
@@ -0,0 +1,35 @@
+from history import ProbeHistory
+
+
+def fill(hist, seconds, period, now):
+    for ts in range(now - seconds, now + 1, period):
+        hist.record("up" if ts % (2 * period) else "down", 10.0, ts=ts)
+
+
+def test_ring_covers_the_longest_window(health):
+    now = 100000
+    hist = ProbeHistory(health.HISTORY_SAMPLES)
+    fill(hist, 2 * max(health.HISTORY_WINDOWS), health.CHECK_INTERVAL, now)
+
+    for window in health.HISTORY_WINDOWS:
+        assert hist.summary(window, now)["samples"] == window // health.CHECK_INTERVAL + 1
+
+
+def test_ring_drops_the_oldest_samples():
+    hist = ProbeHistory(3)
+    for ts in range(5):
+        hist.record("up", float(ts), ts=ts)
+
+    assert [ts for ts, _, _ in hist.samples()] == [2, 3, 4]
+
+
+def test_summary_counts_transitions_and_skips_missing_latencies():
+    hist = ProbeHistory(10)
+    hist.record("up", 10.0, ts=1)
+    hist.record("down", None, ts=2)
+    hist.record("up", 30.0, ts=3)
+
+    summary = hist.summary(10, now=3)
+    assert summary["transitions"] == 2
+    assert summary["p50_ms"] == 20.0
+    assert summary["uptime_pct"] == 66.67
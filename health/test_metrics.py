@@ -0,0 +1,25 @@
+from prometheus_client import REGISTRY
+
+from test_probes import FakeSession
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_a_pass_moves_the_probe_series(health, client, monkeypatch):
+    monkeypatch.setattr(health, "_SESSION", FakeSession(health))
+    series = [("health_pass_seconds_count", {}),
+              ("health_probe_seconds_count", {"service": "storage"}),
+              ("health_probes_total", {"service": "storage", "status": "up"})]
+    before = [sample(name, **labels) for name, labels in series]
+
+    health.check_all_services()
+
+    after = [sample(name, **labels) for name, labels in series]
+    assert [a - b for a, b in zip(after, before)] == [1, 1, 1]
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert b'health_probes_total{service="storage",status="up"}' in r.data
@@ -0,0 +1,78 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+
+class FakeSession:
+    """Answers probes by URL; the first probe of a service in `hang` blocks until released."""
+
+    def __init__(self, health):
+        self.by_url = {info["url"]: name for name, info in health.SERVICES.items()}
+        self.hang = set()
+        self.release = threading.Event()
+        self.finished = []
+
+    def get(self, url, timeout):
+        name = self.by_url[url]
+        if name in self.hang:
+            self.hang.discard(name)
+            self.release.wait(5)
+        self.finished.append(name)
+        return SimpleNamespace(status_code=200, headers={"Content-Type": "application/json"},
+                               json=lambda: {"status": "ready"})
+
+
+@pytest.fixture
+def probes(health, monkeypatch):
+    session = FakeSession(health)
+    monkeypatch.setattr(health, "_SESSION", session)
+    monkeypatch.setattr(health, "PASS_DEADLINE", 0.2)
+    yield session
+    session.release.set()
+
+
+def statuses(health, name):
+    return [health.STATUS_NAMES[st] for _, _, st in health._HISTORY[name].samples()]
+
+
+def test_status_is_404_until_the_first_pass(health, client, probes):
+    assert client.get("/status").status_code == 404
+
+    health.check_all_services()
+
+    r = client.get("/status")
+    assert r.status_code == 200
+    assert {s["status"] for s in r.get_json()["services"].values()} == {"up"}
+
+
+def test_a_late_probe_adds_no_second_sample(health, probes):
+    probes.hang.add("storage")
+
+    health.check_all_services()
+    probes.release.set()
+    while probes.finished.count("storage") == 0:
+        time.sleep(0.01)
+
+    assert statuses(health, "storage") == ["down"]
+    assert statuses(health, "receiver") == ["up"]
+
+
+def test_stragglers_do_not_hold_up_the_next_pass(health, probes):
+    probes.hang.update(health.SERVICES)
+
+    health.check_all_services()
+    health.check_all_services()
+
+    for name in health.SERVICES:
+        assert statuses(health, name) == ["down", "up"]
+
+
+@pytest.mark.parametrize("ready_status, status", [("starting", "starting"), ("not_ready", "degraded")])
+def test_only_a_service_that_was_never_ready_counts_as_starting(health, monkeypatch, ready_status, status):
+    reply = SimpleNamespace(status_code=503, headers={"Content-Type": "application/json"},
+                            json=lambda: {"status": ready_status})
+    monkeypatch.setattr(health, "_SESSION", SimpleNamespace(get=lambda url, timeout: reply))
+
+    assert health._probe("storage", health.SERVICES["storage"])[0] == status
@@ -1,25 +1,32 @@
 import json
 import logging
-import logging.config
+import os
+import time
 from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
 import connexion
+from connexion.resolver import Resolver
 import requests
 import yaml
-from apscheduler.schedulers.background import BackgroundScheduler
+from prometheus_client import Counter, Histogram, generate_latest
 from pathlib import Path
 
 from connexion.middleware import MiddlewarePosition
 from starlette.middleware.cors import CORSMiddleware
+import log_setup
+from readiness import Readiness
 
-with open("/app/config/app_conf.yml", "r") as f:
+# Mounted at /app/config by compose; the tests point this at their own copy.
+CONFIG_DIR = os.environ.get("APP_CONFIG_DIR", "/app/config")
+
+with open(f"{CONFIG_DIR}/app_conf.yml", "r") as f:
     APP_CONF = yaml.safe_load(f)
 
-with open("/app/config/log_conf.yml", "r") as f:
+with open(f"{CONFIG_DIR}/log_conf.yml", "r") as f:
     LOG_CONF = yaml.safe_load(f)
 
 
-logging.config.dictConfig(LOG_CONF)
+log_setup.configure(LOG_CONF)
 logger = logging.getLogger("basicLogger")
 
 STATS_FILE = APP_CONF["datastore"]["filename"]
@@ -28,6 +35,20 @@ INTERVAL   = int(APP_CONF["scheduler"]["interval"])
 ADMISSIONS_URL = APP_CONF["eventstores"]["admissions"]["url"]
 CAPACITY_URL   = APP_CONF["eventstores"]["capacity"]["url"]
 
+# /ready needs the scheduler running; storage being reachable is reported
+# but not required, since /stats serves the last saved file regardless.
+READY = Readiness(required=["scheduler"])
+
+# Hot-path metrics, per periodic job.
+FETCH_SECONDS = Histogram(
+    "processing_fetch_seconds", "Time to fetch events from storage for one job")
+COMPUTE_SECONDS = Histogram(
+    "processing_compute_seconds", "Time to recompute and save stats for one job")
+RECORDS = Counter(
+    "processing_records_total", "Records fetched from storage", ["kind"])
+JOBS = Counter(
+    "processing_jobs_total", "Periodic jobs run, by outcome", ["result"])
+
 def _iso_now() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
@@ -77,14 +98,20 @@ def populate_stats():
     }
     logger.info("Fetching ALL events from storage with params=%s", params)
 
+    t0 = time.perf_counter()
     try:
         ra = requests.get(ADMISSIONS_URL, params=params, timeout=5)
         rc = requests.get(CAPACITY_URL,   params=params, timeout=5)
     except Exception as e:
         logger.error("Failed to call storage endpoints: %s", e, exc_info=True)
+        READY.mark("storage", False, f"unreachable: {e}", required=False)
+        JOBS.labels("error").inc()
         logger.info("Periodic processing ended (errors)")
         return
 
+    READY.mark("storage", ra.status_code == 200 and rc.status_code == 200,
+               f"admissions {ra.status_code}, capacity {rc.status_code}", required=False)
+
     if ra.status_code != 200:
         logger.error("Admissions GET returned %s", ra.status_code)
         admissions: List[Dict[str, Any]] = []
@@ -97,6 +124,11 @@ def populate_stats():
     else:
         capacity = rc.json()
 
+    t1 = time.perf_counter()
+    FETCH_SECONDS.observe(t1 - t0)
+    RECORDS.labels("admission").inc(len(admissions))
+    RECORDS.labels("capacity").inc(len(capacity))
+
     logger.info(
         "Recomputing stats from %d admissions, %d capacity records",
         len(admissions), len(capacity),
@@ -132,6 +164,8 @@ def populate_stats():
     }
 
     _save_stats(stats)
+    COMPUTE_SECONDS.observe(time.perf_counter() - t1)
+    JOBS.labels("ok").inc()
     logger.debug("Updated stats: %s", stats)
     logger.info("Periodic processing ended")
 
@@ -148,14 +182,44 @@ def get_stats():
     return stats, 200
 
 
+# The 0.0.4 text format, whichever version prometheus_client's
+# CONTENT_TYPE_LATEST names. No charset here: connexion wants exactly the
+# spec's type, and Flask appends "; charset=utf-8" to it by itself.
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def get_metrics():
+    return generate_latest(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+
+
+def get_health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "healthy", "timestamp": _iso_now()}, 200
+
+
+def get_ready():
+    """Readiness: 200 once the periodic job is scheduled."""
+    return READY.response()
+
+
 def init_scheduler():
+    from apscheduler.schedulers.background import BackgroundScheduler
+
     sched = BackgroundScheduler(daemon=True)
     sched.add_job(populate_stats, "interval", seconds=INTERVAL)
     sched.start()
+    READY.mark("scheduler", True, f"interval {INTERVAL}s")
     logger.info("Scheduler started (interval=%ss)", INTERVAL)
 
+def _resolve_handler(operation_id):
+    # Resolve in this module; a second import of "app" under `python app.py`
+    # would register the Prometheus metrics again and fail.
+    return globals()[operation_id.rsplit(".", 1)[-1]]
+
+
 app = connexion.FlaskApp(__name__, specification_dir=".")
-app.add_api("openapi.yml", strict_validation=True, validate_responses=False)
+app.add_api("openapi.yml", strict_validation=True, validate_responses=False,
+            resolver=Resolver(_resolve_handler))
 
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,38 @@
+"""
+app.py reads its config when it is imported, so before any test imports it
+point APP_CONFIG_DIR at a copy of config/processing with console-only
+logging and the stats file in a temp dir. The scheduler only starts under
+`python app.py`, so storage is never called unless a test does it.
+
+Run from this directory: python -m pytest
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+_CONF_DIR = Path(tempfile.mkdtemp(prefix="processing-conf-"))
+_conf = yaml.safe_load((Path(__file__).resolve().parent.parent / "config" / "processing"
+                        / "app_conf.yml").read_text())
+_conf["datastore"]["filename"] = str(_CONF_DIR / "processing_stats.json")
+(_CONF_DIR / "app_conf.yml").write_text(yaml.safe_dump(_conf))
+(_CONF_DIR / "log_conf.yml").write_text(yaml.safe_dump({
+    "version": 1,
+    "handlers": {"console": {"class": "logging.StreamHandler", "level": "WARNING"}},
+    "loggers": {"basicLogger": {"handlers": ["console"], "level": "WARNING"}},
+}))
+os.environ["APP_CONFIG_DIR"] = str(_CONF_DIR)
+
+
+@pytest.fixture
+def processing():
+    import app
+
+    return app
+
+
+@pytest.fixture
+def client(processing):
+    return processing.app.test_client()
@@ -0,0 +1,55 @@
+"""
+Startup readiness for the processing service.
+
+/ready answers 200 once the scheduler is running, and 503 with the detail
+of each check until then. Storage is reported too, from the last run of
+the job, but isn't required: processing keeps serving its last stats
+while storage is down. The status is "starting" before the scheduler
+first runs and "not_ready" if a required check fails later. /health stays
+a plain liveness check.
+"""
+import time
+from datetime import datetime, timezone
+from threading import Lock
+
+_STARTED = time.monotonic()
+_STARTED_AT = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Readiness:
+    def __init__(self, required=()):
+        self._lock = Lock()
+        self._checks = {name: {"ok": False, "detail": "not started", "required": True}
+                        for name in required}
+        self._ready_after = None
+
+    def mark(self, name, ok, detail=None, required=True):
+        with self._lock:
+            self._checks[name] = {"ok": bool(ok), "detail": detail, "required": required}
+            if self._ready_after is None and self._is_ready():
+                self._ready_after = time.monotonic() - _STARTED
+
+    def _is_ready(self):
+        return all(c["ok"] for c in self._checks.values() if c["required"])
+
+    def response(self):
+        """(body, status) for the /ready handler."""
+        with self._lock:
+            ready = self._is_ready()
+            if ready:
+                status = "ready"
+            elif self._ready_after is None:
+                status = "starting"
+            else:
+                # It was ready once, so this is an outage, not startup.
+                status = "not_ready"
+            body = {
+                "status": status,
+                "started_at": _STARTED_AT,
+                "uptime_sec": round(time.monotonic() - _STARTED, 3),
+                # Time from this module loading (early in startup) until the
+                # required checks were first ok; null until then.
+                "ready_after_sec": None if self._ready_after is None else round(self._ready_after, 3),
+                "checks": {name: dict(c) for name, c in self._checks.items()},
+            }
+        return body, 200 if ready else 503
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_a_job_moves_the_processing_series(processing, client, monkeypatch):
+    rows = {processing.ADMISSIONS_URL: [{"patient_age": 40}, {"patient_age": 71}],
+            processing.CAPACITY_URL: [{"occupied_beds": 9}]}
+    monkeypatch.setattr(processing.requests, "get", lambda url, params, timeout: SimpleNamespace(
+        status_code=200, json=lambda: rows[url]))
+    series = [("processing_fetch_seconds_count", {}),
+              ("processing_compute_seconds_count", {}),
+              ("processing_records_total", {"kind": "admission"}),
+              ("processing_records_total", {"kind": "capacity"}),
+              ("processing_jobs_total", {"result": "ok"})]
+    before = [sample(name, **labels) for name, labels in series]
+
+    processing.populate_stats()
+
+    after = [sample(name, **labels) for name, labels in series]
+    assert [a - b for a, b in zip(after, before)] == [1, 1, 2, 1, 1]
+    assert client.get("/stats").json()["max_patient_age"] == 71
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'processing_jobs_total{result="ok"}' in r.text
@@ -0,0 +1,34 @@
+from readiness import Readiness
+
+
+def test_ready_needs_the_scheduler_but_not_storage(processing, client, monkeypatch):
+    ready = Readiness(required=["scheduler"])
+    monkeypatch.setattr(processing, "READY", ready)
+
+    r = client.get("/ready")
+    assert r.status_code == 503
+    assert r.json()["status"] == "starting"
+    assert r.json()["checks"]["scheduler"]["ok"] is False
+
+    ready.mark("scheduler", True, "interval 5s")
+    ready.mark("storage", False, "unreachable", required=False)
+
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["checks"]["storage"] == {"ok": False, "detail": "unreachable", "required": False}
+
+
+def test_failed_storage_call_is_reported_on_ready(processing, client, monkeypatch):
+    ready = Readiness(required=["scheduler"])
+    ready.mark("scheduler", True)
+    monkeypatch.setattr(processing, "READY", ready)
+
+    def unreachable(url, params, timeout):
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(processing.requests, "get", unreachable)
+    processing.populate_stats()
+
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["checks"]["storage"]["detail"] == "unreachable: connection refused"
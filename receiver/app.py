@@ -1,32 +1,91 @@
-import json
+import asyncio
+import os
+import shutil
+import sys
+import threading
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 import logging
-import logging.config
 
 import connexion
+from connexion.resolver import Resolver
 import yaml
 from connexion import NoContent
-from pykafka import KafkaClient
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+import codec
+import log_setup
+from readiness import Readiness, with_backoff
+from topics import produce_topics
 
-with open("/app/config/log_conf.yml", "r") as f:
+# Mounted at /app/config by compose; the tests point this at their own copy.
+CONFIG_DIR = os.environ.get("APP_CONFIG_DIR", "/app/config")
+
+with open(f"{CONFIG_DIR}/log_conf.yml", "r") as f:
     LOG_CONF = yaml.safe_load(f.read())
     
-logging.config.dictConfig(LOG_CONF)
+log_setup.configure(LOG_CONF)
 logger = logging.getLogger("basicLogger")
 
-with open("/app/config/app_conf.yml", "r") as f:
+with open(f"{CONFIG_DIR}/app_conf.yml", "r") as f:
     APP_CONF = yaml.safe_load(f.read())
 
 STORAGE_URL = APP_CONF.get("storage", {}).get("url")
 
 KAFKA_HOSTS = f"{APP_CONF['events']['hostname']}:{APP_CONF['events']['port']}"
-KAFKA_TOPIC = APP_CONF['events']['topic'].encode()
+# events.routing picks the shared `topic` or one topic per event type.
+TOPICS = produce_topics(APP_CONF["events"])
+ADMISSION_TOPIC = TOPICS["admission_created"].encode()
+CAPACITY_TOPIC = TOPICS["capacity_snapshot"].encode()
+
+# events.codec is the wire format (see codec.py; consumers auto-detect it).
+# events.compression is applied by the producer. Only codecs that both
+# producers and the pykafka consumers in storage and the analyzer can
+# handle with their requirements.txt are accepted: snappy would need
+# python-snappy everywhere, and pykafka can't read zstd at all.
+ENCODE = codec.get_encoder(APP_CONF["events"].get("codec", "json"))
+COMPRESSION = APP_CONF["events"].get("compression", "none")
+# Names of pykafka.common.CompressionType members.
+_PYKAFKA_COMPRESSION = {"none": "NONE", "gzip": "GZIP", "lz4": "LZ4"}
+if COMPRESSION not in _PYKAFKA_COMPRESSION:
+    raise ValueError(f"events.compression must be one of {', '.join(_PYKAFKA_COMPRESSION)}, "
+                     f"got {COMPRESSION!r}")
 
 _KAFKA_CLIENT = None
 _PRODUCER_ADM = None
 _PRODUCER_CAP = None
 
+# server.mode "dev" keeps the single-process app.run(); "asgi" runs under
+# uvicorn with server.workers processes. server.async_handlers switches to
+# connexion's AsyncApp and the *_async handlers below (aiokafka producer).
+SERVER_CONF = APP_CONF.get("server", {})
+ASYNC_HANDLERS = bool(SERVER_CONF.get("async_handlers", False))
+# With more than one worker, prometheus_client's multiprocess mode keeps
+# each worker's metrics in files here so /metrics can add them up.
+METRICS_DIR = SERVER_CONF.get("metrics_dir", "/tmp/receiver-metrics")
+
+_ASYNC_PRODUCER = None
+_ASYNC_PRODUCER_LOCK = None
+
+# The port is bound first; Kafka producers are connected in the background
+# with exponential backoff, and /ready answers 503 until they are.
+STARTUP_CONF = APP_CONF.get("startup", {})
+BACKOFF_INITIAL_SEC = float(STARTUP_CONF.get("backoff_initial_sec", 0.5))
+BACKOFF_MAX_SEC = float(STARTUP_CONF.get("backoff_max_sec", 30))
+READY = Readiness(required=["kafka"])
+
+# Hot-path metrics, per batch. Label values are fixed ("admission"/"capacity").
+VALIDATE_SECONDS = Histogram(
+    "receiver_validate_seconds", "Time spent validating the items of one batch", ["kind"])
+PRODUCE_SECONDS = Histogram(
+    "receiver_produce_seconds", "Time spent producing the items of one batch to Kafka", ["kind"])
+BATCH_ITEMS = Histogram(
+    "receiver_batch_items", "Number of items per received batch", ["kind"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+ITEMS = Counter(
+    "receiver_items_total", "Items received, by outcome", ["kind", "result"])
+
 
 def _trace_id() -> str:
     return str(uuid.uuid4())
@@ -41,36 +100,47 @@ def _require_items(body: dict, kind: str):
 def _now_iso() -> str:
     return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
 
+def _sync_compression():
+    from pykafka.common import CompressionType
+
+    return getattr(CompressionType, _PYKAFKA_COMPRESSION[COMPRESSION])
+
+
 def _get_producer(cache_key: str):
     global _KAFKA_CLIENT, _PRODUCER_ADM, _PRODUCER_CAP
 
     if _KAFKA_CLIENT is None:
+        # Imported on first use so it stays off the startup path.
+        from pykafka import KafkaClient
+
         logger.info("Receiver: creating global Kafka client to %s", KAFKA_HOSTS)
         _KAFKA_CLIENT = KafkaClient(hosts=KAFKA_HOSTS)
 
     if cache_key == "adm":
         if _PRODUCER_ADM is None:
-            topic = _KAFKA_CLIENT.topics[KAFKA_TOPIC]
-            _PRODUCER_ADM = topic.get_sync_producer()
-            logger.info("Receiver: created admission producer for topic=%s", KAFKA_TOPIC.decode())
+            topic = _KAFKA_CLIENT.topics[ADMISSION_TOPIC]
+            _PRODUCER_ADM = topic.get_sync_producer(compression=_sync_compression())
+            logger.info("Receiver: created admission producer for topic=%s", ADMISSION_TOPIC.decode())
         return _PRODUCER_ADM
     else:
         if _PRODUCER_CAP is None:
-            topic = _KAFKA_CLIENT.topics[KAFKA_TOPIC]
-            _PRODUCER_CAP = topic.get_sync_producer()
-            logger.info("Receiver: created capacity producer for topic=%s", KAFKA_TOPIC.decode())
+            topic = _KAFKA_CLIENT.topics[CAPACITY_TOPIC]
+            _PRODUCER_CAP = topic.get_sync_producer(compression=_sync_compression())
+            logger.info("Receiver: created capacity producer for topic=%s", CAPACITY_TOPIC.decode())
         return _PRODUCER_CAP
 
 
-def report_admission_discharge_batch(body):
-    trace = _trace_id()
-    items = _require_items(body, "admission/discharge")
-    if items is None:
-        return NoContent, 400
+def _observe_batch(kind, validate_sec, produce_sec, accepted, rejected=0):
+    VALIDATE_SECONDS.labels(kind).observe(validate_sec)
+    PRODUCE_SECONDS.labels(kind).observe(produce_sec)
+    if accepted:
+        ITEMS.labels(kind, "accepted").inc(accepted)
+    if rejected:
+        ITEMS.labels(kind, "rejected").inc(rejected)
 
-    logger.info("Receiver: admission/discharge batch trace_id=%s items=%d", trace, len(items))
 
-    meta = {
+def _batch_meta(body, trace):
+    return {
         "batchId": body.get("batchId"),
         "senderId": body.get("senderId"),
         "reportDate": body.get("reportDate"),
@@ -79,116 +149,312 @@ def report_admission_discharge_batch(body):
         "trace_id": trace,
     }
 
-    required = ("encounterId", "event", "recordedAt", "patientAge")
+
+def _admission_payload(i, item, meta):
+    """Validates one admission item; returns its Kafka payload or None."""
+    missing = [k for k in ("encounterId", "event", "recordedAt", "patientAge") if k not in item]
+    if missing:
+        logger.error("Item #%d missing required fields: %s", i, ", ".join(missing))
+        return None
 
     try:
-        producer = _get_producer("adm")
-    except Exception as e:
-        logger.exception("Receiver couldn't connect to Kafka (%s)", e)
-        return NoContent, 503
+        patient_age = int(item["patientAge"])
+    except Exception:
+        logger.error("Item #%d has non-integer patientAge: %r", i, item.get("patientAge"))
+        return None
+
+    return {
+        **meta,
+        "encounterId": item["encounterId"],
+        "event": item["event"],
+        "recordedAt": item["recordedAt"],
+        "patientAge": patient_age,
+    }
 
+
+def _capacity_payload(i, item, meta):
+    """Validates one capacity item; returns its Kafka payload or None."""
+    missing = [k for k in ("unitId", "totalBeds", "occupiedBeds", "recordedAt") if k not in item]
+    if missing:
+        logger.error("Capacity item #%d missing required fields: %s", i, ", ".join(missing))
+        return None
+
+    try:
+        total_beds = int(item["totalBeds"])
+        occupied_beds = int(item["occupiedBeds"])
+    except Exception:
+        logger.error("Capacity item #%d has non-integer totals: totalBeds=%r occupiedBeds=%r",
+                     i, item.get("totalBeds"), item.get("occupiedBeds"))
+        return None
+
+    return {
+        **meta,
+        "unitId": item["unitId"],
+        "totalBeds": total_beds,
+        "occupiedBeds": occupied_beds,
+        "recordedAt": item["recordedAt"],
+    }
+
+
+# The 0.0.4 text format, whichever version prometheus_client's
+# CONTENT_TYPE_LATEST names. No charset here: connexion wants exactly the
+# spec's type, and Flask appends "; charset=utf-8" to it by itself.
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def get_metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Several uvicorn workers: sum what every one of them has recorded,
+        # not just the worker that happens to serve this scrape.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+    return generate_latest(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+
+
+_BATCH_KINDS = {
+    "admission": ("admission/discharge", "admission_created", _admission_payload, "adm"),
+    "capacity": ("capacity", "capacity_snapshot", _capacity_payload, "cap"),
+}
+
+
+def _build_events(kind, items, meta):
+    """The batch's events, or None if any item is invalid."""
+    _, etype, build_payload, _ = _BATCH_KINDS[kind]
+    events = []
     for i, item in enumerate(items, start=1):
-        missing = [k for k in required if k not in item]
-        if missing:
-            logger.error("Item #%d missing required fields: %s", i, ", ".join(missing))
-            return NoContent, 400
+        payload = build_payload(i, item, meta)
+        if payload is None:
+            return None
+        events.append({"type": etype, "datetime": _now_iso(), "payload": payload})
+    return events
+
+
+def _report_batch(kind, body):
+    """
+    Validates every item first and only then produces them, so a batch
+    with an invalid item is rejected without any of it reaching Kafka.
+    """
+    received_ts = time.time()
+    trace = _trace_id()
+    label, etype, _, cache_key = _BATCH_KINDS[kind]
+    topic = TOPICS[etype]
+    items = _require_items(body, label)
+    if items is None:
+        return NoContent, 400
 
-        try:
-            patient_age = int(item["patientAge"])
-        except Exception:
-            logger.error("Item #%d has non-integer patientAge: %r", i, item.get("patientAge"))
-            return NoContent, 400
-
-        payload = {
-            **meta,
-            "encounterId": item["encounterId"],
-            "event": item["event"],
-            "recordedAt": item["recordedAt"],
-            "patientAge": patient_age,
-        }
-
-        event = {
-            "type": "admission_created",
-            "datetime": _now_iso(),
-            "payload": payload
-        }
+    logger.info("Receiver: %s batch trace_id=%s items=%d", label, trace, len(items))
+    BATCH_ITEMS.labels(kind).observe(len(items))
+    meta = _batch_meta(body, trace)
+
+    t0 = time.perf_counter()
+    events = _build_events(kind, items, meta)
+    t1 = time.perf_counter()
+    if events is None:
+        _observe_batch(kind, t1 - t0, 0.0, 0, rejected=len(items))
+        return NoContent, 400
 
+    try:
+        producer = _get_producer(cache_key)
+    except Exception as e:
+        logger.exception("Receiver couldn't connect to Kafka (%s)", e)
+        _observe_batch(kind, t1 - t0, 0.0, 0, rejected=len(events))
+        return NoContent, 503
+
+    accepted = 0
+    for event in events:
+        # Epoch stamps for storage's end-to-end latency tracking.
+        event["timing"] = {"received": received_ts, "produced": time.time()}
         try:
-            producer.produce(json.dumps(event).encode("utf-8"))
-            logger.info("→ Kafka topic=%s trace_id=%s payload=%s",
-                        KAFKA_TOPIC.decode(), payload.get("trace_id"), payload)
+            producer.produce(ENCODE(event))
         except Exception as e:
             logger.exception("Receiver couldn't publish to Kafka (%s)", e)
+            _observe_batch(kind, t1 - t0, time.perf_counter() - t1, accepted,
+                           rejected=len(events) - accepted)
             return NoContent, 503
+        logger.info("→ Kafka topic=%s trace_id=%s payload=%s",
+                    topic, trace, event["payload"],
+                    extra={"sample_key": "receiver.item"})
+        accepted += 1
 
+    _observe_batch(kind, t1 - t0, time.perf_counter() - t1, accepted)
     return NoContent, 201
 
 
+def report_admission_discharge_batch(body):
+    return _report_batch("admission", body)
+
+
 def report_capacity_batch(body):
+    return _report_batch("capacity", body)
+
+
+async def _get_async_producer():
+    global _ASYNC_PRODUCER, _ASYNC_PRODUCER_LOCK
+
+    if _ASYNC_PRODUCER is not None:
+        return _ASYNC_PRODUCER
+
+    if _ASYNC_PRODUCER_LOCK is None:
+        _ASYNC_PRODUCER_LOCK = asyncio.Lock()
+
+    async with _ASYNC_PRODUCER_LOCK:
+        if _ASYNC_PRODUCER is None:
+            # Only needed with async_handlers, so imported lazily.
+            from aiokafka import AIOKafkaProducer
+
+            logger.info("Receiver: creating async Kafka producer to %s", KAFKA_HOSTS)
+            producer = AIOKafkaProducer(
+                bootstrap_servers=KAFKA_HOSTS, acks=1,
+                compression_type=None if COMPRESSION == "none" else COMPRESSION,
+            )
+            try:
+                await producer.start()
+            except Exception:
+                await producer.stop()
+                raise
+            _ASYNC_PRODUCER = producer
+    return _ASYNC_PRODUCER
+
+
+async def _report_batch_async(kind, body):
+    """
+    Async variant of the batch handlers: validates every item first, then
+    sends them all and awaits the broker acks together, so a slow broker
+    parks a coroutine rather than a worker thread.
+    """
+    received_ts = time.time()
     trace = _trace_id()
-    items = _require_items(body, "capacity")
+    label, etype, _, _ = _BATCH_KINDS[kind]
+    topic = TOPICS[etype]
+    items = _require_items(body, label)
     if items is None:
         return NoContent, 400
 
-    logger.info("Receiver: capacity batch trace_id=%s items=%d", trace, len(items))
+    logger.info("Receiver: %s batch trace_id=%s items=%d", label, trace, len(items))
+    BATCH_ITEMS.labels(kind).observe(len(items))
+    meta = _batch_meta(body, trace)
 
-    meta = {
-        "batchId": body.get("batchId"),
-        "senderId": body.get("senderId"),
-        "reportDate": body.get("reportDate"),
-        "sentAt": body.get("sentAt"),
-        "version": body.get("version"),
-        "trace_id": trace,
-    }
-
-    required = ("unitId", "totalBeds", "occupiedBeds", "recordedAt")
+    t0 = time.perf_counter()
+    events = _build_events(kind, items, meta)
+    t1 = time.perf_counter()
+    if events is None:
+        _observe_batch(kind, t1 - t0, 0.0, 0, rejected=len(items))
+        return NoContent, 400
 
     try:
-        producer = _get_producer("cap")   # 👉 uses global client + cached producer
+        producer = await _get_async_producer()
+        produced = time.time()
+        sends = []
+        for event in events:
+            event["timing"] = {"received": received_ts, "produced": produced}
+            sends.append(await producer.send(topic, ENCODE(event)))
+        await asyncio.gather(*sends)
     except Exception as e:
-        logger.exception("Receiver couldn't connect to Kafka (%s)", e)
+        logger.exception("Receiver couldn't publish to Kafka (%s)", e)
+        _observe_batch(kind, t1 - t0, time.perf_counter() - t1, 0, rejected=len(events))
         return NoContent, 503
 
-    for i, item in enumerate(items, start=1):
-        missing = [k for k in required if k not in item]
-        if missing:
-            logger.error("Capacity item #%d missing required fields: %s", i, ", ".join(missing))
-            return NoContent, 400
+    for event in events:
+        logger.info("→ Kafka topic=%s trace_id=%s payload=%s",
+                    topic, trace, event["payload"],
+                    extra={"sample_key": "receiver.item"})
+    _observe_batch(kind, t1 - t0, time.perf_counter() - t1, len(events))
+    return NoContent, 201
 
-        try:
-            total_beds = int(item["totalBeds"])
-            occupied_beds = int(item["occupiedBeds"])
-        except Exception:
-            logger.error("Capacity item #%d has non-integer totals: totalBeds=%r occupiedBeds=%r",
-                         i, item.get("totalBeds"), item.get("occupiedBeds"))
-            return NoContent, 400
-
-        payload = {
-            **meta,
-            "unitId": item["unitId"],
-            "totalBeds": total_beds,
-            "occupiedBeds": occupied_beds,
-            "recordedAt": item["recordedAt"],
-        }
-
-        event = {
-            "type": "capacity_snapshot",
-            "datetime": _now_iso(),
-            "payload": payload
-        }
 
-        try:
-            producer.produce(json.dumps(event).encode("utf-8"))
-            logger.info("→ Kafka topic=%s trace_id=%s payload=%s",
-                        KAFKA_TOPIC.decode(), payload.get("trace_id"), payload)
-        except Exception as e:
-            logger.exception("Receiver couldn't publish to Kafka (%s)", e)
-            return NoContent, 503
+async def report_admission_discharge_batch_async(body):
+    return await _report_batch_async("admission", body)
 
-    return NoContent, 201
 
-app = connexion.FlaskApp(__name__, specification_dir="")
-app.add_api("openapi.yml", strict_validation=True, validate_responses=False)
+async def report_capacity_batch_async(body):
+    return await _report_batch_async("capacity", body)
+
+
+def get_health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "healthy", "timestamp": _now_iso()}, 200
+
+
+def get_ready():
+    """Readiness: 200 once the Kafka producer(s) are connected."""
+    return READY.response()
+
+
+def _connect_sync_producers():
+    with_backoff(READY, "kafka", lambda: (_get_producer("adm"), _get_producer("cap")),
+                 logger, BACKOFF_INITIAL_SEC, BACKOFF_MAX_SEC)
+
+
+async def _connect_async_producer():
+    # with_backoff's loop, but awaiting instead of sleeping a thread.
+    delay = BACKOFF_INITIAL_SEC
+    attempt = 1
+    while True:
+        try:
+            await _get_async_producer()
+        except Exception as e:
+            READY.mark("kafka", False, f"attempt {attempt} failed: {e}")
+            logger.warning("kafka not ready (attempt %d): %s; retrying in %.1fs", attempt, e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BACKOFF_MAX_SEC)
+            attempt += 1
+            continue
+        READY.mark("kafka", True, "connected" if attempt == 1 else f"connected after {attempt} attempts")
+        logger.info("kafka ready after %d attempt(s)", attempt)
+        return
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    # Runs in every worker before it starts listening; the connection is
+    # only kicked off here, so the port is bound without waiting for Kafka.
+    if ASYNC_HANDLERS:
+        task = asyncio.create_task(_connect_async_producer())
+    else:
+        task = None
+        threading.Thread(target=_connect_sync_producers, name="kafka-connect", daemon=True).start()
+    yield
+    if task is not None:
+        task.cancel()
+    if _ASYNC_PRODUCER is not None:
+        await _ASYNC_PRODUCER.stop()
+
+
+def _resolve_handler(operation_id):
+    # Looked up here because importing "app" again under `python app.py`
+    # fails on duplicate Prometheus metric registration.
+    name = operation_id.rsplit(".", 1)[-1]
+    if ASYNC_HANDLERS and f"{name}_async" in globals():
+        name = f"{name}_async"
+    return globals()[name]
+
+
+if ASYNC_HANDLERS:
+    app = connexion.AsyncApp(__name__, specification_dir="", lifespan=lifespan)
+else:
+    app = connexion.FlaskApp(__name__, specification_dir="", lifespan=lifespan)
+app.add_api("openapi.yml", strict_validation=True, validate_responses=False,
+            resolver=Resolver(_resolve_handler))
 
 if __name__ == "__main__":
-    app.run(port=8080, host="0.0.0.0")
+    port = int(SERVER_CONF.get("port", 8080))
+    if SERVER_CONF.get("mode", "dev") == "asgi":
+        import uvicorn
+
+        workers = int(SERVER_CONF.get("workers", 1))
+        if workers > 1:
+            # Multiple workers need an import string, and each spawned worker
+            # would also re-run this file as __mp_main__ before importing
+            # "app", registering every metric twice. Hand over to a fresh
+            # interpreter whose main module isn't this file, with the
+            # workers' metrics going to a multiprocess dir emptied here.
+            shutil.rmtree(METRICS_DIR, ignore_errors=True)
+            os.makedirs(METRICS_DIR)
+            os.execve(sys.executable, [sys.executable, "-c", (
+                "import uvicorn; uvicorn.run('app:app', host='0.0.0.0', "
+                f"port={port}, workers={workers}, log_config=None, access_log=False)")],
+                {**os.environ, "PROMETHEUS_MULTIPROC_DIR": METRICS_DIR})
+        uvicorn.run(app, host="0.0.0.0", port=port, log_config=None, access_log=False)
+    else:
+        app.run(port=port, host="0.0.0.0")
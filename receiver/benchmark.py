@@ -0,0 +1,355 @@
+"""
+Load generator / throughput benchmark for the receiver.
+
+Drives /hospital/admissions and /hospital/capacity with a configurable
+number of concurrent clients, batch-size distribution and share of invalid
+items, then reports requests/sec, items/sec, latency percentiles and memory
+and writes the results as JSON so runs can be compared across releases.
+
+Two targets:
+
+  --url http://localhost:8080   a running receiver (real Kafka behind it)
+  --in-process                  this module imports app.py and swaps
+                                _get_producer (and _get_async_producer)
+                                for an in-memory fake, so only the
+                                receiver's own cost is measured
+
+To compare the dev server against the ASGI deployment, run the same load
+against each (server.mode in app_conf.yml) and diff the reports:
+
+  python benchmark.py --url http://localhost:8080 --concurrency 32 --out dev.json
+  python benchmark.py --url http://localhost:8080 --concurrency 32 --out asgi.json
+  python benchmark.py --compare dev.json asgi.json
+
+Without a broker, `--serve` runs the receiver the way `python app.py`
+would for the configured server.mode, but with the fake producer (and
+--fake-ack-ms) in place of Kafka and always a single worker, since the
+fake lives in this process. Point --url at it from a second shell.
+
+Run it inside the receiver container so /app/config is available, e.g.
+
+  docker compose exec receiver python benchmark.py --in-process \\
+      --concurrency 8 --duration 30 --batch-size uniform:1-50 --out /app/logs/bench.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+class FakeProducer:
+    """Stand-in for a pykafka sync producer; optionally sleeps to mimic an ack."""
+
+    def __init__(self, ack_ms=0.0):
+        self.ack_sec = ack_ms / 1000.0
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.messages = 0
+            self.bytes = 0
+
+    def produce(self, message):
+        if self.ack_sec:
+            time.sleep(self.ack_sec)
+        with self._lock:
+            self.messages += 1
+            self.bytes += len(message)
+
+
+class FakeAsyncProducer(FakeProducer):
+    """Stand-in for an aiokafka producer; send() returns an ack future."""
+
+    async def send(self, topic, value):
+        with self._lock:
+            self.messages += 1
+            self.bytes += len(value)
+        return asyncio.ensure_future(asyncio.sleep(self.ack_sec))
+
+
+def parse_distribution(spec):
+    """
+    fixed:N, uniform:A-B or choice:A,B,C -> zero-arg function returning a
+    batch size.
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "fixed":
+        n = int(arg)
+        return lambda: n
+    if kind == "uniform":
+        lo, hi = (int(x) for x in arg.split("-"))
+        return lambda: random.randint(lo, hi)
+    if kind == "choice":
+        choices = [int(x) for x in arg.split(",")]
+        return lambda: random.choice(choices)
+    raise ValueError(f"Unknown batch size distribution: {spec}")
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _admission_item(invalid):
+    item = {
+        "encounterId": f"E-{uuid.uuid4().hex[:12]}",
+        "event": random.choice(["admission", "discharge"]),
+        "recordedAt": _now_iso(),
+        "patientAge": random.randint(0, 99),
+    }
+    if invalid:
+        del item["encounterId"]
+    return item
+
+
+def _capacity_item(invalid):
+    total = random.randint(5, 60)
+    item = {
+        "unitId": random.choice(["ICU-2A", "ER-1", "MED-3", "SURG-4"]),
+        "totalBeds": total,
+        "occupiedBeds": random.randint(0, total),
+        "recordedAt": _now_iso(),
+    }
+    if invalid:
+        del item["unitId"]
+    return item
+
+
+def make_batch(kind, size, invalid_ratio):
+    make_item = _admission_item if kind == "admission" else _capacity_item
+    return {
+        "batchId": uuid.uuid4().hex,
+        "senderId": f"hospital-{random.randint(1, 20)}",
+        "reportDate": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+        "sentAt": _now_iso(),
+        "version": "1.0",
+        "items": [make_item(random.random() < invalid_ratio) for _ in range(size)],
+    }
+
+
+PATHS = {"admission": "/hospital/admissions", "capacity": "/hospital/capacity"}
+
+
+def _make_client(args):
+    """Returns post(path, body) -> status code."""
+    if args.in_process:
+        client = args.app.test_client()
+        return lambda path, body: client.post(path, json=body).status_code
+
+    import requests
+    session = requests.Session()
+    base = args.url.rstrip("/")
+    return lambda path, body: session.post(base + path, json=body, timeout=30).status_code
+
+
+def _worker(args, batch_size, deadline, results, lock):
+    post = _make_client(args)
+    latencies = []
+    statuses = {}
+    items_sent = 0
+    items_accepted = 0
+
+    while time.perf_counter() < deadline:
+        kind = random.choice(args.kinds)
+        size = batch_size()
+        body = make_batch(kind, size, args.invalid_ratio)
+
+        t0 = time.perf_counter()
+        try:
+            status = post(PATHS[kind], body)
+        except Exception:
+            status = "error"
+        latencies.append(time.perf_counter() - t0)
+
+        statuses[status] = statuses.get(status, 0) + 1
+        items_sent += size
+        if status == 201:
+            items_accepted += size
+
+    with lock:
+        results["latencies"].extend(latencies)
+        results["items_sent"] += items_sent
+        results["items_accepted"] += items_accepted
+        for status, n in statuses.items():
+            key = str(status)
+            results["statuses"][key] = results["statuses"].get(key, 0) + n
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, int(round((len(sorted_values) - 1) * pct / 100.0)))
+    return sorted_values[k]
+
+
+def _install_fake(receiver_app, ack_ms):
+    fake = FakeAsyncProducer(ack_ms=ack_ms)
+
+    async def get_async_producer():
+        return fake
+
+    receiver_app._get_producer = lambda cache_key: fake
+    receiver_app._get_async_producer = get_async_producer
+    return fake
+
+
+def serve(args):
+    import app as receiver_app
+
+    _install_fake(receiver_app, args.fake_ack_ms)
+    port = int(receiver_app.SERVER_CONF.get("port", 8080))
+    if receiver_app.SERVER_CONF.get("mode", "dev") == "asgi":
+        import uvicorn
+
+        uvicorn.run(receiver_app.app, host="0.0.0.0", port=port, log_config=None, access_log=False)
+    else:
+        receiver_app.app.run(port=port, host="0.0.0.0")
+
+
+def run(args):
+    fake = None
+    if args.in_process:
+        import app as receiver_app
+        fake = _install_fake(receiver_app, args.fake_ack_ms)
+        args.app = receiver_app.app
+
+    batch_size = parse_distribution(args.batch_size)
+    results = {"latencies": [], "items_sent": 0, "items_accepted": 0, "statuses": {}}
+    lock = threading.Lock()
+
+    # Warm up connections / imports outside the measured window.
+    warm_deadline = time.perf_counter() + args.warmup
+    warm = {"latencies": [], "items_sent": 0, "items_accepted": 0, "statuses": {}}
+    if args.warmup > 0:
+        _worker(args, batch_size, warm_deadline, warm, lock)
+    if fake is not None:
+        # Only count what the measured run produces.
+        fake.reset()
+
+    started_at = _now_iso()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=_worker, args=(args, batch_size, deadline, results, lock))
+        for _ in range(args.concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    lat = sorted(results["latencies"])
+    report = {
+        "started_at": started_at,
+        "target": "in-process" if args.in_process else args.url,
+        "server": _server_mode(args),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_sec": args.duration,
+            "batch_size": args.batch_size,
+            "invalid_ratio": args.invalid_ratio,
+            "kinds": args.kinds,
+            "fake_ack_ms": args.fake_ack_ms if args.in_process else None,
+        },
+        "requests": len(lat),
+        "elapsed_sec": round(elapsed, 3),
+        "requests_per_sec": round(len(lat) / elapsed, 1),
+        "items_per_sec": round(results["items_accepted"] / elapsed, 1),
+        "items_sent": results["items_sent"],
+        "items_accepted": results["items_accepted"],
+        "statuses": results["statuses"],
+        "latency_ms": {
+            "p50": round(_percentile(lat, 50) * 1000, 2) if lat else None,
+            "p99": round(_percentile(lat, 99) * 1000, 2) if lat else None,
+            "max": round(lat[-1] * 1000, 2) if lat else None,
+        },
+        # ru_maxrss is KiB on Linux. In-process this includes the receiver.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if fake is not None:
+        report["produced_messages"] = fake.messages
+        report["produced_bytes"] = fake.bytes
+    return report
+
+
+def _server_mode(args):
+    if not args.in_process:
+        return None
+    import app as receiver_app
+    return {"mode": "in-process", "async_handlers": receiver_app.ASYNC_HANDLERS}
+
+
+COMPARE_KEYS = ["requests_per_sec", "items_per_sec", "latency_ms.p50",
+                "latency_ms.p99", "latency_ms.max", "peak_rss_mb"]
+
+
+def _lookup(report, dotted):
+    value = report
+    for part in dotted.split("."):
+        value = (value or {}).get(part)
+    return value
+
+
+def compare(base_path, new_path):
+    """Side-by-side of two saved reports, with the relative change."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    rows = {}
+    for key in COMPARE_KEYS:
+        a, b = _lookup(base, key), _lookup(new, key)
+        change = None
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a:
+            change = f"{(b - a) / a * 100:+.1f}%"
+        rows[key] = {"base": a, "new": b, "change": change}
+    return {"base": base_path, "new": new_path, "metrics": rows}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = ap.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running receiver")
+    target.add_argument("--in-process", action="store_true",
+                        help="Import app.py and use an in-memory fake producer")
+    target.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="Compare two saved --out reports instead of running")
+    target.add_argument("--serve", action="store_true",
+                        help="Serve app.py over HTTP with the fake producer instead of running")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--duration", type=float, default=10.0, help="Measured seconds")
+    ap.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before the run")
+    ap.add_argument("--batch-size", default="uniform:1-50",
+                    help="fixed:N | uniform:A-B | choice:A,B,C (default uniform:1-50)")
+    ap.add_argument("--invalid-ratio", type=float, default=0.0,
+                    help="Probability that any one item is invalid")
+    ap.add_argument("--kinds", default="admission,capacity",
+                    help="Comma-separated subset of admission,capacity")
+    ap.add_argument("--fake-ack-ms", type=float, default=0.0,
+                    help="In-process and --serve: simulated broker ack time per message")
+    ap.add_argument("--out", help="Write the JSON report here as well as stdout")
+    args = ap.parse_args()
+    args.kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+
+    if args.serve:
+        serve(args)
+        return
+
+    report = compare(*args.compare) if args.compare else run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Wire format the receiver writes Kafka event values in, picked with
+events.codec in app_conf.yml:
+
+  json      json.dumps(event).encode("utf-8"), the original format
+  orjson    the same JSON bytes produced by orjson (falls back to json
+            when orjson isn't installed)
+  msgpack   one header byte, then MessagePack. Header 0x01 is schema v1:
+            [type, datetime, payload, timing, extra], where payload is a
+            list of values in SCHEMA_V1 order, so the camelCase keys are
+            not repeated in every message. Payload fields outside the
+            schema go in `extra`; a payload missing a schema field is
+            sent as a plain map instead.
+
+storage and the analyzer decode these by the first byte, so any encoder
+can be switched to without a coordinated deploy. decode() is kept here
+for codec_benchmark.py and the round-trip tests.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; plain json is always available
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional; only needed for the msgpack codec
+    msgpack = None
+
+CODECS = ("json", "orjson", "msgpack")
+
+HEADER_MSGPACK_V1 = 0x01
+
+_META_V1 = ("batchId", "senderId", "reportDate", "sentAt", "version", "trace_id")
+
+# Never reorder or remove entries: add a new header/version instead.
+SCHEMA_V1 = {
+    "admission_created": _META_V1 + ("encounterId", "event", "recordedAt", "patientAge"),
+    "capacity_snapshot": _META_V1 + ("unitId", "totalBeds", "occupiedBeds", "recordedAt"),
+}
+_TYPE_CODES_V1 = {etype: i for i, etype in enumerate(SCHEMA_V1)}
+_TYPE_NAMES_V1 = list(SCHEMA_V1)
+
+_JSON_FIRST_BYTES = frozenset(b"{ \t\r\n")
+
+
+def _encode_json(event):
+    return json.dumps(event).encode("utf-8")
+
+
+def _encode_orjson(event):
+    return orjson.dumps(event)
+
+
+def _encode_msgpack_v1(event):
+    etype = event.get("type")
+    payload = event.get("payload") or {}
+    schema = SCHEMA_V1.get(etype)
+
+    if schema is not None and all(k in payload for k in schema):
+        body_payload = [payload[k] for k in schema]
+        extra = {k: v for k, v in payload.items() if k not in schema} or None
+        type_code = _TYPE_CODES_V1[etype]
+    else:
+        body_payload, extra, type_code = payload, None, etype
+
+    body = [type_code, event.get("datetime"), body_payload, event.get("timing"), extra]
+    return bytes((HEADER_MSGPACK_V1,)) + msgpack.packb(body, use_bin_type=True)
+
+
+def _decode_msgpack_v1(value):
+    type_code, dt, body_payload, timing, extra = msgpack.unpackb(value[1:], raw=False)
+    etype = _TYPE_NAMES_V1[type_code] if isinstance(type_code, int) else type_code
+
+    if isinstance(body_payload, list):
+        payload = dict(zip(SCHEMA_V1[etype], body_payload))
+    else:
+        payload = body_payload
+    if extra:
+        payload.update(extra)
+
+    event = {"type": etype, "datetime": dt, "payload": payload}
+    if timing is not None:
+        event["timing"] = timing
+    return event
+
+
+def get_encoder(name):
+    """Returns encode(event dict) -> bytes for a codec name from CODECS."""
+    if name == "json":
+        return _encode_json
+    if name == "orjson":
+        return _encode_orjson if orjson is not None else _encode_json
+    if name == "msgpack":
+        if msgpack is None:
+            raise ValueError("events.codec msgpack needs the msgpack package")
+        return _encode_msgpack_v1
+    raise ValueError(f"events.codec must be one of {CODECS}, got {name!r}")
+
+
+def detect(value):
+    """Name of the format `value` is in: "json" or "msgpack"."""
+    if not value:
+        raise ValueError("Empty event value")
+    first = value[0]
+    if first in _JSON_FIRST_BYTES:
+        return "json"
+    if first == HEADER_MSGPACK_V1:
+        return "msgpack"
+    raise ValueError(f"Unknown event encoding header 0x{first:02x}")
+
+
+def decode(value):
+    """Event dict from any format written by an encoder above."""
+    if detect(value) == "json":
+        return orjson.loads(value) if orjson is not None else json.loads(value)
+    if msgpack is None:
+        raise ValueError("Got a msgpack event but the msgpack package isn't installed")
+    return _decode_msgpack_v1(value)
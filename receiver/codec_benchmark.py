@@ -0,0 +1,148 @@
+"""
+Bytes-per-event and encode/decode cost for each event codec (codec.py),
+with and without producer-side compression.
+
+Events are built the way the receiver builds them (same payload fields,
+trace id and timing stamps) from random batches, then for every codec:
+
+  bytes_per_event      mean encoded size of one Kafka message value
+  encode_us / decode_us  mean time per event for codec encode / decode
+  compressed           for each available compressor, bytes per event and
+                       compress time per event when --batch messages are
+                       compressed together, roughly what one producer
+                       request carries
+
+Only the compressors events.compression accepts are measured (gzip, and
+lz4 when it is installed; otherwise it is listed as missing).
+Needs no Kafka and no /app/config, e.g.
+
+  docker compose exec receiver python codec_benchmark.py --events 20000 --out /app/logs/codec.json
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+import uuid
+
+import codec
+from benchmark import make_batch
+
+
+def _compressors():
+    found = {"gzip": lambda data: gzip.compress(data, compresslevel=6)}
+    missing = []
+
+    try:
+        import lz4.frame
+        found["lz4"] = lz4.frame.compress
+    except ImportError:
+        missing.append("lz4")
+
+    return found, missing
+
+
+def make_events(n, capacity_ratio):
+    """n events shaped exactly like the receiver's Kafka messages."""
+    events = []
+    while len(events) < n:
+        kind = "capacity" if random.random() < capacity_ratio else "admission"
+        body = make_batch(kind, random.randint(1, 50), 0.0)
+        meta = {k: body[k] for k in ("batchId", "senderId", "reportDate", "sentAt", "version")}
+        meta["trace_id"] = str(uuid.uuid4())
+        etype = "capacity_snapshot" if kind == "capacity" else "admission_created"
+        now = time.time()
+        for item in body["items"]:
+            events.append({
+                "type": etype,
+                "datetime": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "payload": {**meta, **item},
+                "timing": {"received": now, "produced": now},
+            })
+    return events[:n]
+
+
+def _per_event_us(seconds, n):
+    return round(seconds / n * 1e6, 3)
+
+
+def bench_codec(name, events, compressors, batch):
+    encode = codec.get_encoder(name)
+    n = len(events)
+
+    t0 = time.perf_counter()
+    values = [encode(e) for e in events]
+    encode_sec = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    decoded = [codec.decode(v) for v in values]
+    decode_sec = time.perf_counter() - t0
+
+    if decoded != events:
+        raise AssertionError(f"{name} did not round-trip")
+
+    compressed = {}
+    for cname, compress in compressors.items():
+        total = 0
+        t0 = time.perf_counter()
+        for i in range(0, n, batch):
+            total += len(compress(b"".join(values[i:i + batch])))
+        compressed[cname] = {
+            "bytes_per_event": round(total / n, 1),
+            "compress_us": _per_event_us(time.perf_counter() - t0, n),
+        }
+
+    return {
+        "bytes_per_event": round(sum(len(v) for v in values) / n, 1),
+        "encode_us": _per_event_us(encode_sec, n),
+        "decode_us": _per_event_us(decode_sec, n),
+        "compressed": compressed,
+    }
+
+
+def run(args):
+    random.seed(args.seed)
+    events = make_events(args.events, args.capacity_ratio)
+    compressors, missing = _compressors()
+
+    results = {}
+    skipped = {}
+    for name in codec.CODECS:
+        if name == "orjson" and codec.orjson is None:
+            skipped[name] = "orjson not installed (would fall back to json)"
+            continue
+        try:
+            results[name] = bench_codec(name, events, compressors, args.batch)
+        except ValueError as e:
+            skipped[name] = str(e)
+
+    return {
+        "events": len(events),
+        "capacity_ratio": args.capacity_ratio,
+        "compression_batch": args.batch,
+        "codecs": results,
+        "skipped_codecs": skipped,
+        "missing_compressors": missing,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--events", type=int, default=20000)
+    ap.add_argument("--capacity-ratio", type=float, default=0.5)
+    ap.add_argument("--batch", type=int, default=50,
+                    help="Messages compressed together (default 50)")
+    ap.add_argument("--seed", type=int, default=3855)
+    ap.add_argument("--out", help="Write the JSON report here as well as stdout")
+    args = ap.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+app.py reads its config when it is imported, so before any test imports it
+point APP_CONFIG_DIR at a copy of config/receiver with console-only logging.
+Nothing here needs Kafka: producers are only connected from the ASGI
+lifespan, which the test client doesn't run, and the tests that produce
+swap in fakes.
+
+Run from this directory: python -m pytest
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+_CONF_DIR = Path(tempfile.mkdtemp(prefix="receiver-conf-"))
+shutil.copy(Path(__file__).resolve().parent.parent / "config" / "receiver" / "app_conf.yml",
+            _CONF_DIR / "app_conf.yml")
+(_CONF_DIR / "log_conf.yml").write_text(yaml.safe_dump({
+    "version": 1,
+    "handlers": {"console": {"class": "logging.StreamHandler", "level": "WARNING"}},
+    "loggers": {"basicLogger": {"handlers": ["console"], "level": "WARNING"}},
+}))
+os.environ["APP_CONFIG_DIR"] = str(_CONF_DIR)
+
+
+@pytest.fixture
+def receiver():
+    import app
+
+    return app
+
+
+@pytest.fixture
+def client(receiver):
+    return receiver.app.test_client()
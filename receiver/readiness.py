@@ -0,0 +1,84 @@
+"""
+Startup readiness for the receiver.
+
+The receiver binds its port straight away and connects its Kafka
+producer(s) in the background, so it can be up before Kafka is. /ready
+answers 200 once the producers are connected, and 503 with the last
+connection error and status "starting" until then. If Kafka is lost
+after that, /ready is 503 with status "not_ready", which the health
+service reports as an outage rather than a startup. /health stays a plain
+liveness check.
+
+with_backoff() is the connect loop for the sync producers: it retries
+with exponential backoff (plus jitter) and keeps the check's detail up to
+date. The async producer has its own awaiting copy of the loop in app.py.
+"""
+import random
+import time
+from datetime import datetime, timezone
+from threading import Lock
+
+_STARTED = time.monotonic()
+_STARTED_AT = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Readiness:
+    def __init__(self, required=()):
+        self._lock = Lock()
+        self._checks = {name: {"ok": False, "detail": "not started"} for name in required}
+        self._ready_after = None
+
+    def mark(self, name, ok, detail=None):
+        with self._lock:
+            self._checks[name] = {"ok": bool(ok), "detail": detail}
+            if self._ready_after is None and self._is_ready():
+                self._ready_after = time.monotonic() - _STARTED
+
+    def _is_ready(self):
+        return all(c["ok"] for c in self._checks.values())
+
+    def response(self):
+        """(body, status) for the /ready handler."""
+        with self._lock:
+            ready = self._is_ready()
+            if ready:
+                status = "ready"
+            elif self._ready_after is None:
+                status = "starting"
+            else:
+                # It was ready once, so this is an outage, not startup.
+                status = "not_ready"
+            body = {
+                "status": status,
+                "started_at": _STARTED_AT,
+                "uptime_sec": round(time.monotonic() - _STARTED, 3),
+                # Time from this module loading (early in startup) until Kafka
+                # was first connected; null until then.
+                "ready_after_sec": None if self._ready_after is None else round(self._ready_after, 3),
+                "checks": {name: dict(c) for name, c in self._checks.items()},
+            }
+        return body, 200 if ready else 503
+
+
+def with_backoff(readiness, name, connect, logger, initial_sec=0.5, max_sec=30.0):
+    """
+    Calls connect() until it returns without raising, marking `name` on
+    `readiness` as it goes, and returns its result.
+    """
+    delay = initial_sec
+    attempt = 1
+    while True:
+        try:
+            result = connect()
+        except Exception as e:
+            readiness.mark(name, False, f"attempt {attempt} failed: {e}")
+            logger.warning("%s not ready (attempt %d): %s; retrying in %.1fs",
+                           name, attempt, e, delay)
+            time.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 2, max_sec)
+            attempt += 1
+            continue
+
+        readiness.mark(name, True, "connected" if attempt == 1 else f"connected after {attempt} attempts")
+        logger.info("%s ready after %d attempt(s)", name, attempt)
+        return result
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+import codec
+from benchmark import FakeAsyncProducer, FakeProducer, make_batch
+
+
+@pytest.fixture
+def produced(receiver, monkeypatch):
+    """Both producers swapped for fakes that share one message count."""
+    sync = FakeProducer()
+    fake_async = FakeAsyncProducer()
+
+    async def get_async_producer():
+        return fake_async
+
+    monkeypatch.setattr(receiver, "_get_producer", lambda cache_key: sync)
+    monkeypatch.setattr(receiver, "_get_async_producer", get_async_producer)
+    return lambda: sync.messages + fake_async.messages
+
+
+def invalid_in_the_middle():
+    body = make_batch("admission", 5, invalid_ratio=0.0)
+    body["items"][2]["patientAge"] = "unknown"
+    return body
+
+
+def test_sync_batch_with_an_invalid_item_produces_nothing(receiver, produced):
+    assert receiver.report_admission_discharge_batch(invalid_in_the_middle())[1] == 400
+    assert produced() == 0
+
+
+def test_async_batch_with_an_invalid_item_produces_nothing(receiver, produced):
+    result = asyncio.run(receiver.report_admission_discharge_batch_async(invalid_in_the_middle()))
+
+    assert result[1] == 400
+    assert produced() == 0
+
+
+class ListProducer(list):
+    produce = list.append
+
+
+def test_valid_batch_is_produced_with_timing_stamps(receiver, monkeypatch):
+    sent = ListProducer()
+    monkeypatch.setattr(receiver, "_get_producer", lambda cache_key: sent)
+
+    assert receiver.report_capacity_batch(make_batch("capacity", 3, invalid_ratio=0.0))[1] == 201
+
+    events = [codec.decode(m) for m in sent]
+    assert [e["type"] for e in events] == ["capacity_snapshot"] * 3
+    assert all(e["timing"]["received"] <= e["timing"]["produced"] for e in events)
+
+
+def rejected(kind):
+    return REGISTRY.get_sample_value("receiver_items_total", {"kind": kind, "result": "rejected"}) or 0.0
+
+
+def test_an_invalid_item_counts_the_whole_batch_as_rejected(receiver, produced):
+    before = rejected("admission")
+
+    receiver.report_admission_discharge_batch(invalid_in_the_middle())
+    asyncio.run(receiver.report_admission_discharge_batch_async(invalid_in_the_middle()))
+
+    assert rejected("admission") - before == 10
+
+
+def test_batch_is_counted_as_rejected_when_kafka_is_unreachable(receiver, monkeypatch):
+    def no_kafka(cache_key):
+        raise ConnectionError("no brokers")
+
+    monkeypatch.setattr(receiver, "_get_producer", no_kafka)
+    before = rejected("capacity")
+
+    assert receiver.report_capacity_batch(make_batch("capacity", 3, invalid_ratio=0.0))[1] == 503
+
+    assert rejected("capacity") - before == 3
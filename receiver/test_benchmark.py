@@ -0,0 +1,60 @@
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import benchmark
+
+
+def test_batch_size_distributions():
+    assert benchmark.parse_distribution("fixed:7")() == 7
+    assert 2 <= benchmark.parse_distribution("uniform:2-4")() <= 4
+    assert benchmark.parse_distribution("choice:5,9")() in (5, 9)
+    with pytest.raises(ValueError):
+        benchmark.parse_distribution("normal:3")
+
+
+def test_invalid_items_lack_their_key():
+    batch = benchmark.make_batch("capacity", 3, invalid_ratio=1.0)
+
+    assert len(batch["items"]) == 3
+    assert all("unitId" not in item for item in batch["items"])
+
+
+def test_compare_reports_relative_change(tmp_path):
+    base, new = tmp_path / "base.json", tmp_path / "new.json"
+    base.write_text(json.dumps({"requests_per_sec": 100.0, "latency_ms": {"p50": 4.0}}))
+    new.write_text(json.dumps({"requests_per_sec": 150.0, "latency_ms": {"p50": 3.0}}))
+
+    rows = benchmark.compare(str(base), str(new))["metrics"]
+
+    assert rows["requests_per_sec"]["change"] == "+50.0%"
+    assert rows["latency_ms.p50"]["change"] == "-25.0%"
+    assert rows["peak_rss_mb"]["change"] is None
+
+
+def test_in_process_run_produces_every_accepted_item(receiver, monkeypatch):
+    # run() swaps these for the fake; restore them afterwards.
+    monkeypatch.setattr(receiver, "_get_producer", receiver._get_producer)
+    monkeypatch.setattr(receiver, "_get_async_producer", receiver._get_async_producer)
+    args = SimpleNamespace(in_process=True, fake_ack_ms=0.0, batch_size="fixed:5",
+                           concurrency=2, duration=0.3, warmup=0.2, invalid_ratio=0.0,
+                           kinds=["admission", "capacity"])
+    # A clock that moves one second per call, so stamps show call order.
+    stamps = []
+
+    def now_iso():
+        stamps.append((datetime(2025, 1, 1, tzinfo=timezone.utc)
+                       + timedelta(seconds=len(stamps))).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        return stamps[-1]
+
+    monkeypatch.setattr(benchmark, "_now_iso", now_iso)
+
+    report = benchmark.run(args)
+
+    # Stamped before the measured batches were built, not with the report.
+    assert report["started_at"] < stamps[-1]
+    assert report["requests"] > 0
+    assert report["statuses"] == {"201": report["requests"]}
+    assert report["produced_messages"] == report["items_accepted"] == 5 * report["requests"]
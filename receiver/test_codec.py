@@ -0,0 +1,45 @@
+import pytest
+
+import codec
+
+EVENT = {
+    "type": "capacity_snapshot",
+    "datetime": "2025-01-01T10:00:00",
+    "payload": {"batchId": "b", "senderId": "h-1", "reportDate": "2025-01-01",
+                "sentAt": "2025-01-01T10:00:00Z", "version": "1.0", "trace_id": "t",
+                "unitId": "ICU", "totalBeds": 10, "occupiedBeds": 4,
+                "recordedAt": "2025-01-01T09:59:00Z"},
+    "timing": {"received": 1.5, "produced": 1.6},
+}
+
+
+@pytest.mark.parametrize("name", codec.CODECS)
+def test_every_codec_round_trips(name):
+    assert codec.decode(codec.get_encoder(name)(EVENT)) == EVENT
+
+
+def test_msgpack_keeps_fields_outside_the_schema():
+    event = {**EVENT, "payload": {**EVENT["payload"], "note": "late"}}
+
+    assert codec.decode(codec.get_encoder("msgpack")(event)) == event
+
+
+def test_msgpack_falls_back_to_a_map_without_every_schema_field():
+    event = {**EVENT, "payload": {"unitId": "ICU"}}
+
+    assert codec.decode(codec.get_encoder("msgpack")(event)) == event
+
+
+def test_msgpack_is_smaller_than_json():
+    assert len(codec.get_encoder("msgpack")(EVENT)) < len(codec.get_encoder("json")(EVENT)) / 2
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        codec.get_encoder("avro")
+
+
+def test_configured_compression_maps_to_pykafka(receiver):
+    from pykafka.common import CompressionType
+
+    assert receiver._sync_compression() == getattr(CompressionType, receiver.COMPRESSION.upper())
@@ -0,0 +1,51 @@
+from prometheus_client import REGISTRY
+
+from benchmark import PATHS, FakeAsyncProducer, FakeProducer, make_batch
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_a_batch_moves_the_receiver_series(receiver, client, monkeypatch):
+    fake_async = FakeAsyncProducer()
+
+    async def get_async_producer():
+        return fake_async
+
+    monkeypatch.setattr(receiver, "_get_producer", lambda cache_key: FakeProducer())
+    monkeypatch.setattr(receiver, "_get_async_producer", get_async_producer)
+    series = [("receiver_validate_seconds_count", {"kind": "capacity"}),
+              ("receiver_produce_seconds_count", {"kind": "capacity"}),
+              ("receiver_batch_items_sum", {"kind": "capacity"}),
+              ("receiver_items_total", {"kind": "capacity", "result": "accepted"})]
+    before = [sample(name, **labels) for name, labels in series]
+
+    r = client.post(PATHS["capacity"], json=make_batch("capacity", 4, invalid_ratio=0.0))
+
+    assert r.status_code == 201
+    after = [sample(name, **labels) for name, labels in series]
+    assert [a - b for a, b in zip(after, before)] == [1, 1, 4, 4]
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'receiver_items_total{kind="capacity",result="accepted"}' in r.text
+
+
+def test_metrics_add_up_every_worker(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+
+    def in_a_worker(code):
+        return subprocess.run([sys.executable, "-c", f"import app; {code}"], env=env,
+                              capture_output=True, text=True, check=True).stdout
+
+    for _ in range(2):
+        in_a_worker('app.ITEMS.labels("capacity", "accepted").inc(3)')
+    scraped = in_a_worker("print(app.get_metrics()[0].decode())")
+
+    assert 'receiver_items_total{kind="capacity",result="accepted"} 6.0' in scraped
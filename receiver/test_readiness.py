@@ -0,0 +1,43 @@
+import logging
+
+from readiness import Readiness, with_backoff
+
+
+def test_ready_is_503_until_kafka_connects(receiver, client, monkeypatch):
+    import readiness
+
+    ready = Readiness(required=["kafka"])
+    monkeypatch.setattr(receiver, "READY", ready)
+    seen = []
+    # Look at /ready from inside the backoff sleep, after the failed attempt.
+    monkeypatch.setattr(readiness.time, "sleep", lambda sec: seen.append(client.get("/ready")))
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("no brokers")
+
+    assert client.get("/ready").json()["checks"] == {"kafka": {"ok": False, "detail": "not started"}}
+
+    with_backoff(ready, "kafka", connect, logging.getLogger("test"))
+
+    assert seen[0].status_code == 503
+    assert seen[0].json()["checks"]["kafka"]["detail"] == "attempt 1 failed: no brokers"
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["status"] == "ready"
+    assert r.json()["checks"]["kafka"]["detail"] == "connected after 2 attempts"
+
+
+def test_losing_kafka_after_startup_is_not_ready_rather_than_starting(receiver, client, monkeypatch):
+    ready = Readiness(required=["kafka"])
+    monkeypatch.setattr(receiver, "READY", ready)
+    assert client.get("/ready").json()["status"] == "starting"
+
+    ready.mark("kafka", True, "connected")
+    ready.mark("kafka", False, "attempt 1 failed: no brokers")
+
+    r = client.get("/ready")
+    assert r.status_code == 503
+    assert r.json()["status"] == "not_ready"
@@ -0,0 +1,25 @@
+import pytest
+
+from topics import produce_topics
+
+PER_TYPE = {"topic": "events", "routing": "per_type",
+            "topics": {"admission_created": "events.admission",
+                       "capacity_snapshot": "events.capacity"}}
+
+
+def test_shared_routing_sends_every_type_to_one_topic():
+    assert set(produce_topics({"topic": "events"}).values()) == {"events"}
+
+
+def test_per_type_routing():
+    assert produce_topics(PER_TYPE) == {"admission_created": "events.admission",
+                                        "capacity_snapshot": "events.capacity"}
+
+
+@pytest.mark.parametrize("conf", [
+    {**PER_TYPE, "routing": "by_sender"},
+    {**PER_TYPE, "topics": {"admission_created": "events.admission"}},
+])
+def test_unusable_routing_is_rejected(conf):
+    with pytest.raises(ValueError):
+        produce_topics(conf)
@@ -0,0 +1,23 @@
+"""
+The Kafka topic the receiver produces each event type to, from the
+`events` section of app_conf.yml: with routing "shared" (the default)
+every type goes to `topic`, with "per_type" each goes to its entry in
+`topics`.
+"""
+
+EVENT_TYPES = ("admission_created", "capacity_snapshot")
+
+
+def produce_topics(events_conf):
+    """{event type: topic}; raises ValueError for an unusable routing."""
+    mode = events_conf.get("routing", "shared")
+    if mode == "shared":
+        return {t: events_conf["topic"] for t in EVENT_TYPES}
+    if mode != "per_type":
+        raise ValueError(f"events.routing must be shared or per_type, got {mode!r}")
+
+    topics = events_conf.get("topics") or {}
+    missing = [t for t in EVENT_TYPES if t not in topics]
+    if missing:
+        raise ValueError(f"events.topics has no topic for: {', '.join(missing)}")
+    return {t: topics[t] for t in EVENT_TYPES}
@@ -1,25 +1,37 @@
 import json
 import logging
-import logging.config
+import os
+from datetime import datetime, timezone
 from threading import Thread
 from dateutil import parser
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, insert, select, text
 from sqlalchemy.orm import sessionmaker
 import connexion
+from connexion.datastructures import MediaTypeDict
+from connexion.middleware import MiddlewarePosition
+from connexion.resolver import Resolver
+from connexion.validators import VALIDATOR_MAP, AbstractRequestBodyValidator
 from connexion import NoContent
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
 import yaml
-from pykafka import KafkaClient
-from pykafka.common import OffsetType          # PART 3: for consumer options
-from pykafka.exceptions import KafkaException  # PART 3: to catch Kafka-specific errors
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
 from models import AdmissionDischarge, Capacity, Base
+from latency import STAGES, LatencyTracker
 from database import ENGINE
 import time
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from models import Base
 from database import ENGINE
+import codec
+import log_setup
+from readiness import Readiness, with_backoff
+from topics import consume_topics
 
+# Mounted at /app/config by compose; the tests point this at their own copy.
+CONFIG_DIR = os.environ.get("APP_CONFIG_DIR", "/app/config")
 
-with open("/app/config/app_conf.yml", "r") as f:
+with open(f"{CONFIG_DIR}/app_conf.yml", "r") as f:
     APP_CONF = yaml.safe_load(f.read())
 
 db_conf = APP_CONF["datastore"]
@@ -30,14 +42,26 @@ DB_ENGINE_STRING = (
 
 KAFKA_HOST = APP_CONF["events"]["hostname"]
 KAFKA_PORT = APP_CONF["events"]["port"]
-KAFKA_TOPIC = APP_CONF["events"]["topic"].encode()
-
-_KAFKA_CLIENT = None
-_CONSUMER = None
-
-with open("/app/config/log_conf.yml", "r") as f:
+# One consumer (and thread) per topic, so admissions and capacity can be
+# consumed independently when events.routing is per_type.
+CONSUME_TOPICS = consume_topics(APP_CONF["events"])
+
+_KAFKA_CLIENTS = {}
+_CONSUMERS = {}
+
+# startup.fast binds the HTTP port straight away and creates the tables /
+# connects the consumers in the background (exponential backoff between
+# attempts); /ready reports 503 until all of them are up. With fast off,
+# init_db blocks before the app starts, as it always used to.
+STARTUP_CONF = APP_CONF.get("startup", {})
+FAST_START = bool(STARTUP_CONF.get("fast", True))
+BACKOFF_INITIAL_SEC = float(STARTUP_CONF.get("backoff_initial_sec", 0.5))
+BACKOFF_MAX_SEC = float(STARTUP_CONF.get("backoff_max_sec", 30))
+READY = Readiness(required=["database"] + [f"kafka:{t}" for t in CONSUME_TOPICS])
+
+with open(f"{CONFIG_DIR}/log_conf.yml", "r") as f:
     LOG_CONF = yaml.safe_load(f.read())
-logging.config.dictConfig(LOG_CONF)
+log_setup.configure(LOG_CONF)
 logger = logging.getLogger("basicLogger")
 
 ENGINE = create_engine(
@@ -50,6 +74,49 @@ ENGINE = create_engine(
 )
 SessionLocal = sessionmaker(bind=ENGINE, autoflush=False, autocommit=False, future=True)
 
+# Hot-path metrics, per Kafka message / stored row.
+DECODE_SECONDS = Histogram(
+    "storage_decode_seconds", "Time to decode one Kafka message")
+INSERT_SECONDS = Histogram(
+    "storage_insert_seconds", "Time to build and add one row to the session", ["kind"])
+COMMIT_SECONDS = Histogram(
+    "storage_commit_seconds", "Time to commit one row", ["kind"])
+ROWS = Counter(
+    "storage_rows_total", "Rows written, by outcome", ["kind", "result"])
+MESSAGES = Counter(
+    "storage_messages_total", "Kafka messages consumed, by outcome", ["result"])
+POOL_CHECKED_OUT = Gauge(
+    "storage_db_pool_checked_out", "SQLAlchemy pool connections currently checked out")
+POOL_CHECKED_OUT.set_function(lambda: ENGINE.pool.checkedout())
+CONSUMER_LAG = Gauge(
+    "storage_kafka_consumer_lag", "Messages between the storage consumer and the head of the topic",
+    ["topic"])
+PIPELINE_SECONDS = Histogram(
+    "storage_pipeline_latency_seconds", "Receiver-to-commit latency by stage", ["etype", "stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300))
+
+BULK_SECONDS = Histogram(
+    "storage_bulk_seconds", "Time spent per bulk request, by stage", ["kind", "stage"])
+BULK_ROWS = Histogram(
+    "storage_bulk_rows", "Rows per bulk request", ["kind"],
+    buckets=(10, 100, 500, 1000, 5000, 10000, 50000, 100000))
+
+# Bulk POSTs for direct loaders: requests over max_bytes / max_rows get a
+# 413; rows are inserted chunk_rows at a time in a single transaction.
+BULK_CONF = APP_CONF.get("bulk", {})
+BULK_MAX_BYTES = int(BULK_CONF.get("max_bytes", 32 * 1024 * 1024))
+BULK_MAX_ROWS = int(BULK_CONF.get("max_rows", 50000))
+BULK_CHUNK_ROWS = int(BULK_CONF.get("chunk_rows", 1000))
+BULK_MAX_ERRORS = int(BULK_CONF.get("max_reported_errors", 100))
+
+LATENCY_CONF = APP_CONF.get("latency", {})
+_LATENCY = LatencyTracker(
+    window_sec=int(LATENCY_CONF.get("window_sec", 300)),
+    slot_sec=int(LATENCY_CONF.get("slot_sec", 10)),
+    slow_ms=float(LATENCY_CONF.get("slow_ms", 2000)),
+    slow_samples=int(LATENCY_CONF.get("slow_samples", 100)),
+)
+
 
 def _parse_dt(s: str):
     return parser.isoparse(s)
@@ -67,27 +134,55 @@ def _row_to_dict(obj):
     return {k: v for k, v in obj.__dict__.items() if k != "_sa_instance_state"}
 
 
+def _admission_row(body):
+    """Column values for one admission/discharge payload; raises on bad input."""
+    return {
+        "batch_id": body["batchId"],
+        "sender_id": body["senderId"],
+        "report_date": _parse_date(body["reportDate"]),
+        "sent_at": _parse_dt(body["sentAt"]),
+        "version": body["version"],
+        "encounter_id": body["encounterId"],
+        "event": body["event"],
+        "recorded_at": _parse_dt(body["recordedAt"]),
+        "patient_age": int(body["patientAge"]),
+        "trace_id": body["trace_id"],
+    }
+
+
+def _capacity_row(body):
+    """Column values for one capacity payload; raises on bad input."""
+    return {
+        "batch_id": body["batchId"],
+        "sender_id": body["senderId"],
+        "report_date": _parse_date(body["reportDate"]),
+        "sent_at": _parse_dt(body["sentAt"]),
+        "version": body["version"],
+        "unit_id": body["unitId"],
+        "total_beds": int(body["totalBeds"]),
+        "occupied_beds": int(body["occupiedBeds"]),
+        "recorded_at": _parse_dt(body["recordedAt"]),
+        "trace_id": body["trace_id"],
+    }
+
+
 def create_admission_discharge(body):
     with SessionLocal() as session:
         try:
-            row = AdmissionDischarge(
-                batch_id=body["batchId"],
-                sender_id=body["senderId"],
-                report_date=_parse_date(body["reportDate"]),
-                sent_at=_parse_dt(body["sentAt"]),
-                version=body["version"],
-                encounter_id=body["encounterId"],
-                event=body["event"],
-                recorded_at=_parse_dt(body["recordedAt"]),
-                patient_age=int(body["patientAge"]),
-                trace_id=body["trace_id"],
-            )
+            t0 = time.perf_counter()
+            row = AdmissionDischarge(**_admission_row(body))
             session.add(row)
+            t1 = time.perf_counter()
             session.commit()
-            logger.info("Stored admission/discharge trace_id=%s", body["trace_id"])
+            COMMIT_SECONDS.labels("admission").observe(time.perf_counter() - t1)
+            INSERT_SECONDS.labels("admission").observe(t1 - t0)
+            ROWS.labels("admission", "stored").inc()
+            logger.info("Stored admission/discharge trace_id=%s", body["trace_id"],
+                        extra={"sample_key": "storage.row"})
             return NoContent, 201
         except Exception as e:
             session.rollback()
+            ROWS.labels("admission", "failed").inc()
             logger.exception("Failed to store admission/discharge: %s", e)
             return NoContent, 400
 
@@ -95,106 +190,350 @@ def create_admission_discharge(body):
 def create_capacity(body):
     with SessionLocal() as session:
         try:
-            row = Capacity(
-                batch_id=body["batchId"],
-                sender_id=body["senderId"],
-                report_date=_parse_date(body["reportDate"]),
-                sent_at=_parse_dt(body["sentAt"]),
-                version=body["version"],
-                unit_id=body["unitId"],
-                total_beds=int(body["totalBeds"]),
-                occupied_beds=int(body["occupiedBeds"]),
-                recorded_at=_parse_dt(body["recordedAt"]),
-                trace_id=body["trace_id"],
-            )
+            t0 = time.perf_counter()
+            row = Capacity(**_capacity_row(body))
             session.add(row)
+            t1 = time.perf_counter()
             session.commit()
-            logger.info("Stored capacity trace_id=%s", body["trace_id"])
+            COMMIT_SECONDS.labels("capacity").observe(time.perf_counter() - t1)
+            INSERT_SECONDS.labels("capacity").observe(t1 - t0)
+            ROWS.labels("capacity", "stored").inc()
+            logger.info("Stored capacity trace_id=%s", body["trace_id"],
+                        extra={"sample_key": "storage.row"})
             return NoContent, 201
         except Exception as e:
             session.rollback()
+            ROWS.labels("capacity", "failed").inc()
             logger.exception("Failed to store capacity: %s", e)
             return NoContent, 400
 
 
-def _get_consumer():
+_BULK_KINDS = {
+    "admission": (AdmissionDischarge, "admission_created", _admission_row),
+    "capacity": (Capacity, "capacity_snapshot", _capacity_row),
+}
 
-    global _KAFKA_CLIENT, _CONSUMER
 
-    if _CONSUMER is not None:
-        return _CONSUMER
+def _row_error(e):
+    if isinstance(e, KeyError):
+        return f"missing field {e.args[0]}"
+    if isinstance(e, SQLAlchemyError) and getattr(e, "orig", None) is not None:
+        return str(e.orig)
+    return str(e) or type(e).__name__
 
-    try:
-        logger.info("Storage: creating Kafka client to %s:%s", KAFKA_HOST, KAFKA_PORT)
-        _KAFKA_CLIENT = KafkaClient(hosts=f"{KAFKA_HOST}:{KAFKA_PORT}")
 
-        topic = _KAFKA_CLIENT.topics[KAFKA_TOPIC]
-        _CONSUMER = topic.get_simple_consumer(
-            reset_offset_on_start=False,
-            auto_offset_reset=OffsetType.LATEST,
-        )
-        logger.info("Storage: Kafka consumer created for topic=%s", KAFKA_TOPIC.decode())
-        return _CONSUMER
+def _parse_bulk_body(body):
+    """
+    Items of the request body: a JSON array connexion already parsed, or
+    the raw bytes of an NDJSON body, parsed here line by line. Returns
+    (items, errors); a bad NDJSON line becomes a None item plus an error
+    at its index.
+    """
+    if isinstance(body, list):
+        return body, []
+    if not isinstance(body, bytes):
+        raise ValueError("body must be a JSON array or NDJSON")
+
+    items, errors = [], []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            errors.append({"index": len(items), "error": f"invalid JSON: {e}"})
+            items.append(None)
+    return items, errors
+
+
+class NDJSONBodyValidator(AbstractRequestBodyValidator):
+    """
+    Hands NDJSON bodies to the handler untouched. connexion's JSON
+    validator claims every */*json media type, application/x-ndjson
+    included, and would reject the body as one malformed JSON document.
+    """
 
-    except KafkaException as e:
-        logger.warning("Storage: error creating Kafka consumer: %s", e)
-        _KAFKA_CLIENT = None
-        _CONSUMER = None
-        return None
+    async def wrap_receive(self, receive, *, scope):
+        return receive, scope
 
 
-def process_messages():
+class BulkBodyLimit:
     """
-    Background loop that reads from Kafka forever.
-    If Kafka goes down, we catch the error, reset the consumer,
-    wait a bit, and retry without killing the service.
+    ASGI middleware that turns away bulk uploads over bulk.max_bytes by
+    their Content-Length, before connexion or the handler reads the body.
     """
-    global _KAFKA_CLIENT, _CONSUMER
 
-    logger.info("Storage: starting Kafka consumer loop")
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/bulk"):
+            length = Headers(scope=scope).get("content-length")
+            if length is None or not length.isdigit():
+                response = JSONResponse({"message": "Bulk uploads need a Content-Length"}, 411)
+            elif int(length) > BULK_MAX_BYTES:
+                response = JSONResponse({"message": f"Body is larger than {BULK_MAX_BYTES} bytes"}, 413)
+            else:
+                response = None
+            if response is not None:
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def _bulk_rows(kind, items, errors):
+    """
+    Validated (index, column values) for every usable item. Items may be
+    bare payloads or whole Kafka events ({"type", "payload", ...}).
+    """
+    _, etype, build = _BULK_KINDS[kind]
+    rows = []
+    for i, item in enumerate(items):
+        if item is None:
+            continue
+        if isinstance(item, dict) and "payload" in item and "type" in item:
+            if item["type"] != etype:
+                errors.append({"index": i, "error": f"event type {item['type']} is not {etype}"})
+                continue
+            item = item["payload"]
+        try:
+            rows.append((i, build(item)))
+        except Exception as e:
+            errors.append({"index": i, "error": _row_error(e)})
+    return rows
 
-    while True:
-        consumer = _get_consumer()
-        if consumer is None:
-            logger.info("Storage: Kafka unavailable, retrying in 5 seconds...")
-            time.sleep(5)
+
+def _insert_chunks(session, model, rows, errors):
+    """
+    Multi-row INSERTs of chunk_rows each, every chunk under a savepoint.
+    A failing chunk is retried row by row so only the bad rows are lost.
+    """
+    stored = 0
+    for start in range(0, len(rows), BULK_CHUNK_ROWS):
+        chunk = rows[start:start + BULK_CHUNK_ROWS]
+        try:
+            with session.begin_nested():
+                session.execute(insert(model), [values for _, values in chunk])
+            stored += len(chunk)
+            continue
+        except SQLAlchemyError as e:
+            if getattr(e, "connection_invalidated", False):
+                raise
+
+        for i, values in chunk:
+            try:
+                with session.begin_nested():
+                    session.execute(insert(model), [values])
+                stored += 1
+            except SQLAlchemyError as e:
+                if getattr(e, "connection_invalidated", False):
+                    raise
+                errors.append({"index": i, "error": _row_error(e)})
+    return stored
+
+
+def _create_bulk(kind, body, atomic):
+    t0 = time.perf_counter()
+    try:
+        items, errors = _parse_bulk_body(body)
+    except ValueError as e:
+        return {"message": f"Unreadable body: {e}"}, 400
+    if len(items) > BULK_MAX_ROWS:
+        return {"message": f"More than {BULK_MAX_ROWS} rows in one request"}, 413
+
+    BULK_ROWS.labels(kind).observe(len(items))
+    rows = _bulk_rows(kind, items, errors)
+    t1 = time.perf_counter()
+    BULK_SECONDS.labels(kind, "validate").observe(t1 - t0)
+
+    stored = 0
+    if rows and not (atomic and errors):
+        model = _BULK_KINDS[kind][0]
+        with SessionLocal() as session:
+            try:
+                stored = _insert_chunks(session, model, rows, errors)
+                t2 = time.perf_counter()
+                BULK_SECONDS.labels(kind, "insert").observe(t2 - t1)
+                if atomic and errors:
+                    session.rollback()
+                    stored = 0
+                else:
+                    session.commit()
+                    BULK_SECONDS.labels(kind, "commit").observe(time.perf_counter() - t2)
+            except Exception as e:
+                session.rollback()
+                logger.exception("Bulk %s insert failed: %s", kind, e)
+                return {"message": f"Bulk insert failed: {_row_error(e)}"}, 503
+
+    ROWS.labels(kind, "stored").inc(stored)
+    ROWS.labels(kind, "failed").inc(len(items) - stored)
+    logger.info("Bulk %s: received=%d stored=%d failed=%d in %.3fs",
+                kind, len(items), stored, len(errors), time.perf_counter() - t0)
+
+    errors.sort(key=lambda err: err["index"])
+    status = 201 if not errors else (207 if stored else 400)
+    return {
+        "received": len(items),
+        "stored": stored,
+        "failed": len(items) - stored,
+        "errors": errors[:BULK_MAX_ERRORS],
+        "errors_truncated": len(errors) > BULK_MAX_ERRORS,
+    }, status
+
+
+def create_admission_bulk(body, atomic=False):
+    return _create_bulk("admission", body, atomic)
+
+
+def create_capacity_bulk(body, atomic=False):
+    return _create_bulk("capacity", body, atomic)
+
+
+def _get_consumer(topic_name):
+    """Consumer for one topic, created on first use; raises if Kafka is down."""
+    if topic_name in _CONSUMERS:
+        return _CONSUMERS[topic_name]
+
+    # pykafka is only needed by the consumer threads, not to serve HTTP.
+    from pykafka import KafkaClient
+    from pykafka.common import OffsetType
+
+    logger.info("Storage: creating Kafka client to %s:%s", KAFKA_HOST, KAFKA_PORT)
+    client = KafkaClient(hosts=f"{KAFKA_HOST}:{KAFKA_PORT}")
+
+    topic = client.topics[topic_name.encode()]
+    consumer = topic.get_simple_consumer(
+        reset_offset_on_start=False,
+        auto_offset_reset=OffsetType.LATEST,
+    )
+    _KAFKA_CLIENTS[topic_name] = client
+    _CONSUMERS[topic_name] = consumer
+    logger.info("Storage: Kafka consumer created for topic=%s", topic_name)
+    return consumer
+
+
+def _record_latency(etype, trace_id, timing, consumed, committed):
+    result = _LATENCY.record(etype, trace_id, timing, consumed, committed)
+    if result is None:
+        return
+    stages, slow = result
+    for stage in STAGES:
+        PIPELINE_SECONDS.labels(etype, stage).observe(max(stages[stage], 0.0) / 1000.0)
+    if slow:
+        logger.warning(
+            "Slow trace trace_id=%s type=%s end_to_end=%.0fms receiver=%.0fms broker=%.0fms db=%.0fms",
+            trace_id, etype, stages["end_to_end"], stages["receiver"], stages["broker"], stages["db"]
+        )
+
+
+def get_pipeline_latency():
+    return _LATENCY.summary(), 200
+
+
+def handle_message(value: bytes):
+    """Decodes one raw Kafka message value and stores it."""
+    t0 = time.perf_counter()
+    message = codec.decode(value)
+    DECODE_SECONDS.observe(time.perf_counter() - t0)
+    etype = message.get("type")
+    payload = message.get("payload", {})
+
+    logger.info("Kafka message received type=%s", etype, extra={"sample_key": "storage.message"})
+
+    consumed = time.time()
+    if etype == "admission_created":
+        _, status = create_admission_discharge(payload)
+    elif etype == "capacity_snapshot":
+        _, status = create_capacity(payload)
+    else:
+        logger.warning("Unknown message type: %s", etype)
+        MESSAGES.labels("unknown").inc()
+        return
+    MESSAGES.labels("processed").inc()
+
+    if status == 201 and "timing" in message:
+        _record_latency(etype, payload.get("trace_id"),
+                        message["timing"], consumed, time.time())
+
+
+def consume_from(source):
+    """
+    Feeds every message from `source` (an iterable of objects with a
+    `.value` bytes attribute, e.g. a pykafka consumer) into storage.
+    Errors on individual messages are logged and skipped.
+    """
+    for msg in source:
+        if msg is None:
             continue
 
         try:
-            for msg in consumer:
-                if msg is None:
-                    continue
+            handle_message(msg.value)
+        except Exception as e:
+            MESSAGES.labels("error").inc()
+            logger.exception("Storage: error processing Kafka message: %s", e)
 
-                try:
-                    message = json.loads(msg.value.decode("utf-8"))
-                    etype = message.get("type")
-                    payload = message.get("payload", {})
 
-                    logger.info("Kafka message received type=%s", etype)
+def process_messages(topic_name):
+    """
+    Background loop that reads one topic from Kafka forever.
+    If Kafka goes down, we catch the error, reset the consumer and
+    reconnect with backoff without killing the service.
+    """
+    from pykafka.exceptions import KafkaException
 
-                    if etype == "admission_created":
-                        create_admission_discharge(payload)
-                    elif etype == "capacity_snapshot":
-                        create_capacity(payload)
-                    else:
-                        logger.warning("Unknown message type: %s", etype)
+    check = f"kafka:{topic_name}"
+    # The consumers start at the latest offset, so don't read anything
+    # until the tables exist to put it in (init_db already ran otherwise).
+    if FAST_START:
+        READY.wait("database")
+    logger.info("Storage: starting Kafka consumer loop for topic=%s", topic_name)
 
-                except Exception as e:
-                    logger.exception("Storage: error processing Kafka message: %s", e)
+    while True:
+        consumer = with_backoff(READY, check, lambda: _get_consumer(topic_name), logger,
+                                BACKOFF_INITIAL_SEC, BACKOFF_MAX_SEC)
+        try:
+            consume_from(consumer)
 
         except KafkaException as e:
-            logger.warning("Storage: exception in Kafka consumer loop: %s", e)
+            logger.warning("Storage: exception in Kafka consumer loop for topic=%s: %s", topic_name, e)
+            READY.mark(check, False, f"consumer failed: {e}")
             try:
-                if _CONSUMER is not None:
-                    _CONSUMER.stop()
+                consumer.stop()
             except Exception:
                 pass
 
-            _CONSUMER = None
-            _KAFKA_CLIENT = None
+            _CONSUMERS.pop(topic_name, None)
+            _KAFKA_CLIENTS.pop(topic_name, None)
+
+
+def _consumer_lag(topic_name):
+    """Computed on scrape; nan while there is no consumer."""
+    consumer = _CONSUMERS.get(topic_name)
+    if consumer is None:
+        return float("nan")
+    try:
+        latest = consumer.topic.latest_available_offsets()
+        held = consumer.held_offsets
+        return sum(
+            max(0, resp.offset[0] - (held.get(pid, -1) + 1))
+            for pid, resp in latest.items()
+        )
+    except Exception:
+        return float("nan")
+
+
+for _topic in CONSUME_TOPICS:
+    CONSUMER_LAG.labels(_topic).set_function(lambda t=_topic: _consumer_lag(t))
+
+
+# The 0.0.4 text format, whichever version prometheus_client's
+# CONTENT_TYPE_LATEST names. No charset here: connexion wants exactly the
+# spec's type, and Flask appends "; charset=utf-8" to it by itself.
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
 
-            logger.info("Storage: will retry Kafka connection in 5 seconds...")
-            time.sleep(5)
+def get_metrics():
+    return generate_latest(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
 
 
 def get_admission_readings(start_timestamp, end_timestamp):
@@ -227,14 +566,109 @@ def get_capacity_readings(start_timestamp, end_timestamp):
         return [_row_to_dict(r) for r in rows], 200
 
 
+# Reconciliation support: per-window counts and order-independent checksums
+# computed inside MySQL, so the analyzer can compare against Kafka without
+# pulling whole tables. The key hash must match analyzer/reconcile.py:
+# first 15 hex digits of MD5("<trace_id>:<entity id>"), summed mod 2**64.
+_RECONCILE_TABLES = {
+    "admission": (AdmissionDischarge.__tablename__, "encounter_id"),
+    "capacity": (Capacity.__tablename__, "unit_id"),
+}
+
+_WINDOW_EXPR = "TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', recorded_at) DIV :window_sec"
+# Bounds as written, so the recorded_at index serves the range.
+_FROM_SEC = "recorded_at >= TIMESTAMPADD(SECOND, :from_sec, '1970-01-01 00:00:00')"
+_TO_SEC = "recorded_at < TIMESTAMPADD(SECOND, :to_sec, '1970-01-01 00:00:00')"
+
+
+def _window_checksums(kind, window_sec, from_sec=None, to_sec=None):
+    try:
+        window_sec = int(window_sec)
+        if window_sec <= 0:
+            raise ValueError
+        params = {"window_sec": window_sec}
+        where = []
+        if from_sec is not None:
+            params["from_sec"] = int(from_sec)
+            where.append(_FROM_SEC)
+        if to_sec is not None:
+            params["to_sec"] = int(to_sec)
+            where.append(_TO_SEC)
+    except Exception:
+        return {"message": "window_sec must be a positive integer, from_sec/to_sec integers"}, 400
+
+    table, entity_col = _RECONCILE_TABLES[kind]
+    sql = text(
+        f"SELECT {_WINDOW_EXPR} AS w, COUNT(*) AS n, "
+        f"SUM(CAST(CONV(SUBSTRING(MD5(CONCAT(trace_id, ':', {entity_col})), 1, 15), 16, 10) "
+        f"AS UNSIGNED)) AS h "
+        f"FROM {table} "
+        + (f"WHERE {' AND '.join(where)} " if where else "")
+        + "GROUP BY w"
+    )
+    with SessionLocal() as session:
+        rows = session.execute(sql, params).all()
+
+    return [
+        {"window": int(w), "count": int(n), "checksum": int(h or 0) % (1 << 64)}
+        for w, n, h in rows
+    ], 200
+
+
+def _window_keys(kind, window_sec, window):
+    try:
+        window_sec = int(window_sec)
+        window = int(window)
+        if window_sec <= 0:
+            raise ValueError
+    except Exception:
+        return {"message": "window_sec and window must be integers"}, 400
+
+    table, entity_col = _RECONCILE_TABLES[kind]
+    sql = text(f"SELECT trace_id, {entity_col} FROM {table} WHERE {_FROM_SEC} AND {_TO_SEC}")
+    params = {"from_sec": window * window_sec, "to_sec": (window + 1) * window_sec}
+    with SessionLocal() as session:
+        rows = session.execute(sql, params).all()
+
+    return [{"trace_id": t, "entity_id": e} for t, e in rows], 200
+
+
+def get_admission_checksums(window_sec, from_sec=None, to_sec=None):
+    return _window_checksums("admission", window_sec, from_sec, to_sec)
+
+
+def get_capacity_checksums(window_sec, from_sec=None, to_sec=None):
+    return _window_checksums("capacity", window_sec, from_sec, to_sec)
+
+
+def get_admission_keys(window_sec, window):
+    return _window_keys("admission", window_sec, window)
+
+
+def get_capacity_keys(window_sec, window):
+    return _window_keys("capacity", window_sec, window)
+
+
+def _create_schema():
+    """
+    create_all only creates missing tables, so indexes added to a model
+    later (recorded_at) are created here on tables that already exist.
+    """
+    Base.metadata.create_all(ENGINE)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(ENGINE, checkfirst=True)
+
+
 def init_db(max_retries: int = 10, delay: int = 5):
     """Ensure all tables exist in the target database, retrying until DB is ready."""
     attempt = 1
     while attempt <= max_retries:
         try:
             logger.info("Initializing DB (attempt %s/%s)...", attempt, max_retries)
-            Base.metadata.create_all(ENGINE)
+            _create_schema()
             logger.info("Database tables ensured/created successfully.")
+            READY.mark("database", True, "tables ensured")
             return
         except OperationalError as e:
             logger.warning(
@@ -248,17 +682,51 @@ def init_db(max_retries: int = 10, delay: int = 5):
             break
 
     logger.error("Could not initialize DB after %s attempts. Continuing without DB.", max_retries)
+    READY.mark("database", False, f"gave up after {max_retries} attempts")
+
+
+def init_db_background():
+    """Fast-start variant of init_db: retries with backoff until it works."""
+    with_backoff(READY, "database", _create_schema, logger,
+                 BACKOFF_INITIAL_SEC, BACKOFF_MAX_SEC)
+
+
+def get_health():
+    """Liveness: the process is up and serving HTTP."""
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }, 200
+
+
+def get_ready():
+    """Readiness: 200 once the tables exist and every consumer is connected."""
+    return READY.response()
+
+
+def _resolve_handler(operation_id):
+    # Resolve "app.<func>" against this module: importing "app" a second
+    # time under `python app.py` re-registers the metrics and fails.
+    return globals()[operation_id.rsplit(".", 1)[-1]]
 
 
 app = connexion.FlaskApp(__name__, specification_dir=".")
-app.add_api("openapi.yml", strict_validation=True, validate_responses=False)
+app.add_api("openapi.yml", strict_validation=True, validate_responses=False,
+            resolver=Resolver(_resolve_handler),
+            validator_map={"body": MediaTypeDict({
+                **VALIDATOR_MAP["body"], "application/x-ndjson": NDJSONBodyValidator})})
+app.add_middleware(BulkBodyLimit, position=MiddlewarePosition.BEFORE_VALIDATION)
 
 if __name__ == "__main__":
-    init_db()
+    if FAST_START:
+        Thread(target=init_db_background, name="init-db", daemon=True).start()
+    else:
+        init_db()
 
-    t = Thread(target=process_messages)
-    t.daemon = True
-    t.start()
+    for topic_name in CONSUME_TOPICS:
+        t = Thread(target=process_messages, args=(topic_name,), name=f"consumer-{topic_name}")
+        t.daemon = True
+        t.start()
 
-    logger.info("Background Kafka consumer thread started")
+    logger.info("Background Kafka consumer threads started for topics=%s", ", ".join(CONSUME_TOPICS))
     app.run(port=8090, host="0.0.0.0")
\ No newline at end of file
@@ -0,0 +1,262 @@
+"""
+Replay benchmark for the storage consumer path.
+
+Feeds a stream of admission_created / capacity_snapshot messages through
+the same code the Kafka loop uses (app.consume_from -> handle_message ->
+create_*), writing to a local database instead of the production MySQL,
+and reports events/sec, the commit latency distribution and where the time
+went: message decode, dateutil parsing, ORM row construction and DB commit.
+
+Message sources:
+
+  --synthetic N         N generated events (mix set by --capacity-ratio),
+                        encoded with --codec (json, orjson or msgpack)
+  --input FILE          one raw message value per line, e.g. captured with
+                        kafka-console-consumer.sh --topic events.admission --from-beginning
+
+Paths (--via):
+
+  kafka    app.consume_from, one row and one commit per message (default)
+  single   one POST /hospital/<kind> per event, like a naive direct loader
+  bulk     POST /hospital/<kind>/bulk with --bulk-size NDJSON rows each;
+           the time split is only reported for the kafka path
+
+Databases:
+
+  --db-url sqlite:////tmp/storage_bench.db   (default, recreated each run)
+  --db-url mysql+pymysql://root:root@db:3306/bench
+
+Run it inside the storage container so /app/config is available, e.g.
+
+  docker compose exec storage python benchmark.py --synthetic 20000 --out /app/logs/replay.json
+  docker compose exec storage python benchmark.py --synthetic 20000 --via bulk --bulk-size 5000
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+
+
+class _Msg:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _Recorder:
+    """Drop-in for a prometheus Histogram that keeps every sample."""
+
+    def __init__(self):
+        self.samples = []
+
+    def labels(self, *args):
+        return self
+
+    def observe(self, value):
+        self.samples.append(value)
+
+
+def _iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def synthetic_messages(n, capacity_ratio, encode):
+    now = datetime.now(timezone.utc)
+    for i in range(n):
+        recorded = now - timedelta(seconds=random.randint(0, 86400))
+        meta = {
+            "batchId": uuid.uuid4().hex,
+            "senderId": f"hospital-{random.randint(1, 20)}",
+            "reportDate": recorded.strftime("%Y-%m-%d"),
+            "sentAt": _iso(now),
+            "version": "1.0",
+            "trace_id": str(uuid.uuid4()),
+        }
+        if random.random() < capacity_ratio:
+            total = random.randint(5, 60)
+            etype = "capacity_snapshot"
+            payload = {**meta, "unitId": f"UNIT-{random.randint(1, 40)}",
+                       "totalBeds": total, "occupiedBeds": random.randint(0, total),
+                       "recordedAt": _iso(recorded)}
+        else:
+            etype = "admission_created"
+            payload = {**meta, "encounterId": f"E-{i}",
+                       "event": random.choice(["admission", "discharge"]),
+                       "recordedAt": _iso(recorded), "patientAge": random.randint(0, 99)}
+        event = {"type": etype, "datetime": now.strftime("%Y-%m-%dT%H:%M:%S"), "payload": payload}
+        yield encode(event)
+
+
+def file_messages(path):
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _ms_percentiles(samples):
+    s = sorted(samples)
+    if not s:
+        return {}
+
+    def pct(p):
+        return round(s[min(len(s) - 1, int(round((len(s) - 1) * p / 100.0)))] * 1000, 3)
+
+    return {"p50": pct(50), "p90": pct(90), "p99": pct(99), "max": round(s[-1] * 1000, 3)}
+
+
+_KINDS = {"admission_created": "admission", "capacity_snapshot": "capacity"}
+
+
+def load_http(storage_app, events, via, bulk_size):
+    """Posts the events through the storage API; returns rows stored."""
+    client = storage_app.app.test_client()
+    stored = 0
+
+    if via == "single":
+        for event in events:
+            kind = _KINDS.get(event.get("type"))
+            if kind is None:
+                continue
+            r = client.post(f"/hospital/{kind}", json=event["payload"])
+            stored += r.status_code == 201
+        return stored
+
+    by_kind = {}
+    for event in events:
+        kind = _KINDS.get(event.get("type"))
+        if kind is not None:
+            by_kind.setdefault(kind, []).append(event["payload"])
+
+    for kind, payloads in by_kind.items():
+        for i in range(0, len(payloads), bulk_size):
+            body = "\n".join(json.dumps(p) for p in payloads[i:i + bulk_size])
+            r = client.post(f"/hospital/{kind}/bulk", content=body.encode("utf-8"),
+                            headers={"Content-Type": "application/x-ndjson"})
+            stored += r.json().get("stored", 0) if r.status_code in (201, 207) else 0
+    return stored
+
+
+def run(args):
+    import app as storage_app
+    import codec
+    from models import Base
+
+    if args.log_level:
+        logging.getLogger("basicLogger").setLevel(args.log_level)
+
+    if args.db_url.startswith("sqlite:///"):
+        path = args.db_url[len("sqlite:///"):]
+        if path and os.path.exists(path):
+            os.remove(path)
+    engine = create_engine(args.db_url, future=True)
+    Base.metadata.create_all(engine)
+    storage_app.ENGINE = engine
+    storage_app.SessionLocal.configure(bind=engine)
+
+    # Swap the hot-path histograms and date parsers for recording versions.
+    decode, insert, commit = _Recorder(), _Recorder(), _Recorder()
+    storage_app.DECODE_SECONDS = decode
+    storage_app.INSERT_SECONDS = insert
+    storage_app.COMMIT_SECONDS = commit
+
+    parse_time = [0.0]
+    orig_dt, orig_date = storage_app._parse_dt, storage_app._parse_date
+
+    def timed(fn):
+        def wrapper(s):
+            t0 = time.perf_counter()
+            try:
+                return fn(s)
+            finally:
+                parse_time[0] += time.perf_counter() - t0
+        return wrapper
+
+    storage_app._parse_dt = timed(orig_dt)
+    storage_app._parse_date = timed(orig_date)
+
+    if args.input:
+        values = list(file_messages(args.input))
+    else:
+        values = list(synthetic_messages(args.synthetic, args.capacity_ratio,
+                                         codec.get_encoder(args.codec)))
+    if args.via != "kafka":
+        # Decoded up front: a loader already has the rows in hand.
+        events = [codec.decode(v) for v in values]
+
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    if args.via == "kafka":
+        storage_app.consume_from(_Msg(v) for v in values)
+        rows_committed = len(commit.samples)
+    else:
+        rows_committed = load_http(storage_app, events, args.via, args.bulk_size)
+    elapsed = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+
+    decode_sec = sum(decode.samples)
+    insert_sec = sum(insert.samples)
+    commit_sec = sum(commit.samples)
+    parse_sec = parse_time[0]
+    accounted = decode_sec + insert_sec + commit_sec
+
+    report = {
+        "source": args.input or f"synthetic:{args.synthetic}:{args.codec}",
+        "via": args.via if args.via != "bulk" else f"bulk:{args.bulk_size}",
+        "db_url": engine.url.render_as_string(hide_password=True),
+        "events": len(values),
+        "rows_committed": rows_committed,
+        "elapsed_sec": round(elapsed, 3),
+        "cpu_sec": round(cpu, 3),
+        "events_per_sec": round(len(values) / elapsed, 1) if elapsed else None,
+        "rows_per_sec": round(rows_committed / elapsed, 1) if elapsed else None,
+        "commit_latency_ms": _ms_percentiles(commit.samples),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if args.via == "kafka":
+        report["time_split_sec"] = {
+            "decode": round(decode_sec, 4),
+            "dateutil_parse": round(parse_sec, 4),
+            "orm_construct": round(insert_sec - parse_sec, 4),
+            "db_commit": round(commit_sec, 4),
+            # Logging, session setup/teardown, latency tracking, metrics.
+            "other": round(elapsed - accounted, 4),
+        }
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--synthetic", type=int, metavar="N", help="Generate N events")
+    src.add_argument("--input", metavar="FILE", help="Replay raw message values, one per line")
+    ap.add_argument("--capacity-ratio", type=float, default=0.5,
+                    help="Share of synthetic events that are capacity snapshots")
+    ap.add_argument("--codec", default="json", help="Encoding for synthetic events")
+    ap.add_argument("--via", choices=("kafka", "single", "bulk"), default="kafka",
+                    help="Path the events take into the database")
+    ap.add_argument("--bulk-size", type=int, default=5000, help="Rows per bulk request")
+    ap.add_argument("--db-url", default="sqlite:////tmp/storage_bench.db")
+    ap.add_argument("--log-level", help="Override basicLogger level, e.g. WARNING")
+    ap.add_argument("--out", help="Write the JSON report here as well as stdout")
+    args = ap.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+app.py and database.py read their config when imported, so before any test
+imports them point APP_CONFIG_DIR at a copy of config/storage with
+console-only logging. The engine is only created, never connected, unless
+a test swaps in SQLite with the `db` fixture.
+
+Run from this directory: python -m pytest
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+# A connection check script, not a test.
+collect_ignore = ["test_connectionlab4.py"]
+
+_CONF_DIR = Path(tempfile.mkdtemp(prefix="storage-conf-"))
+shutil.copy(Path(__file__).resolve().parent.parent / "config" / "storage" / "app_conf.yml",
+            _CONF_DIR / "app_conf.yml")
+(_CONF_DIR / "log_conf.yml").write_text(yaml.safe_dump({
+    "version": 1,
+    "handlers": {"console": {"class": "logging.StreamHandler", "level": "WARNING"}},
+    "loggers": {"basicLogger": {"handlers": ["console"], "level": "WARNING"}},
+}))
+os.environ["APP_CONFIG_DIR"] = str(_CONF_DIR)
+
+
+@pytest.fixture
+def storage():
+    import app
+
+    return app
+
+
+@pytest.fixture
+def client(storage):
+    return storage.app.test_client()
+
+
+@pytest.fixture
+def db(storage, tmp_path, monkeypatch):
+    """Points app.py's engine and sessions at a fresh SQLite file."""
+    from sqlalchemy import create_engine
+
+    from models import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'storage.db'}", future=True)
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(storage, "ENGINE", engine)
+    monkeypatch.setattr(storage.SessionLocal, "kw", {**storage.SessionLocal.kw, "bind": engine})
+    return engine
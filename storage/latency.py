@@ -0,0 +1,146 @@
+"""
+End-to-end pipeline latency tracking for storage.
+
+The receiver stamps each event with `timing.received` (request arrived)
+and `timing.produced` (handed to the Kafka producer), both epoch seconds.
+Storage adds when it consumed the message and when the row committed, and
+folds the stage-to-stage gaps into rolling per-type histograms:
+
+    receiver    received -> produced
+    broker      produced -> consumed
+    db          consumed -> committed
+    end_to_end  received -> committed
+
+Histograms are fixed log-spaced buckets kept per time slot, so a rolling
+window costs a few KB per (type, stage) regardless of traffic.
+"""
+import bisect
+import time
+from array import array
+from collections import deque
+from threading import Lock
+
+STAGES = ("receiver", "broker", "db", "end_to_end")
+
+# Bucket upper bounds in ms: 0.5ms .. ~10min, each 25% wider than the last.
+_BOUNDS = []
+_b = 0.5
+while _b < 600000:
+    _BOUNDS.append(_b)
+    _b *= 1.25
+_BOUNDS.append(float("inf"))
+
+
+class RollingHistogram:
+    """Log-bucketed latency histogram over the last `window_sec` seconds."""
+
+    def __init__(self, window_sec, slot_sec):
+        self._slot_sec = slot_sec
+        self._nslots = max(1, int(window_sec // slot_sec))
+        self._ids = [-1] * self._nslots
+        self._counts = [array("I", [0] * len(_BOUNDS)) for _ in range(self._nslots)]
+        self._max = [0.0] * self._nslots
+
+    def record(self, ms, now):
+        slot_id = int(now // self._slot_sec)
+        i = slot_id % self._nslots
+        if self._ids[i] != slot_id:
+            self._ids[i] = slot_id
+            self._counts[i] = array("I", [0] * len(_BOUNDS))
+            self._max[i] = 0.0
+        self._counts[i][bisect.bisect_left(_BOUNDS, ms)] += 1
+        if ms > self._max[i]:
+            self._max[i] = ms
+
+    def summary(self, now):
+        oldest = int(now // self._slot_sec) - self._nslots + 1
+        merged = [0] * len(_BOUNDS)
+        worst = 0.0
+        for i, slot_id in enumerate(self._ids):
+            if slot_id < oldest:
+                continue
+            for b, c in enumerate(self._counts[i]):
+                merged[b] += c
+            worst = max(worst, self._max[i])
+
+        total = sum(merged)
+        if total == 0:
+            return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+
+        def _pct(p):
+            target = total * p / 100.0
+            running = 0
+            for b, c in enumerate(merged):
+                running += c
+                if running >= target:
+                    # Upper bound of the bucket, capped by the real max.
+                    return round(min(_BOUNDS[b], worst), 1)
+            return round(worst, 1)
+
+        return {
+            "count": total,
+            "p50_ms": _pct(50),
+            "p95_ms": _pct(95),
+            "p99_ms": _pct(99),
+            "max_ms": round(worst, 1),
+        }
+
+
+class LatencyTracker:
+    def __init__(self, window_sec, slot_sec, slow_ms, slow_samples):
+        self.window_sec = window_sec
+        self.slow_ms = slow_ms
+        self._lock = Lock()
+        self._hists = {}
+        self._window = (window_sec, slot_sec)
+        self._slow = deque(maxlen=slow_samples)
+
+    def record(self, etype, trace_id, timing, consumed, committed):
+        """
+        Records one committed event. Returns the per-stage latencies in ms
+        and whether the event counted as slow; events without receiver
+        stamps (e.g. produced by an older receiver) return None.
+        """
+        received = timing.get("received")
+        produced = timing.get("produced")
+        if received is None or produced is None:
+            return None
+
+        stages = {
+            "receiver": (produced - received) * 1000.0,
+            "broker": (consumed - produced) * 1000.0,
+            "db": (committed - consumed) * 1000.0,
+            "end_to_end": (committed - received) * 1000.0,
+        }
+        slow = stages["end_to_end"] >= self.slow_ms
+
+        with self._lock:
+            for stage, ms in stages.items():
+                key = (etype, stage)
+                hist = self._hists.get(key)
+                if hist is None:
+                    hist = self._hists[key] = RollingHistogram(*self._window)
+                hist.record(max(ms, 0.0), committed)
+            if slow:
+                self._slow.append({
+                    "trace_id": trace_id,
+                    "type": etype,
+                    "committed_at": committed,
+                    **{f"{stage}_ms": round(ms, 1) for stage, ms in stages.items()},
+                })
+
+        return stages, slow
+
+    def summary(self):
+        now = time.time()
+        with self._lock:
+            out = {}
+            for (etype, stage), hist in self._hists.items():
+                out.setdefault(etype, {})[stage] = hist.summary(now)
+            slow = list(self._slow)
+        return {
+            "window_sec": self.window_sec,
+            "slow_threshold_ms": self.slow_ms,
+            "types": out,
+            "slow_traces": slow,
+        }
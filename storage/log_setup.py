@@ -0,0 +1,144 @@
+"""
+Logging setup shared by the services (each service keeps its own copy,
+like its requirements.txt).
+
+Adds three things on top of logging.config.dictConfig, all driven from
+log_conf.yml:
+
+  JsonFormatter   one JSON object per line; `extra=` fields are included
+  SampledFilter   lets through 1 in `every` records that carry a
+                  `sample_key` extra, capped at `max_per_sec` per key;
+                  records without a sample_key always pass
+  async_logging   when enabled, handlers of the configured loggers are
+                  moved behind a bounded queue drained by a
+                  QueueListener thread, so request threads never wait on
+                  disk or stdout. When the queue is full records are
+                  dropped instead of blocking, and counted in the
+                  log_records_dropped_total metric on /metrics.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.config
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from prometheus_client import Counter
+
+# Attributes every LogRecord has; anything else came in through extra=.
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc)
+                          .isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str)
+
+
+class SampledFilter(logging.Filter):
+    def __init__(self, every=1, max_per_sec=0):
+        super().__init__()
+        self.every = max(1, int(every))
+        self.max_per_sec = float(max_per_sec)
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._windows = {}
+
+    def filter(self, record):
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+
+        with self._lock:
+            n = self._counts.get(key, 0)
+            self._counts[key] = n + 1
+            if n % self.every:
+                return False
+
+            if self.max_per_sec > 0:
+                second = int(time.monotonic())
+                window_second, passed = self._windows.get(key, (second, 0))
+                if window_second != second:
+                    window_second, passed = second, 0
+                if passed >= self.max_per_sec:
+                    return False
+                self._windows[key] = (window_second, passed + 1)
+
+        record.sampled_1_in = self.every
+        return True
+
+
+DROPPED = Counter(
+    "log_records_dropped_total", "Log records dropped because the async logging queue was full")
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops instead of blocking when the queue is full."""
+
+    def prepare(self, record):
+        # Like the base class, but keep the traceback in exc_text rather
+        # than folding it into msg, so JsonFormatter can emit it separately.
+        record = copy.copy(record)
+        msg = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.message = msg
+        record.msg = msg
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+
+_LISTENERS = []
+
+
+def configure(log_conf):
+    """dictConfig plus the optional `async_logging` section described above."""
+    log_conf = dict(log_conf)
+    async_conf = log_conf.pop("async_logging", None) or {}
+    logging.config.dictConfig(log_conf)
+
+    if not async_conf.get("enabled"):
+        return
+
+    names = list(log_conf.get("loggers", {}))
+    if "root" in log_conf:
+        names.append("")
+
+    # One queue per logger so each keeps exactly its own handlers.
+    for name in names:
+        lg = logging.getLogger(name)
+        if not lg.handlers:
+            continue
+        q = queue.Queue(maxsize=int(async_conf.get("queue_size", 10000)))
+        listener = logging.handlers.QueueListener(q, *lg.handlers, respect_handler_level=True)
+        lg.handlers = [DroppingQueueHandler(q)]
+        listener.start()
+        _LISTENERS.append(listener)
+        atexit.register(listener.stop)
@@ -21,7 +21,8 @@ class AdmissionDischarge(Base):
     version = mapped_column(String(50), nullable=False)
     encounter_id = mapped_column(String(250), nullable=False)
     event = mapped_column(String(32), nullable=False)
-    recorded_at = mapped_column(DateTime, nullable=False)
+    # Indexed for the reconciliation checksum / keys range queries.
+    recorded_at = mapped_column(DateTime, nullable=False, index=True)
     patient_age = mapped_column(Integer, nullable=False)
     trace_id = mapped_column(String(64), nullable=False)
     date_created = mapped_column(DateTime, nullable=False, default=func.now())
@@ -97,7 +98,7 @@ class Capacity(Base):
     unit_id = mapped_column(String(250), nullable=False)
     total_beds = mapped_column(Integer, nullable=False)
     occupied_beds = mapped_column(Integer, nullable=False)
-    recorded_at = mapped_column(DateTime, nullable=False)
+    recorded_at = mapped_column(DateTime, nullable=False, index=True)
 
     trace_id = mapped_column(String(64), nullable=False)
     date_created = mapped_column(DateTime, nullable=False, default=func.now())
@@ -0,0 +1,46 @@
+import pytest
+
+import benchmark
+import codec
+
+
+@pytest.fixture
+def bench_args(storage, db, tmp_path, monkeypatch):
+    # run() swaps these for recording versions; restore them afterwards.
+    for name in ("DECODE_SECONDS", "INSERT_SECONDS", "COMMIT_SECONDS", "_parse_dt", "_parse_date"):
+        monkeypatch.setattr(storage, name, getattr(storage, name))
+
+    class Args:
+        synthetic = 40
+        input = None
+        capacity_ratio = 0.5
+        codec = "json"
+        via = "kafka"
+        bulk_size = 15
+        db_url = f"sqlite:///{tmp_path / 'bench.db'}"
+        log_level = "ERROR"
+
+    return Args
+
+
+def test_synthetic_messages_decode_to_both_event_types():
+    events = [codec.decode(v) for v in benchmark.synthetic_messages(50, 0.5, codec.get_encoder("msgpack"))]
+
+    assert {e["type"] for e in events} == {"admission_created", "capacity_snapshot"}
+    assert all(e["payload"]["trace_id"] for e in events)
+
+
+def test_percentiles_are_in_ms():
+    assert benchmark._ms_percentiles([0.001, 0.002, 0.003]) == {
+        "p50": 2.0, "p90": 3.0, "p99": 3.0, "max": 3.0}
+    assert benchmark._ms_percentiles([]) == {}
+
+
+@pytest.mark.parametrize("via", ["kafka", "single", "bulk"])
+def test_replay_commits_every_event(bench_args, via):
+    bench_args.via = via
+
+    report = benchmark.run(bench_args)
+
+    assert report["events"] == report["rows_committed"] == 40
+    assert ("time_split_sec" in report) == (via == "kafka")
@@ -0,0 +1,66 @@
+import json
+
+from models import Capacity
+
+
+def capacity_row(unit, recorded="2025-01-01T10:00:00Z"):
+    return {"batchId": "b", "senderId": "h-1", "reportDate": "2025-01-01",
+            "sentAt": "2025-01-01T10:00:00Z", "version": "1.0", "trace_id": f"t-{unit}",
+            "unitId": unit, "totalBeds": 10, "occupiedBeds": 4, "recordedAt": recorded}
+
+
+def ndjson(rows):
+    return "\n".join(json.dumps(r) for r in rows).encode()
+
+
+def stored_units(db):
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+
+    with Session(db) as session:
+        return sorted(session.scalars(select(Capacity.unit_id)))
+
+
+def test_ndjson_upload_is_stored(client, db):
+    r = client.post("/hospital/capacity/bulk", content=ndjson([capacity_row("ICU"), capacity_row("ER")]),
+                    headers={"Content-Type": "application/x-ndjson"})
+
+    assert r.status_code == 201
+    assert r.json()["stored"] == 2
+    assert stored_units(db) == ["ER", "ICU"]
+
+
+def test_bad_ndjson_lines_are_reported_and_skipped(client, db):
+    body = ndjson([capacity_row("ICU")]) + b"\n{not json\n" + ndjson([{"unitId": "ER"}])
+
+    r = client.post("/hospital/capacity/bulk", content=body,
+                    headers={"Content-Type": "application/x-ndjson"})
+
+    assert r.status_code == 207
+    assert [e["index"] for e in r.json()["errors"]] == [1, 2]
+    assert stored_units(db) == ["ICU"]
+
+
+def test_json_array_upload_is_stored(client, db):
+    r = client.post("/hospital/capacity/bulk", json=[{"type": "capacity_snapshot",
+                                                      "payload": capacity_row("ICU")}])
+
+    assert r.status_code == 201
+    assert stored_units(db) == ["ICU"]
+
+
+def test_oversized_body_is_refused_before_it_is_read(storage, client, monkeypatch):
+    monkeypatch.setattr(storage, "BULK_MAX_BYTES", 100)
+    monkeypatch.setattr(storage, "_parse_bulk_body", None)  # must not be reached
+
+    r = client.post("/hospital/capacity/bulk", content=ndjson([capacity_row("ICU")] * 3),
+                    headers={"Content-Type": "application/x-ndjson"})
+
+    assert r.status_code == 413
+
+
+def test_body_without_a_length_is_refused(client):
+    r = client.post("/hospital/capacity/bulk", content=iter([ndjson([capacity_row("ICU")])]),
+                    headers={"Content-Type": "application/x-ndjson"})
+
+    assert r.status_code == 411
@@ -0,0 +1,31 @@
+import pytest
+
+import codec
+
+EVENT = {
+    "type": "admission_created",
+    "datetime": "2025-01-01T10:00:00",
+    "payload": {"batchId": "b", "senderId": "h-1", "reportDate": "2025-01-01",
+                "sentAt": "2025-01-01T10:00:00Z", "version": "1.0", "trace_id": "t",
+                "encounterId": "E1", "event": "admission",
+                "recordedAt": "2025-01-01T09:59:00Z", "patientAge": 40},
+}
+
+
+@pytest.mark.parametrize("name", codec.CODECS)
+def test_decodes_every_format(name):
+    assert codec.decode(codec.get_encoder(name)(EVENT)) == EVENT
+
+
+def test_stored_message_decodes_msgpack(storage, monkeypatch):
+    stored = []
+
+    def create(payload):
+        stored.append(payload)
+        return None, 201
+
+    monkeypatch.setattr(storage, "create_admission_discharge", create)
+
+    storage.handle_message(codec.get_encoder("msgpack")(EVENT))
+
+    assert stored == [EVENT["payload"]]
@@ -0,0 +1,53 @@
+import json
+import time
+
+import pytest
+
+from latency import LatencyTracker, RollingHistogram
+
+
+def test_stages_are_the_gaps_between_stamps():
+    tracker = LatencyTracker(window_sec=60, slot_sec=10, slow_ms=1500, slow_samples=10)
+    timing = {"received": 100.0, "produced": 100.1}
+
+    stages, slow = tracker.record("capacity_snapshot", "t1", timing, consumed=100.6, committed=101.7)
+
+    assert {k: round(v) for k, v in stages.items()} == {
+        "receiver": 100, "broker": 500, "db": 1100, "end_to_end": 1700}
+    assert slow
+    assert tracker.summary()["slow_traces"][0]["trace_id"] == "t1"
+
+
+def test_events_without_receiver_stamps_are_skipped():
+    tracker = LatencyTracker(window_sec=60, slot_sec=10, slow_ms=1500, slow_samples=10)
+
+    assert tracker.record("capacity_snapshot", "t1", {}, consumed=1.0, committed=2.0) is None
+    assert tracker.summary()["types"] == {}
+
+
+def test_histogram_forgets_slots_outside_the_window():
+    hist = RollingHistogram(window_sec=30, slot_sec=10)
+    hist.record(900.0, now=0)
+    for ms in (1.0, 2.0, 3.0):
+        hist.record(ms, now=25)
+
+    assert hist.summary(now=25)["count"] == 4
+    summary = hist.summary(now=35)
+    assert summary["count"] == 3
+    assert summary["max_ms"] == 3.0
+    # Bucket upper bounds, never above the real maximum.
+    assert summary["p50_ms"] <= summary["p99_ms"] <= 3.0
+
+
+def test_committed_messages_show_up_in_pipeline_latency(storage, client, monkeypatch):
+    monkeypatch.setattr(storage, "_LATENCY", LatencyTracker(300, 10, 2000, 10))
+    monkeypatch.setattr(storage, "create_capacity", lambda payload: (None, 201))
+    now = time.time()
+    message = {"type": "capacity_snapshot", "payload": {"trace_id": "t1"},
+               "timing": {"received": now - 0.2, "produced": now - 0.1}}
+
+    storage.handle_message(json.dumps(message).encode())
+
+    stages = client.get("/pipeline/latency").json()["types"]["capacity_snapshot"]
+    assert stages["end_to_end"]["count"] == 1
+    assert stages["end_to_end"]["p50_ms"] == pytest.approx(200, abs=50)
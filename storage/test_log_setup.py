@@ -0,0 +1,40 @@
+import json
+import logging
+import queue
+
+import log_setup
+
+
+def record(msg, **extra):
+    rec = logging.LogRecord("basicLogger", logging.INFO, __file__, 1, msg, None, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_full_queue_drops_and_counts():
+    handler = log_setup.DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = log_setup.DROPPED._value.get()
+
+    for n in range(3):
+        handler.emit(record(f"event {n}"))
+
+    assert handler.queue.qsize() == 1
+    assert log_setup.DROPPED._value.get() - before == 2
+
+
+def test_sampled_filter_lets_one_in_every_n_through():
+    sampler = log_setup.SampledFilter(every=3)
+
+    passed = [sampler.filter(record("m", sample_key="k")) for _ in range(7)]
+
+    assert passed == [True, False, False, True, False, False, True]
+    assert sampler.filter(record("unsampled"))
+
+
+def test_json_formatter_keeps_extra_fields():
+    line = log_setup.JsonFormatter().format(record("stored %s", trace_id="t1"))
+
+    out = json.loads(line)
+    assert out["msg"] == "stored %s"
+    assert out["trace_id"] == "t1"
+    assert out["level"] == "INFO"
@@ -0,0 +1,51 @@
+import json
+import math
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from test_bulk import capacity_row
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_a_consumed_message_moves_the_storage_series(storage, client, db):
+    series = [("storage_decode_seconds_count", {}),
+              ("storage_insert_seconds_count", {"kind": "capacity"}),
+              ("storage_commit_seconds_count", {"kind": "capacity"}),
+              ("storage_rows_total", {"kind": "capacity", "result": "stored"}),
+              ("storage_messages_total", {"result": "processed"})]
+    before = [sample(name, **labels) for name, labels in series]
+    value = json.dumps({"type": "capacity_snapshot", "payload": capacity_row("ICU")}).encode()
+
+    storage.consume_from([SimpleNamespace(value=value)])
+
+    after = [sample(name, **labels) for name, labels in series]
+    assert [a - b for a, b in zip(after, before)] == [1, 1, 1, 1, 1]
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'storage_rows_total{kind="capacity",result="stored"}' in r.text
+
+
+def test_pool_gauge_counts_checked_out_connections(db):
+    assert sample("storage_db_pool_checked_out") == 0
+    with db.connect():
+        assert sample("storage_db_pool_checked_out") == 1
+
+
+def test_consumer_lag_is_read_from_the_consumer(storage, monkeypatch):
+    topic = storage.CONSUME_TOPICS[0]
+    consumer = SimpleNamespace(
+        # Partition 0 has 10 messages and 3 were consumed; partition 1 is empty.
+        topic=SimpleNamespace(latest_available_offsets=lambda: {
+            0: SimpleNamespace(offset=[10]), 1: SimpleNamespace(offset=[0])}),
+        held_offsets={0: 2})
+    assert math.isnan(sample("storage_kafka_consumer_lag", topic=topic))  # no consumer yet
+
+    monkeypatch.setitem(storage._CONSUMERS, topic, consumer)
+
+    assert sample("storage_kafka_consumer_lag", topic=topic) == 7
@@ -0,0 +1,58 @@
+import logging
+import threading
+
+from readiness import Readiness, with_backoff
+
+
+def test_ready_needs_the_database_and_every_consumer(storage, client, monkeypatch):
+    checks = ["database"] + [f"kafka:{t}" for t in storage.CONSUME_TOPICS]
+    ready = Readiness(required=checks)
+    monkeypatch.setattr(storage, "READY", ready)
+
+    for check in checks:
+        r = client.get("/ready")
+        assert r.status_code == 503
+        assert set(r.json()["checks"]) == set(checks)
+        ready.mark(check, True, "connected")
+
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["status"] == "ready"
+
+
+def test_consumers_wait_for_the_tables(monkeypatch):
+    import readiness
+
+    monkeypatch.setattr(readiness.time, "sleep", lambda sec: None)
+    ready = Readiness(required=["database"])
+    waited = []
+    consumer = threading.Thread(target=lambda: waited.append(ready.wait("database", timeout=5)))
+    consumer.start()
+
+    attempts = []
+
+    def create_schema():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise OSError("MySQL is still starting")
+
+    assert ready.wait("database", timeout=0) is False
+    with_backoff(ready, "database", create_schema, logging.getLogger("test"))
+    consumer.join(5)
+
+    assert waited == [True]
+    assert ready.response()[0]["checks"]["database"]["detail"] == "connected after 2 attempts"
+
+
+def test_a_consumer_failing_after_startup_is_not_ready(storage, client, monkeypatch):
+    topic = storage.CONSUME_TOPICS[0]
+    ready = Readiness(required=["database", f"kafka:{topic}"])
+    monkeypatch.setattr(storage, "READY", ready)
+    ready.mark("database", True)
+    ready.mark(f"kafka:{topic}", True)
+
+    ready.mark(f"kafka:{topic}", False, "consumer failed: broker gone")
+
+    r = client.get("/ready")
+    assert r.status_code == 503
+    assert r.json()["status"] == "not_ready"
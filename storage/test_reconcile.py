@@ -0,0 +1,49 @@
+from models import AdmissionDischarge, Capacity
+
+
+class _RecordingSession:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.calls.append((str(sql), params))
+        return self
+
+    def all(self):
+        return [(10, 2, 2 ** 64 + 5)]
+
+
+def test_checksums_limit_the_scan_to_the_requested_range(storage, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(storage, "SessionLocal", lambda: _RecordingSession(calls))
+
+    r = client.get("/hospital/capacity/checksums",
+                   params={"window_sec": 60, "from_sec": 600, "to_sec": 1200})
+
+    assert r.status_code == 200
+    assert r.json() == [{"window": 10, "count": 2, "checksum": 5}]
+    sql, params = calls[0]
+    assert "recorded_at >= TIMESTAMPADD(SECOND, :from_sec" in sql
+    assert "recorded_at < TIMESTAMPADD(SECOND, :to_sec" in sql
+    assert params == {"window_sec": 60, "from_sec": 600, "to_sec": 1200}
+
+
+def test_checksums_without_a_range_cover_the_whole_table(storage, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(storage, "SessionLocal", lambda: _RecordingSession(calls))
+
+    client.get("/hospital/admission/checksums", params={"window_sec": 3600})
+
+    assert "WHERE" not in calls[0][0]
+
+
+def test_recorded_at_is_indexed():
+    for model in (AdmissionDischarge, Capacity):
+        indexed = {col.name for index in model.__table__.indexes for col in index.columns}
+        assert "recorded_at" in indexed
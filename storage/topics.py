@@ -0,0 +1,30 @@
+"""
+The Kafka topics storage consumes, from the `events` section of
+app_conf.yml. With routing "shared" (the default) that is just `topic`.
+With "per_type" it is every topic in `topics`, plus `topic` itself while
+consume_legacy is true (the default), so events the receiver produced
+before the switch still reach the database.
+"""
+
+EVENT_TYPES = ("admission_created", "capacity_snapshot")
+
+
+def consume_topics(events_conf):
+    """Topic names, the shared one first; raises ValueError for an unusable routing."""
+    legacy = events_conf["topic"]
+    mode = events_conf.get("routing", "shared")
+    if mode == "shared":
+        return [legacy]
+    if mode != "per_type":
+        raise ValueError(f"events.routing must be shared or per_type, got {mode!r}")
+
+    topics = events_conf.get("topics") or {}
+    missing = [t for t in EVENT_TYPES if t not in topics]
+    if missing:
+        raise ValueError(f"events.topics has no topic for: {', '.join(missing)}")
+
+    out = [legacy] if events_conf.get("consume_legacy", True) else []
+    for t in EVENT_TYPES:
+        if topics[t] not in out:
+            out.append(topics[t])
+    return out